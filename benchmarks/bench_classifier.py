@@ -0,0 +1,88 @@
+"""区域分类器微基准：对比旧的逐项比较实现与融合查找表分类器
+
+用法: python benchmarks/bench_classifier.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import RegionClassifier  # noqa: E402
+
+SIZES = {
+    "tiny": (16, 80),
+    "line": (24, 240),
+    "block": (60, 400),
+    "panel": (300, 600),
+}
+
+
+def legacy_classify(image):
+    """旧实现：六次整数组比较 + PIL 灰度转换后再扫描一遍"""
+    img_array = np.array(image)
+    red_mask = (
+            (img_array[:, :, 0] >= 190) & (img_array[:, :, 0] <= 250) &
+            (img_array[:, :, 1] >= 5) & (img_array[:, :, 1] <= 65) &
+            (img_array[:, :, 2] >= 55) & (img_array[:, :, 2] <= 115)
+    )
+    is_red = np.sum(red_mask) >= 10
+    gray_array = np.array(image.convert('L'))
+    has_content = np.sum(gray_array < 240) > 50
+    return is_red, has_content
+
+
+def make_region(kind, height, width, rng):
+    """生成测试区域：深色底上的红字 / 白字，或空白背景"""
+    region = rng.integers(20, 60, size=(height, width, 3), dtype=np.uint8)
+    text_rows = slice(height // 4, max(height // 4 + 1, 3 * height // 4))
+    text_cols = rng.random(width) < 0.3
+    if kind == "red":
+        region[text_rows, text_cols] = (220, 35, 85)
+    elif kind == "white":
+        region[text_rows, text_cols] = (235, 235, 235)
+    elif kind == "blank":
+        region[:] = 250
+    return region
+
+
+def run(repeat):
+    rng = np.random.default_rng(0)
+    classifier = RegionClassifier()
+    print(f"{'区域':<8}{'内容':<8}{'旧实现(us)':>12}{'融合(us)':>12}{'加速比':>8}")
+
+    for size_name, (height, width) in SIZES.items():
+        for kind in ("red", "white", "blank"):
+            region = make_region(kind, height, width, rng)
+            # 与实际一致：区域是整帧截图中的切片
+            frame = np.zeros((height + 8, width + 8, 3), dtype=np.uint8)
+            frame[4:4 + height, 4:4 + width] = region
+            view = frame[4:4 + height, 4:4 + width]
+            image = Image.fromarray(region)
+
+            expected = tuple(bool(x) for x in legacy_classify(image))
+            actual = classifier.classify(view)
+            if expected != actual:
+                raise AssertionError(f"{size_name}/{kind}: 结果不一致 {expected} != {actual}")
+
+            legacy_time = min(timeit.repeat(lambda: legacy_classify(image),
+                                            number=repeat, repeat=3)) / repeat
+            fused_time = min(timeit.repeat(lambda: classifier.classify(view),
+                                           number=repeat, repeat=3)) / repeat
+            print(f"{size_name:<8}{kind:<8}{legacy_time * 1e6:>12.1f}"
+                  f"{fused_time * 1e6:>12.1f}{legacy_time / fused_time:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="区域分类器微基准")
+    parser.add_argument("--repeat", type=int, default=200, help="每组计时的调用次数")
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""多客户端调度基准：用模拟游戏窗口测量不同窗口数量下的总洗练速度
+
+模拟窗口在真实时钟下播放动画（默认每次约0.45秒），调度器在一个窗口
+等待动画时点击和分析其他窗口。理想情况下总速度随窗口数线性增长，
+截图和分析的CPU耗时占满一轮后不再增长。
+
+用法: python benchmarks/bench_scheduler.py [--clients 1 2 4 8] [--duration 5]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import WashEngine  # noqa: E402
+from fake_client import FakeGameScreen, create_fake_clients  # noqa: E402
+from scheduler import WashScheduler  # noqa: E402
+
+
+def run_case(count, duration, seed, animation_time):
+    """count 个模拟窗口运行 duration 秒，返回总速度和空闲比例"""
+    clients = create_fake_clients(count, seed=seed, animation_time=animation_time)
+    screen = FakeGameScreen(clients, time.perf_counter)
+    scheduler = WashScheduler()
+    for i, client in enumerate(clients):
+        engine = WashEngine(click=screen.click, capture_backend=screen, perf_counter=time.perf_counter)
+        engine.apply_config(client.settings())
+        engine.min_red_count = len(client.detection_areas) + 1  # 永远达不到，只测速度
+        scheduler.add_session(f"client{i + 1}", engine)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        wait = scheduler.step()
+        if wait:
+            wait = min(wait, deadline - time.perf_counter())
+            if wait > 0:
+                scheduler.idle_time += wait
+                time.sleep(wait)
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+
+    washes = sum(session.cycles for session in scheduler.sessions)
+    return {
+        "clients": count,
+        "seconds": round(elapsed, 3),
+        "washes": washes,
+        "washes_per_minute": round(washes / elapsed * 60, 1),
+        "idle_ratio": round(scheduler.idle_time / elapsed, 3),
+        "ignored_clicks": sum(client.ignored_clicks for client in clients),
+        "missed_clicks": screen.missed_clicks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多客户端调度基准")
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4, 8], help="参与测试的窗口数量")
+    parser.add_argument("--duration", type=float, default=5.0, help="每组运行的秒数")
+    parser.add_argument("--animation-time", type=float, default=0.4, help="模拟动画时长（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="模拟窗口的随机种子")
+    parser.add_argument("--output", help="把结果以 JSON 写入文件，便于版本间对比")
+    args = parser.parse_args()
+
+    cases = []
+    print(f"{'窗口':>4}{'洗练次数':>10}{'次/分':>10}{'空闲比例':>10}{'忽略点击':>10}")
+    for count in args.clients:
+        result = run_case(count, args.duration, args.seed, args.animation_time)
+        cases.append(result)
+        print(f"{count:>4}{result['washes']:>10}{result['washes_per_minute']:>10.1f}"
+              f"{result['idle_ratio']:>10.2f}{result['ignored_clicks']:>10}")
+
+    report = {
+        "benchmark": "scheduler",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "duration": args.duration,
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""洗练循环无界面基准：用合成画面和模拟点击驱动 WashEngine 的检测与终止判断
+
+不依赖 Windows、winsound 或真实屏幕。每轮调用 WashEngine.run_cycle，按区域
+尺寸（tiny ~ panel）和区域数量（1~6）组合统计引擎自己记录的各阶段耗时：
+点击、等待动画、截图、分析、终止判断。回放后端每次点击切换到下一帧；
+等待动画的轮询间隔用模拟时钟累加，不真实休眠。先洗练 --warmup 轮，
+与真实运行一样让节奏控制器测到响应延迟后再开始统计。
+
+用法: python benchmarks/bench_wash_cycle.py [--cycles N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_classifier import SIZES, make_region  # noqa: E402
+from capture import ReplayCaptureBackend  # noqa: E402
+from engine import WashEngine  # noqa: E402
+from input_driver import CallbackInputDriver  # noqa: E402
+from metrics import WashMetrics  # noqa: E402
+
+STAGES = ("click", "settle", "capture", "analyze", "termination")
+AREA_GAP = 8  # 合成画面中相邻区域之间的间距
+FRAME_VARIANTS = 8  # 循环使用的合成画面数量
+
+
+class BenchClock:
+    """真实计时 + 模拟等待：各阶段的CPU耗时按真实时间计，等待动画的轮询间隔只累加不休眠"""
+
+    def __init__(self):
+        self.slept = 0.0
+
+    def __call__(self):
+        return time.perf_counter() + self.slept
+
+    def sleep(self, seconds):
+        self.slept += max(0.0, seconds)
+
+
+class SampledMetrics(WashMetrics):
+    """引擎的阶段指标，另外保留每次的原始耗时以计算精确的分位数"""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = {stage: [] for stage in STAGES}
+
+    def record(self, stage, seconds):
+        super().record(stage, seconds)
+        self.samples[stage].append(seconds)
+
+
+def build_scene(size_name, area_count, rng):
+    """生成检测区域和一组合成整屏画面，每帧各区域随机为红字或白字"""
+    height, width = SIZES[size_name]
+    areas = []
+    for i in range(area_count):
+        top = AREA_GAP + i * (height + AREA_GAP)
+        areas.append((AREA_GAP, top, AREA_GAP + width, top + height))
+
+    frame_height = AREA_GAP + area_count * (height + AREA_GAP)
+    frame_width = width + 2 * AREA_GAP
+    frames = []
+    for _ in range(FRAME_VARIANTS):
+        frame = np.full((frame_height, frame_width, 3), 30, dtype=np.uint8)
+        for x1, y1, x2, y2 in areas:
+            kind = "red" if rng.random() < 0.3 else "white"
+            frame[y1:y2, x1:x2] = make_region(kind, height, width, rng)
+        frames.append(frame)
+
+    return areas + [None] * (6 - area_count), frames
+
+
+def summarize(samples):
+    """汇总耗时样本（毫秒）"""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return None
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "min_ms": round(float(values.min()), 4),
+        "max_ms": round(float(values.max()), 4),
+    }
+
+
+def run_case(size_name, area_count, cycles, warmup, rng):
+    """对一组 (区域尺寸, 区域数量) 运行若干轮洗练，返回各阶段耗时汇总"""
+    areas, frames = build_scene(size_name, area_count, rng)
+    backend = ReplayCaptureBackend(frames)
+    clock = BenchClock()
+    engine = WashEngine(input_driver=CallbackInputDriver(lambda position: backend.advance()),
+                        capture_backend=backend, clock=clock, perf_counter=clock, sleep=clock.sleep)
+    engine.detection_areas = list(areas)
+    engine.wash_button_pos = (0, 0)
+    engine.min_red_count = area_count
+    engine.use_advanced_strategy = True
+    engine.area_color_requirements = ["红" if i % 2 == 0 else "无" for i in range(6)]
+
+    def wash(count):
+        for _ in range(count):
+            engine.run_cycle()
+            # 合成画面循环使用，真实洗练中每轮画面都不同，不让分类缓存命中
+            engine.image_cache.clear()
+
+    wash(warmup)
+    engine.metrics = SampledMetrics()
+    wash(cycles)
+
+    return {
+        "size": size_name,
+        "area_shape": list(SIZES[size_name]),
+        "area_count": area_count,
+        "cycles": cycles,
+        "capture_rects": len(engine.get_capture_plan().rects),
+        "grace_ms": round(engine.settle_detector.grace * 1000, 1),
+        "stages": {stage: summarize(samples) for stage, samples in engine.metrics.samples.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="洗练循环无界面基准")
+    parser.add_argument("--cycles", type=int, default=200, help="每组测量的洗练轮数")
+    parser.add_argument("--warmup", type=int, default=5, help="每组开始统计前先洗练的轮数")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES),
+                        help="参与测试的区域尺寸")
+    parser.add_argument("--areas", nargs="+", type=int, default=list(range(1, 7)),
+                        help="参与测试的区域数量")
+    parser.add_argument("--seed", type=int, default=0, help="合成画面的随机种子")
+    parser.add_argument("--output", help="把结果以 JSON 写入文件，便于版本间对比")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    cases = []
+    print(f"{'尺寸':<7}{'区域':>4}  " + "".join(f"{stage:>19}" for stage in STAGES) + "  (p50 ms)")
+    for size_name in args.sizes:
+        for area_count in args.areas:
+            result = run_case(size_name, area_count, args.cycles, args.warmup, rng)
+            cases.append(result)
+            cells = []
+            for stage in STAGES:
+                summary = result["stages"][stage]
+                cells.append(f"{summary['p50_ms']:>19.4f}" if summary else f"{'-':>19}")
+            print(f"{size_name:<7}{area_count:>4}  " + "".join(cells))
+
+    report = {
+        "benchmark": "wash_cycle",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
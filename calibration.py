@@ -0,0 +1,198 @@
+"""颜色和阈值校准：从带标签的区域截图中拟合调色板颜色、容差和计数阈值"""
+import numpy as np
+
+from palette import NO_COLOR, PaletteColor
+
+# 校准标签：区域中没有任何词条
+BLANK = "空白"
+
+MIN_TOLERANCE = 8
+MAX_TOLERANCE = 60
+GRAY_WEIGHTS = np.array([19595, 38470, 7471], dtype=np.int64)
+
+
+def to_gray(pixels):
+    """与 PIL 'L' 模式一致的灰度值"""
+    return (pixels.astype(np.int64) @ GRAY_WEIGHTS + 0x8000) >> 16
+
+
+def kmeans(points, k, iterations=20, seed=0):
+    """向量化 k-means（k-means++ 初始化），返回 (中心点, 每个点的类别)"""
+    points = np.asarray(points, dtype=np.float32)
+    k = min(k, len(points))
+    rng = np.random.default_rng(seed)
+
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distance = np.min(((points[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=2), axis=1)
+        total = distance.sum()
+        if total <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=distance / total)])
+    centers = np.array(centers, dtype=np.float32)
+
+    labels = np.zeros(len(points), dtype=np.int64)
+    for _ in range(iterations):
+        distance = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = np.argmin(distance, axis=1)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        counts = np.bincount(labels, minlength=len(centers)).astype(np.float32)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(updated, centers, atol=0.5):
+            centers = updated
+            break
+        centers = updated
+    return centers, labels
+
+
+def best_threshold(positive, negative, strict=False):
+    """选出区分正负样本计数的阈值，返回 (阈值, 误判数)
+
+    strict 为 False 时判定规则是 计数 >= 阈值，为 True 时是 计数 > 阈值
+    """
+    positive = np.asarray(positive, dtype=np.int64)
+    negative = np.asarray(negative, dtype=np.int64)
+    candidates = np.unique(np.concatenate([positive, negative, positive + 1, negative + 1]))
+    if strict:
+        candidates = candidates - 1
+    candidates = candidates[candidates >= (0 if strict else 1)]
+
+    if strict:
+        errors = (positive[None, :] <= candidates[:, None]).sum(axis=1) + \
+                 (negative[None, :] > candidates[:, None]).sum(axis=1)
+    else:
+        errors = (positive[None, :] < candidates[:, None]).sum(axis=1) + \
+                 (negative[None, :] >= candidates[:, None]).sum(axis=1)
+
+    best = errors.min()
+    # 误判数相同的阈值取中间值，给正负样本都留出余量
+    tied = candidates[errors == best]
+    return int(tied[len(tied) // 2]), int(best)
+
+
+class CalibrationSession:
+    """校准会话：收集 (区域图像, 标签) 样本并拟合参数
+
+    标签为调色板颜色名称、"无"（有词条但不是目标颜色）或"空白"（没有词条）
+    """
+
+    def __init__(self, max_pixels_per_class=20000, seed=0):
+        self.samples = []
+        self.max_pixels_per_class = max_pixels_per_class
+        self.seed = seed
+
+    def add_sample(self, image, label):
+        """添加一个样本（会复制图像）"""
+        pixels = np.array(image, dtype=np.uint8)[:, :, :3]
+        self.samples.append((pixels, label))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def label_counts(self):
+        counts = {}
+        for _, label in self.samples:
+            counts[label] = counts.get(label, 0) + 1
+        return counts
+
+    def _subsample(self, pixels, rng):
+        if len(pixels) > self.max_pixels_per_class:
+            pixels = pixels[rng.choice(len(pixels), self.max_pixels_per_class, replace=False)]
+        return pixels
+
+    def fit_color(self, color, clusters=4):
+        """拟合一种颜色，返回 (新的 PaletteColor, 误判数, 正样本数)；没有正样本时返回 None"""
+        rng = np.random.default_rng(self.seed)
+        positives = [pixels.reshape(-1, 3) for pixels, label in self.samples if label == color.name]
+        negatives = [pixels.reshape(-1, 3) for pixels, label in self.samples if label != color.name]
+        if not positives:
+            return None
+
+        positive_pixels = self._subsample(np.concatenate(positives), rng).astype(np.int16)
+        negative_pixels = (self._subsample(np.concatenate(negatives), rng).astype(np.int16)
+                           if negatives else np.zeros((0, 3), dtype=np.int16))
+
+        centers, labels = kmeans(positive_pixels, clusters, seed=self.seed)
+        best = None
+        for index, center in enumerate(centers):
+            members = positive_pixels[labels == index]
+            if len(members) < max(3, len(positive_pixels) // 200):
+                continue
+            spread = np.abs(members - center).max(axis=1)
+            tolerance = int(np.clip(np.percentile(spread, 90), MIN_TOLERANCE, MAX_TOLERANCE))
+            rounded = np.round(center).astype(np.int16)
+            negative_share = (np.abs(negative_pixels - rounded).max(axis=1) <= tolerance).mean() \
+                if len(negative_pixels) else 0.0
+            chroma = float(center.max() - center.min())
+            # 优先选负样本中最少出现的簇（排除背景和普通文字），其次选颜色最鲜艳的
+            key = (round(float(negative_share), 4), -chroma)
+            if best is None or key < best[0]:
+                best = (key, rounded, tolerance)
+
+        if best is None:
+            return None
+        _, rgb, tolerance = best
+
+        def box_count(pixels):
+            return int((np.abs(pixels.reshape(-1, 3).astype(np.int16) - rgb).max(axis=1) <= tolerance).sum())
+
+        positive_counts = [box_count(pixels) for pixels, label in self.samples if label == color.name]
+        negative_counts = [box_count(pixels) for pixels, label in self.samples if label != color.name]
+        min_pixels, errors = best_threshold(positive_counts, negative_counts)
+        fitted = PaletteColor(color.name, rgb.tolist(), tolerance, min_pixels)
+        return fitted, errors, len(positive_counts)
+
+    def fit_content(self, background_level, content_threshold):
+        """拟合背景灰度阈值和内容像素阈值，返回 (背景灰度阈值, 内容阈值, 误判数, 说明)
+
+        背景灰度阈值取所有样本灰度两簇聚类中心的中点；需要有"空白"样本才拟合内容阈值。
+        非背景的判定规则是 灰度 < 阈值，背景比词条暗时无法区分，保持原参数
+        """
+        rng = np.random.default_rng(self.seed)
+        all_pixels = self._subsample(np.concatenate([pixels.reshape(-1, 3) for pixels, _ in self.samples]), rng)
+        gray = to_gray(all_pixels).astype(np.float32)[:, None]
+        centers, labels = kmeans(gray, 2, seed=self.seed)
+        if len(centers) == 2:
+            background = int(np.argmax(np.bincount(labels, minlength=2)))
+            if centers[background, 0] <= centers[1 - background, 0]:
+                return background_level, content_threshold, 0, "背景比词条暗，保持原参数"
+            background_level = int(round(float(centers[:, 0].mean())))
+
+        blank_counts = []
+        content_counts = []
+        for pixels, label in self.samples:
+            count = int((to_gray(pixels.reshape(-1, 3)) < background_level).sum())
+            (blank_counts if label == BLANK else content_counts).append(count)
+
+        if not blank_counts or not content_counts:
+            return background_level, content_threshold, 0, "缺少空白或非空白样本，内容阈值保持不变"
+        content_threshold, errors = best_threshold(content_counts, blank_counts, strict=True)
+        return background_level, content_threshold, errors, f"误判{errors}个"
+
+    def fit(self, palette, background_level, content_threshold):
+        """拟合全部参数，返回 (新调色板, 背景灰度阈值, 内容阈值, 报告文本行)"""
+        if not self.samples:
+            raise ValueError("没有校准样本")
+
+        report = []
+        fitted_palette = []
+        for color in palette:
+            result = self.fit_color(color)
+            if result is None:
+                fitted_palette.append(color)
+                report.append(f"{color.name}: 没有样本，保持原参数")
+                continue
+            fitted, errors, positives = result
+            fitted_palette.append(fitted)
+            report.append(f"{color.name}: RGB{tuple(fitted.rgb)} 容差{fitted.tolerance} "
+                          f"最少像素{fitted.min_pixels}（{positives}个正样本，误判{errors}个）")
+
+        background_level, content_threshold, _, note = self.fit_content(background_level, content_threshold)
+        report.append(f"内容: 灰度<{background_level} 像素数>{content_threshold}（{note}）")
+        return fitted_palette, background_level, content_threshold, report
+
+
+def calibration_labels(palette):
+    """校准对话框中可选的标签"""
+    return [BLANK, NO_COLOR] + [color.name for color in palette]
@@ -0,0 +1,384 @@
+"""屏幕截图：截图后端与截图规划"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CaptureBackend:
+    """截图后端接口：grab 按 bbox=(x1, y1, x2, y2) 返回 HxWx3 的 uint8 RGB 数组"""
+
+    name = "base"
+
+    def grab(self, bbox):
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端持有的资源"""
+        pass
+
+
+class ImageGrabBackend(CaptureBackend):
+    """基于 PIL.ImageGrab 的截图后端，每次截图都会新建图像"""
+
+    name = "imagegrab"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._image_grab = ImageGrab
+
+    def grab(self, bbox):
+        image = self._image_grab.grab(bbox=bbox)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return np.asarray(image)
+
+
+class GdiCaptureBackend(CaptureBackend):
+    """Windows GDI 截图后端：复用屏幕DC、内存DC和DIB缓冲区
+
+    每个线程的每个截图矩形对应一块常驻缓冲区，返回的数组在同一线程
+    下一次截取同一矩形时会被覆盖，需要保留时请自行复制；不同线程（界面
+    测试截图与洗练线程）的缓冲区互不影响，共用的DC在锁内串行使用
+    """
+
+    name = "gdi"
+
+    SRCCOPY = 0x00CC0020
+    DIB_RGB_COLORS = 0
+    MAX_BUFFERS = 16  # 洗练线程和界面线程各自的截图矩形
+
+    def __init__(self):
+        if sys.platform != "win32":
+            raise OSError("GDI截图后端仅支持Windows系统")
+
+        import ctypes
+        from ctypes import wintypes
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ("biSize", wintypes.DWORD),
+                ("biWidth", wintypes.LONG),
+                ("biHeight", wintypes.LONG),
+                ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD),
+                ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD),
+                ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG),
+                ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD),
+            ]
+
+        self._ctypes = ctypes
+        self._header_type = BITMAPINFOHEADER
+        self._user32 = ctypes.windll.user32
+        self._gdi32 = ctypes.windll.gdi32
+
+        self._gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        self._gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        self._gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+        self._gdi32.CreateDIBSection.argtypes = [
+            wintypes.HDC, ctypes.c_void_p, wintypes.UINT,
+            ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+        self._gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        self._gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        self._gdi32.BitBlt.argtypes = [
+            wintypes.HDC, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            wintypes.HDC, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+        self._gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        self._gdi32.DeleteDC.argtypes = [wintypes.HDC]
+        self._user32.GetDC.restype = wintypes.HDC
+        self._user32.GetDC.argtypes = [wintypes.HWND]
+        self._user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+
+        # 与 ImageGrab 一致，截图时按物理像素坐标（Per-Monitor DPI感知）
+        self._set_dpi_context = getattr(self._user32, "SetThreadDpiAwarenessContext", None)
+        if self._set_dpi_context:
+            self._set_dpi_context.restype = ctypes.c_void_p
+            self._set_dpi_context.argtypes = [ctypes.c_void_p]
+
+        self._lock = threading.Lock()
+        self._screen_dc = self._user32.GetDC(None)
+        self._mem_dc = self._gdi32.CreateCompatibleDC(self._screen_dc)
+        if not self._screen_dc or not self._mem_dc:
+            self.close()
+            raise OSError("创建截图设备上下文失败")
+
+        # (线程, 截图矩形) -> (位图句柄, BGRA视图, RGB输出缓冲区)
+        self._buffers = OrderedDict()
+
+    def _get_buffer(self, key, width, height):
+        """获取截图矩形对应的常驻缓冲区，必要时创建"""
+        entry = self._buffers.get(key)
+        if entry is not None:
+            self._buffers.move_to_end(key)
+            return entry
+
+        ctypes = self._ctypes
+        header = self._header_type()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth = width
+        header.biHeight = -height  # 负值表示自上而下的行顺序
+        header.biPlanes = 1
+        header.biBitCount = 32
+        header.biCompression = 0
+
+        bits = ctypes.c_void_p()
+        bitmap = self._gdi32.CreateDIBSection(self._mem_dc, ctypes.byref(header),
+                                              self.DIB_RGB_COLORS, ctypes.byref(bits), None, 0)
+        if not bitmap or not bits.value:
+            raise OSError("创建截图缓冲区失败")
+
+        raw = (ctypes.c_ubyte * (width * height * 4)).from_address(bits.value)
+        bgra = np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+        rgb = np.empty((height, width, 3), dtype=np.uint8)
+        entry = (bitmap, bgra, rgb)
+        self._buffers[key] = entry
+
+        while len(self._buffers) > self.MAX_BUFFERS:
+            _, (old_bitmap, _, _) = self._buffers.popitem(last=False)
+            self._gdi32.DeleteObject(old_bitmap)
+
+        return entry
+
+    def grab(self, bbox):
+        x1, y1, x2, y2 = bbox
+        width, height = x2 - x1, y2 - y1
+        if width <= 0 or height <= 0:
+            return np.empty((max(height, 0), max(width, 0), 3), dtype=np.uint8)
+
+        with self._lock:
+            bitmap, bgra, rgb = self._get_buffer((threading.get_ident(), tuple(bbox)), width, height)
+            previous_context = self._set_dpi_context(-3) if self._set_dpi_context else None
+            try:
+                self._gdi32.SelectObject(self._mem_dc, bitmap)
+                if not self._gdi32.BitBlt(self._mem_dc, 0, 0, width, height,
+                                          self._screen_dc, x1, y1, self.SRCCOPY):
+                    raise OSError("BitBlt截图失败")
+            finally:
+                if previous_context:
+                    self._set_dpi_context(previous_context)
+
+            np.copyto(rgb, bgra[:, :, 2::-1])
+            return rgb
+
+    def close(self):
+        with self._lock:
+            for bitmap, _, _ in self._buffers.values():
+                self._gdi32.DeleteObject(bitmap)
+            self._buffers.clear()
+            if getattr(self, "_mem_dc", None):
+                self._gdi32.DeleteDC(self._mem_dc)
+                self._mem_dc = None
+            if getattr(self, "_screen_dc", None):
+                self._user32.ReleaseDC(None, self._screen_dc)
+                self._screen_dc = None
+
+
+class ReplayCaptureBackend(CaptureBackend):
+    """回放截图后端：从录制的整屏画面中按 bbox 裁剪，无需显示器
+
+    frames 为 HxWx3 数组序列，origin 为画面左上角对应的屏幕坐标；
+    advance() 切换到下一帧，loop 为 True 时播放完后从头开始
+    """
+
+    name = "replay"
+
+    def __init__(self, frames, origin=(0, 0), loop=True):
+        self.frames = [np.ascontiguousarray(np.asarray(frame, dtype=np.uint8)[:, :, :3])
+                       for frame in frames]
+        if not self.frames:
+            raise ValueError("回放截图后端至少需要一帧画面")
+        self.origin = tuple(origin)
+        self.loop = loop
+        self.index = 0
+        self.grab_count = 0
+
+    @classmethod
+    def from_directory(cls, path, origin=(0, 0), loop=True):
+        """从目录加载画面（按文件名排序的 .npy / .png / .bmp 文件）"""
+        frames = []
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            extension = os.path.splitext(name)[1].lower()
+            if extension == ".npy":
+                frames.append(np.load(file_path))
+            elif extension in (".png", ".bmp"):
+                from PIL import Image
+                with Image.open(file_path) as image:
+                    frames.append(np.asarray(image.convert("RGB")))
+        return cls(frames, origin=origin, loop=loop)
+
+    @property
+    def current_frame(self):
+        return self.frames[self.index]
+
+    def advance(self, steps=1):
+        """切换到后续画面，返回是否成功"""
+        target = self.index + steps
+        if target >= len(self.frames):
+            if not self.loop:
+                self.index = len(self.frames) - 1
+                return False
+            target %= len(self.frames)
+        self.index = target
+        return True
+
+    def grab(self, bbox):
+        frame = self.current_frame
+        x1, y1, x2, y2 = bbox
+        left, top = x1 - self.origin[0], y1 - self.origin[1]
+        right, bottom = x2 - self.origin[0], y2 - self.origin[1]
+        if left < 0 or top < 0 or bottom > frame.shape[0] or right > frame.shape[1]:
+            raise ValueError(f"截图区域{bbox}超出回放画面范围")
+
+        self.grab_count += 1
+        return frame[top:bottom, left:right]
+
+
+def create_capture_backend(name="auto", replay_path=None):
+    """按名称创建截图后端，auto 在Windows上优先使用GDI后端"""
+    if name == ReplayCaptureBackend.name:
+        if not replay_path:
+            raise ValueError("回放截图后端需要指定画面目录")
+        return ReplayCaptureBackend.from_directory(replay_path)
+    if name in ("auto", GdiCaptureBackend.name) and sys.platform == "win32":
+        try:
+            return GdiCaptureBackend()
+        except Exception:
+            if name == GdiCaptureBackend.name:
+                raise
+    if name in ("auto", ImageGrabBackend.name):
+        return ImageGrabBackend()
+    raise ValueError(f"未知的截图后端: {name}")
+
+
+class CaptureCostModel:
+    """截图耗时模型：每次截图的固定开销 + 按像素计算的开销"""
+
+    # 默认值来自普通1080p桌面上 ImageGrab 的实测量级
+    DEFAULT_FIXED_COST = 0.015
+    DEFAULT_PIXEL_COST = 4e-9
+
+    def __init__(self, fixed_cost=DEFAULT_FIXED_COST, pixel_cost=DEFAULT_PIXEL_COST):
+        self.fixed_cost = max(0.0, float(fixed_cost))
+        self.pixel_cost = max(0.0, float(pixel_cost))
+
+    def estimate(self, rect):
+        """估算截取一个矩形的耗时（秒）"""
+        x1, y1, x2, y2 = rect
+        return self.fixed_cost + self.pixel_cost * (x2 - x1) * (y2 - y1)
+
+    @classmethod
+    def measure(cls, grab, origin=(0, 0), sizes=(16, 64, 256), repeats=3):
+        """实测截图耗时并用最小二乘拟合出固定开销和像素开销
+
+        grab 接收 bbox 返回图像，origin 为测量用矩形的左上角
+        """
+        x, y = origin
+        pixels = []
+        timings = []
+        for size in sizes:
+            rect = (x, y, x + size, y + size)
+            grab(rect)  # 预热，排除首次初始化的开销
+            for _ in range(repeats):
+                start = time.perf_counter()
+                grab(rect)
+                timings.append(time.perf_counter() - start)
+                pixels.append(size * size)
+
+        if len(set(pixels)) < 2:
+            return cls()
+
+        pixel_cost, fixed_cost = np.polyfit(pixels, timings, 1)
+        return cls(fixed_cost=fixed_cost, pixel_cost=pixel_cost)
+
+    def __repr__(self):
+        return (f"CaptureCostModel(fixed_cost={self.fixed_cost:.6f}, "
+                f"pixel_cost={self.pixel_cost:.3e})")
+
+
+def union_rect(rects):
+    """计算多个矩形的外接矩形"""
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+def _partitions(items):
+    """枚举列表的所有划分（6个区域共203种）"""
+    if not items:
+        yield []
+        return
+    first, rest = items[0], items[1:]
+    for partition in _partitions(rest):
+        for i in range(len(partition)):
+            yield partition[:i] + [[first] + partition[i]] + partition[i + 1:]
+        yield [[first]] + partition
+
+
+class CapturePlan:
+    """截图计划：需要截取的矩形，以及每个检测区域在截图中的位置"""
+
+    def __init__(self, rects, area_slices, estimated_cost=0.0):
+        self.rects = rects
+        self.area_slices = area_slices
+        self.estimated_cost = estimated_cost
+
+    def grab(self, grab):
+        """按计划截图，返回每个矩形对应的 numpy 数组"""
+        return [np.asarray(grab(rect)) for rect in self.rects]
+
+    def extract(self, frames):
+        """从截图中切出各区域图像（numpy 视图，不复制数据）"""
+        images = []
+        for entry in self.area_slices:
+            if entry is None:
+                images.append(None)
+                continue
+            rect_index, rows, cols = entry
+            images.append(frames[rect_index][rows, cols])
+        return images
+
+    def capture(self, grab):
+        """截图并返回各区域图像"""
+        return self.extract(self.grab(grab))
+
+    def __repr__(self):
+        return f"CapturePlan(rects={self.rects}, estimated_cost={self.estimated_cost:.4f}s)"
+
+
+def plan_captures(areas, cost_model=None):
+    """为检测区域生成总耗时最小的截图计划
+
+    在"一次截取外接矩形"和"按簇分别截取"之间，根据耗时模型选出最优划分
+    """
+    cost_model = cost_model or CaptureCostModel()
+    indexed = [i for i, area in enumerate(areas) if area]
+    if not indexed:
+        return CapturePlan([], [None] * len(areas))
+
+    best_cost = None
+    best_groups = None
+    for partition in _partitions(indexed):
+        groups = [(group, union_rect([areas[i] for i in group])) for group in partition]
+        cost = sum(cost_model.estimate(rect) for _, rect in groups)
+        # 耗时相同时优先截图次数少的方案
+        if best_cost is None or (cost, len(groups)) < (best_cost, len(best_groups)):
+            best_cost = cost
+            best_groups = groups
+
+    rects = []
+    area_slices = [None] * len(areas)
+    for rect_index, (group, rect) in enumerate(best_groups):
+        rects.append(rect)
+        for i in group:
+            x1, y1, x2, y2 = areas[i]
+            area_slices[i] = (rect_index,
+                              slice(y1 - rect[1], y2 - rect[1]),
+                              slice(x1 - rect[0], x2 - rect[0]))
+
+    return CapturePlan(rects, area_slices, best_cost)
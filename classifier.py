@@ -0,0 +1,232 @@
+"""区域颜色分类：单次遍历同时统计红色像素和非背景像素"""
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+def sampling_steps(height, width, stride=1, max_samples=None):
+    """区域尺寸对应的采样 (纵向步长, 横向步长, 缩放比例)
+
+    缩放比例 = 总像素数 / 采样像素数，用于把阈值换算到采样后的计数
+    """
+    step = max(1, int(stride))
+    if max_samples and height * width > max_samples:
+        step = max(step, math.ceil(math.sqrt(height * width / max_samples)))
+    step_y, step_x = min(step, max(1, height)), min(step, max(1, width))
+
+    sampled = len(range(step_y // 2, height, step_y)) * len(range(step_x // 2, width, step_x))
+    if step_y == step_x == 1 or not sampled:
+        return 1, 1, 1.0
+    return step_y, step_x, height * width / sampled
+
+
+def scale_thresholds(min_count, above_count, scale):
+    """把 "计数 >= min_count" 和 "计数 > above_count" 两类阈值换算到采样后的计数"""
+    if scale == 1.0:
+        return min_count, above_count
+    return (max(1, math.ceil(min_count / scale - 1e-9)),
+            math.floor(above_count / scale + 1e-9))
+
+
+class RegionClassifier:
+    """基于查找表的融合分类器
+
+    每个通道一张 int32 查找表，低24位是该通道对灰度的贡献
+    （与 PIL 'L' 模式公式一致，已放大 65536 倍），第24位起是该通道
+    是否落在目标颜色容差范围内。三张表相加后：
+      - 高位 == 3 表示三个通道都在范围内，即红色像素
+      - 低24位 < 背景阈值 表示非背景像素
+    按行分块处理，红色和内容两个结论都确定后立即停止
+
+    采样模式：stride > 1 时每隔 stride 个像素取一个；max_samples 不为空时
+    按区域尺寸预先算出采样步长，使每个区域最多采样约 max_samples 个像素。
+    阈值按 总像素数 / 采样像素数 等比例缩放
+    """
+
+    RED_SHIFT = 24
+    GRAY_MASK = (1 << RED_SHIFT) - 1
+
+    def __init__(self, target=(220, 35, 85), tolerance=30, red_threshold=10,
+                 background_level=240, content_threshold=50, chunk_pixels=16384,
+                 stride=1, max_samples=None):
+        self.target = tuple(target)
+        self.tolerance = tolerance
+        self.red_threshold = red_threshold  # 红色像素数 >= 该值判定为红色
+        self.background_level = background_level  # 灰度 < 该值视为非背景
+        self.content_threshold = content_threshold  # 非背景像素数 > 该值判定为有内容
+        self.chunk_pixels = chunk_pixels
+        self.stride = max(1, int(stride))
+        self.max_samples = max_samples
+        self._sampling = {}  # (高, 宽) -> (纵向步长, 横向步长, 红色阈值, 内容阈值)
+
+        values = np.arange(256, dtype=np.int64)
+        weights = (19595, 38470, 7471)
+        self.luts = []
+        for channel in range(3):
+            low = self.target[channel] - tolerance
+            high = self.target[channel] + tolerance
+            in_range = ((values >= low) & (values <= high)).astype(np.int64)
+            lut = values * weights[channel] + (in_range << self.RED_SHIFT)
+            if channel == 0:
+                lut += 0x8000  # 灰度四舍五入
+            self.luts.append(lut.astype(np.int32))
+
+        self.red_level = 3 << self.RED_SHIFT
+        self.content_level = background_level << 16
+
+    @property
+    def sampling(self):
+        return self.stride > 1 or bool(self.max_samples)
+
+    def sampling_plan(self, height, width):
+        """区域尺寸对应的 (纵向步长, 横向步长, 缩放后的红色阈值, 缩放后的内容阈值)"""
+        key = (height, width)
+        plan = self._sampling.get(key)
+        if plan is not None:
+            return plan
+
+        step_y, step_x, scale = sampling_steps(height, width, self.stride, self.max_samples)
+        plan = (step_y, step_x) + scale_thresholds(self.red_threshold, self.content_threshold, scale)
+        self._sampling[key] = plan
+        return plan
+
+    def count(self, image, early_exit=True, red_threshold=None, content_threshold=None):
+        """统计红色像素数和非背景像素数
+
+        early_exit 为 True 时两个结论确定后即停止，返回的计数只保证结论正确
+        """
+        red_threshold = self.red_threshold if red_threshold is None else red_threshold
+        content_threshold = self.content_threshold if content_threshold is None else content_threshold
+        pixels = np.asarray(image)
+        height, width = pixels.shape[:2]
+        total = height * width
+        if total == 0:
+            return 0, 0
+
+        rows = max(1, self.chunk_pixels // width) if early_exit else height
+        lut_r, lut_g, lut_b = self.luts
+        scratch = np.empty((min(rows, height), width), dtype=np.int32)
+        red_pixels = 0
+        content_pixels = 0
+
+        for top in range(0, height, rows):
+            block = pixels[top:top + rows]
+            block_rows = block.shape[0]
+            summed = np.take(lut_r, block[:, :, 0])
+            np.take(lut_g, block[:, :, 1], out=scratch[:block_rows])
+            summed += scratch[:block_rows]
+            np.take(lut_b, block[:, :, 2], out=scratch[:block_rows])
+            summed += scratch[:block_rows]
+
+            red_pixels += np.count_nonzero(summed >= self.red_level)
+            summed &= self.GRAY_MASK
+            content_pixels += np.count_nonzero(summed < self.content_level)
+
+            if early_exit:
+                remaining = total - (top + block_rows) * width
+                red_settled = (red_pixels >= red_threshold or
+                               red_pixels + remaining < red_threshold)
+                content_settled = (content_pixels > content_threshold or
+                                   content_pixels + remaining <= content_threshold)
+                if red_settled and content_settled:
+                    break
+
+        return red_pixels, content_pixels
+
+    def classify(self, image):
+        """返回 (是否红色, 是否有内容)"""
+        pixels = np.asarray(image)
+        red_threshold, content_threshold = self.red_threshold, self.content_threshold
+        if self.sampling:
+            step_y, step_x, red_threshold, content_threshold = self.sampling_plan(*pixels.shape[:2])
+            if step_y > 1 or step_x > 1:
+                pixels = pixels[step_y // 2::step_y, step_x // 2::step_x]
+
+        red_pixels, content_pixels = self.count(pixels, True, red_threshold, content_threshold)
+        return bool(red_pixels >= red_threshold), bool(content_pixels > content_threshold)
+
+
+class ClassificationCache:
+    """按像素内容缓存分类结果
+
+    以区域尺寸和每隔 sample_step 行列取样像素的 CRC32 作为键，每次查找只需
+    哈希约 1/sample_step² 的像素；条目保存像素副本，只有键命中时才逐像素
+    完整校验，避免取样漏掉的差异或哈希碰撞导致误判。按条目数和像素字节
+    总量做 LRU 淘汰
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=32 * 1024 * 1024, sample_step=4):
+        self.max_entries = max_entries
+        self.sample_step = sample_step
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # 键 -> (最近使用时间, 像素副本, 结果)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def classify(self, image, compute):
+        """返回缓存的结果，未命中时调用 compute(image) 计算并缓存"""
+        pixels = np.asarray(image)
+        step = self.sample_step
+        sample = np.ascontiguousarray(pixels[step // 2::step, step // 2::step])
+        key = (pixels.shape, zlib.crc32(sample))
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and np.array_equal(entry[1], pixels):
+                self.entries[key] = (time.monotonic(), entry[1], entry[2])
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+
+        result = compute(pixels)
+
+        with self._lock:
+            self.misses += 1
+            if pixels.nbytes > self.max_bytes:
+                return result
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1].nbytes
+            self.entries[key] = (time.monotonic(), pixels.copy(), result)
+            self.total_bytes += pixels.nbytes
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, old_pixels, _) = self.entries.popitem(last=False)
+                self.total_bytes -= old_pixels.nbytes
+        return result
+
+    def expire(self, timeout):
+        """清理超过 timeout 秒未使用的条目，返回清理数量"""
+        deadline = time.monotonic() - timeout
+        removed = 0
+        with self._lock:
+            # 条目按使用时间排列，从最旧的开始清理
+            while self.entries:
+                key, (last_used, old_pixels, _) = next(iter(self.entries.items()))
+                if last_used > deadline:
+                    break
+                del self.entries[key]
+                self.total_bytes -= old_pixels.nbytes
+                removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary_text(self):
+        return (f"缓存: 命中{self.hits}次/未命中{self.misses}次 ({self.hit_rate() * 100:.0f}%), "
+                f"{len(self.entries)}条 {self.total_bytes / 1024 / 1024:.1f}MB")
@@ -0,0 +1,343 @@
+"""命令行洗练：不打开窗口，按配置文件运行洗练并输出每轮结果和洗练速度
+
+用法:
+  python cli.py [--config config.json] [--cycles N]
+  python cli.py --replay 画面目录 --cycles 50     # 用截图目录回放，每次"点击"切换到下一帧
+  python cli.py --fake-clients 4 --cycles 100     # 用模拟窗口试运行多客户端调度
+  python cli.py --estimate [--strategy 表达式]      # 按实际洗练结果估算达到目标的洗练次数
+
+配置文件中有 "sessions" 列表时同时洗练多个游戏窗口，每项覆盖顶层配置中的
+对应设置（通常是 name、wash_button_pos、detection_areas 和洗练目标）
+
+真实点击洗练时与界面一样记录洗练日志，结束时把累计洗练次数写回配置文件
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from capture import ReplayCaptureBackend
+from config_store import ConfigStore, WashJournal
+from engine import FINISH_FAILED, FINISH_STOPPED, WashEngine
+from input_driver import CallbackInputDriver, RecordingInputDriver, create_input_driver
+from scheduler import WashScheduler
+from simulator import DEFAULT_WASHES, OutcomeStats, report_lines
+
+COMMAND_LINE_STRATEGY = "命令行"  # --strategy 给出表达式时临时添加的预设名称
+JOURNAL_FILE = "wash_journal.log"  # 与界面相同，放在配置文件所在目录
+
+
+def format_areas(result, names):
+    """每个区域的检测结果：颜色名称、"-"（有内容但无目标颜色）、"空"（没有内容）或"跳过"（已确定未达到目标）"""
+    cells = []
+    for i, area in enumerate(result.area_results):
+        if area is None:
+            if i in result.skipped:
+                cells.append(f"{i + 1}:跳过")
+            continue
+        colors = area.get('colors') or ()
+        if colors:
+            text = "/".join(name for name in names if name in colors)
+        else:
+            text = "-" if area['has_content'] else "空"
+        cells.append(f"{i + 1}:{text}")
+    return " ".join(cells)
+
+
+def retry_mark(result):
+    """这一轮之前未生效而重试的点击次数"""
+    return f"  点击重试{result.missed_clicks}次" if result.missed_clicks else ""
+
+
+def run_estimate(engine, args):
+    """模拟当前策略，逐条约束输出估算的洗练次数"""
+    if args.estimate_from:
+        from recorder import SessionReader
+        reader = SessionReader(args.estimate_from)
+        engine.outcome_stats = OutcomeStats()
+        engine.outcome_stats.record_recording(reader)
+        reader.close()
+    print(engine.outcome_stats.summary_text())
+
+    start = time.perf_counter()
+    try:
+        estimates = engine.estimate_strategy(washes=args.washes)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+
+    for line in report_lines(estimates, args.cycle_time):
+        print(line)
+    print(f"模拟{args.washes}轮 × {len(estimates)}个策略，耗时{elapsed:.2f}秒")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="石板洗练助手（命令行无界面模式）")
+    parser.add_argument("--config", default="config.json", help="配置文件路径")
+    parser.add_argument("--cycles", type=int, help="最多洗练轮数，默认直到达到目标")
+    parser.add_argument("--replay", help="回放截图目录：用目录中的画面代替屏幕，点击时切换到下一帧")
+    parser.add_argument("--no-click", action="store_true", help="只检测不点击（画面由其他方式驱动）")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="输出性能统计的间隔（秒）")
+    parser.add_argument("--metrics", help="结束时把性能统计写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="输出引擎的全部日志")
+    parser.add_argument("--fake-clients", type=int, metavar="N",
+                        help="用 N 个模拟游戏窗口代替屏幕和鼠标，试运行多客户端调度")
+    parser.add_argument("--simulated-clock", action="store_true",
+                        help="配合 --fake-clients 使用模拟时钟，不真实等待")
+    parser.add_argument("--min-red", type=int, help="覆盖配置中的最低红色词条数量")
+    parser.add_argument("--strategy", help="使用的策略预设名称或策略表达式，如 \"area1 & count>=3\"")
+    parser.add_argument("--estimate", action="store_true",
+                        help="不洗练，按各区域的实际结果模拟策略，估算达到目标的洗练次数")
+    parser.add_argument("--estimate-from", metavar="录制文件",
+                        help="配合 --estimate 使用录制文件中的结果代替配置中累计的统计")
+    parser.add_argument("--washes", type=int, default=DEFAULT_WASHES, help="--estimate 模拟的洗练轮数")
+    parser.add_argument("--cycle-time", type=float, help="--estimate 换算耗时用的每轮洗练秒数（见性能统计）")
+    args = parser.parse_args(argv)
+
+    def on_log(message, level):
+        if args.verbose or level != "INFO":
+            print(f"[{level}] {message}", file=sys.stderr)
+
+    if args.fake_clients:
+        return run_fake_clients(args, on_log)
+
+    store = ConfigStore(args.config, on_error=lambda message: on_log(message, "ERROR"))
+    try:
+        config = store.load()
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if config is None:
+        print(f"未找到配置文件 {args.config}，请先在界面中设置洗练按钮和检测区域", file=sys.stderr)
+        return 2
+    if args.min_red is not None:
+        config["min_red_count"] = args.min_red
+    if config.get("sessions"):
+        return run_sessions(args, store, config, on_log)
+
+    engine = WashEngine(on_log=on_log)
+    engine.apply_config(config)
+    if not apply_strategy(engine, args.strategy):
+        return 2
+    if args.estimate:
+        return run_estimate(engine, args)
+
+    if args.replay:
+        backend = ReplayCaptureBackend.from_directory(args.replay)
+        engine.capture_backend = backend
+        engine.input_driver = CallbackInputDriver(lambda position: backend.advance())
+        engine.wash_button_pos = engine.wash_button_pos or (0, 0)
+        # 回放目录中相邻的画面可能相同，不按画面变化确认点击
+        engine.verify_clicks = False
+    elif args.no_click:
+        engine.input_driver = RecordingInputDriver()
+        # 不点击时画面不会变化，不确认点击
+        engine.verify_clicks = False
+    else:
+        try:
+            engine.input_driver = create_input_driver(engine.input_driver_name)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"{str(e)}；可使用 --replay 或 --no-click", file=sys.stderr)
+            return 2
+
+    # 回放和不点击时的计数不是真实的洗练，不记录也不保存
+    journal = None
+    if not (args.replay or args.no_click):
+        journal = open_journal(engine, store, on_log)
+
+    names = engine.color_engine.names
+
+    def on_cycle(result):
+        mark = retry_mark(result) + ("  达到目标" if result.reached else "")
+        print(f"第{result.wash_count}次  红色{result.red_count_text()}个  {format_areas(result, names)}  "
+              f"等待{result.settle_duration * 1000:.0f}ms{mark}", flush=True)
+
+    engine.on_cycle = on_cycle
+    engine.on_stats = lambda text: print(text, flush=True)
+    engine.stats_interval = args.stats_interval
+
+    try:
+        reason = engine.run(max_cycles=args.cycles)
+    except KeyboardInterrupt:
+        reason = "stopped"
+    finally:
+        engine.close()
+        if journal is not None:
+            save_wash_counts(store, [(None, engine)], on_log)
+            store.close()
+            journal.close()
+
+    metrics = engine.metrics
+    print(f"结束({reason})：本次洗练{metrics.wash_total}次，累计{engine.wash_count}次，"
+          f"速度{metrics.washes_per_minute():.1f}次/分")
+    print(engine.stats_text())
+    if args.metrics:
+        metrics.dump(args.metrics)
+        print(f"性能统计已写入 {args.metrics}")
+    return 1 if reason == FINISH_FAILED else 0
+
+
+def open_journal(engine, store, on_log):
+    """与界面相同：回放洗练日志恢复未保存的计数，之后每次洗练追加记录"""
+    journal = WashJournal(os.path.join(os.path.dirname(store.path), JOURNAL_FILE))
+    journaled = journal.replay()
+    if journaled > engine.wash_count:
+        on_log(f"已从洗练日志恢复洗练次数: {engine.wash_count} → {journaled}", "SUCCESS")
+        engine.wash_count = journaled
+    # 配置写入后计数已保存，日志即可清空
+    store.on_written = lambda config: journal.compact(config.get("wash_count", 0))
+    journal.open()
+    engine.journal = journal
+    return journal
+
+
+def save_wash_counts(store, engines, on_log):
+    """把累计洗练次数和各区域结果统计写回配置文件
+
+    engines 为 [(在 sessions 列表中的位置, 引擎)]，单开时位置为 None。重新读取
+    配置文件后只改这两项，命令行临时覆盖的设置（--min-red、--strategy）和
+    运行期间在界面中做的修改都不受影响
+    """
+    try:
+        config = store.load()
+    except ValueError as e:
+        on_log(str(e), "ERROR")
+        return
+    if config is None:
+        return
+    for index, engine in engines:
+        target = config if index is None else config["sessions"][index]
+        target["wash_count"] = engine.wash_count
+        target["outcome_stats"] = engine.outcome_stats.to_config()
+    store.save(config)
+
+
+def apply_strategy(engine, text):
+    """--strategy：预设名称直接选中，否则作为表达式编译，返回是否成功"""
+    if not text:
+        return True
+    if text not in engine.strategy_presets:
+        try:
+            engine.compile_strategy(text)
+        except ValueError as e:
+            print(f"策略无效: {str(e)}", file=sys.stderr)
+            return False
+        engine.strategy_presets[COMMAND_LINE_STRATEGY] = text
+        text = COMMAND_LINE_STRATEGY
+    engine.active_strategy = text
+    return True
+
+
+def session_configs(config):
+    """展开配置中的 sessions：每项覆盖顶层配置，返回 [(名称, 配置)]"""
+    base = {key: value for key, value in config.items() if key != "sessions"}
+    configs = []
+    for i, entry in enumerate(config["sessions"]):
+        merged = dict(base)
+        merged.update(entry)
+        name = str(merged.pop("name", f"客户端{i + 1}"))
+        # 各会话不能写同一个洗练历史文件，未单独指定时按会话名称区分
+        history = merged.get("history")
+        if history and history.get("path") and "history" not in entry:
+            root, ext = os.path.splitext(history["path"])
+            merged["history"] = {"path": f"{root}_{name}{ext}"}
+        configs.append((name, merged))
+    return configs
+
+
+def session_logger(name, on_log):
+    return lambda message, level: on_log(f"[{name}] {message}", level)
+
+
+def run_sessions(args, store, config, on_log):
+    """按配置中的 sessions 同时洗练多个游戏窗口"""
+    # 所有会话共用同一个鼠标，也共用同一个点击驱动
+    try:
+        driver = create_input_driver(config.get("input_driver") or "auto")
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"{str(e)}；可使用 --fake-clients 试运行", file=sys.stderr)
+        return 2
+
+    scheduler = WashScheduler()
+    for name, session_config in session_configs(config):
+        engine = WashEngine(input_driver=driver, on_log=session_logger(name, on_log))
+        engine.apply_config(session_config)
+        if not apply_strategy(engine, args.strategy):
+            return 2
+        scheduler.add_session(name, engine, max_cycles=args.cycles)
+
+    code = run_scheduler(args, scheduler)
+    # 各会话的计数写回 sessions 中对应的项，之后不再共用顶层的计数
+    save_wash_counts(store, list(enumerate(session.engine for session in scheduler.sessions)), on_log)
+    store.close()
+    return code
+
+
+def run_fake_clients(args, on_log):
+    """用模拟窗口运行多客户端调度，不需要游戏和 Windows"""
+    from fake_client import FakeGameScreen, SimulatedClock, create_fake_clients
+
+    clients = create_fake_clients(args.fake_clients)
+    if args.simulated_clock:
+        clock = SimulatedClock()
+        sleep = clock.sleep
+    else:
+        clock, sleep = time.perf_counter, None
+    screen = FakeGameScreen(clients, clock)
+    driver = RecordingInputDriver(target=screen.click, clock=clock)
+
+    scheduler = WashScheduler(clock=clock, sleep=sleep)
+    for i, client in enumerate(clients):
+        name = f"模拟{i + 1}"
+        engine = WashEngine(input_driver=driver, capture_backend=screen, clock=clock,
+                            perf_counter=clock, sleep=sleep, on_log=session_logger(name, on_log))
+        engine.apply_config(client.settings())
+        if args.min_red is not None:
+            engine.min_red_count = args.min_red
+        if not apply_strategy(engine, args.strategy):
+            return 2
+        scheduler.add_session(name, engine, max_cycles=args.cycles)
+
+    code = run_scheduler(args, scheduler)
+    print(f"模拟窗口: 点击{sum(client.clicks for client in clients)}次，"
+          f"动画中被忽略{sum(client.ignored_clicks for client in clients)}次，"
+          f"未点中按钮{screen.missed_clicks}次")
+    return code
+
+
+def run_scheduler(args, scheduler):
+    """运行多客户端调度，输出每轮结果和汇总"""
+    def on_cycle(session, result):
+        names = session.engine.color_engine.names
+        mark = retry_mark(result) + ("  达到目标" if result.reached else "")
+        print(f"[{session.name}] 第{result.wash_count}次  红色{result.red_count_text()}个  "
+              f"{format_areas(result, names)}  等待{result.settle_duration * 1000:.0f}ms{mark}", flush=True)
+
+    def on_finished(session, reason):
+        print(f"[{session.name}] 结束({reason})", flush=True)
+
+    scheduler.on_cycle = on_cycle
+    scheduler.on_finished = on_finished
+    try:
+        reasons = scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        reasons = {session.name: session.finish_reason or FINISH_STOPPED for session in scheduler.sessions}
+    finally:
+        for session in scheduler.sessions:
+            session.engine.close()
+
+    print(scheduler.summary_text())
+    if args.metrics:
+        report = {session.name: session.engine.metrics.snapshot() for session in scheduler.sessions}
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"性能统计已写入 {args.metrics}")
+    return 1 if all(reason == FINISH_FAILED for reason in reasons.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
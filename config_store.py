@@ -0,0 +1,233 @@
+"""配置持久化：合并短时间内的多次修改后在后台原子写入，洗练计数另记追加日志"""
+import json
+import os
+import threading
+import time
+
+
+class ConfigStore:
+    """config.json 读写
+
+    save() 只记录最新的配置并立即返回，后台线程在最后一次修改 delay 秒后
+    （连续修改时最迟 max_delay 秒）写入。写入先写临时文件并 fsync，再用
+    os.replace 替换原文件，任何时刻磁盘上都是完整的新文件或旧文件
+    """
+
+    def __init__(self, path, delay=0.5, max_delay=3.0, on_error=None, clock=time.monotonic):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.on_error = on_error  # on_error(消息)，写入失败时在后台线程调用
+        self.on_written = None  # on_written(配置)，写入成功后在写入线程调用
+        self.clock = clock
+
+        self.requests = 0  # save() 调用次数
+        self.writes = 0  # 实际写入次数
+        self._pending = None
+        self._pending_seq = 0
+        self._written_seq = 0
+        self._deadline = None
+        self._first_request = None
+        self._closed = False
+        self._thread = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def load(self):
+        """读取配置，文件不存在时返回 None
+
+        文件损坏（如旧版本写到一半崩溃）时另存为 .corrupt 后抛出 ValueError，
+        避免之后的保存覆盖掉仍可手工恢复的内容
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError as e:
+            backup = self.path + ".corrupt"
+            os.replace(self.path, backup)
+            raise ValueError(f"配置文件损坏（{e}），已另存为 {backup}")
+
+    def save(self, config):
+        """提交一份完整配置（调用后不应再修改该字典），稍后在后台写入"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("配置存储已关闭")
+            now = self.clock()
+            if self._first_request is None:
+                self._first_request = now
+            self._pending = config
+            self._pending_seq += 1
+            self._deadline = min(now + self.delay, self._first_request + self.max_delay)
+            self.requests += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="config-store", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _take_pending(self):
+        config, seq = self._pending, self._pending_seq
+        self._pending = None
+        self._first_request = None
+        return config, seq
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (self._pending is None or self.clock() < self._deadline):
+                    timeout = None if self._pending is None else self._deadline - self.clock()
+                    self._condition.wait(timeout)
+                config, seq = self._take_pending()
+                if config is None:
+                    return
+            self._write(config, seq)
+
+    def _write(self, config, seq):
+        with self._write_lock:
+            # flush() 可能已经写入了更新的配置
+            if seq <= self._written_seq:
+                return
+            temp_path = self.path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(config, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"保存配置失败: {str(e)}")
+                return
+            self._written_seq = seq
+            self.writes += 1
+
+        if self.on_written:
+            try:
+                self.on_written(config)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(f"保存配置后处理失败: {str(e)}")
+
+    def flush(self):
+        """在当前线程立即写入尚未写入的配置"""
+        with self._condition:
+            config, seq = self._take_pending()
+        if config is not None:
+            self._write(config, seq)
+
+    def close(self):
+        """写入剩余的修改并停止后台线程"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class WashJournal:
+    """洗练事件日志：每次点击追加一行 JSON，启动时据此恢复未保存的洗练计数
+
+    每条记录用一次 os.write 追加到系统缓存，程序崩溃也不会丢失；
+    落盘（fsync）由后台线程每隔 sync_interval 秒批量执行。
+    配置文件保存了不小于日志最后计数的洗练次数后，日志即可清空
+    """
+
+    def __init__(self, path, sync_interval=1.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.last_count = 0
+        self.records = 0  # 当前日志中的记录数
+        self._fd = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def replay(self):
+        """读取日志，返回记录的最大洗练计数（没有日志时为 0）
+
+        最后一行可能因崩溃只写了一半，无法解析的行直接跳过
+        """
+        count = 0
+        records = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    try:
+                        count = max(count, int(json.loads(line)["wash_count"]))
+                        records += 1
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        with self._lock:
+            self.last_count = max(self.last_count, count)
+            self.records = records
+        return count
+
+    def open(self):
+        """打开日志文件开始追加记录"""
+        if self._fd is not None:
+            return
+        flags = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self._fd = os.open(self.path, flags, 0o644)
+        # 崩溃时最后一行可能只写了一半，先换行，否则下一条记录会接在半行后面一起无法解析
+        size = os.lseek(self._fd, 0, os.SEEK_END)
+        if size:
+            os.lseek(self._fd, size - 1, os.SEEK_SET)
+            if os.read(self._fd, 1) != b"\n":
+                os.write(self._fd, b"\n")  # O_APPEND：总是写在文件末尾
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sync_loop, name="wash-journal", daemon=True)
+        self._thread.start()
+
+    def record(self, wash_count, timestamp):
+        """追加一次洗练事件"""
+        line = json.dumps({"wash_count": wash_count, "time": round(timestamp, 3)}) + "\n"
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, line.encode("utf-8"))
+            self.last_count = max(self.last_count, wash_count)
+            self.records += 1
+            self._dirty = True
+
+    def compact(self, saved_count):
+        """配置中已保存的计数不小于日志最后计数时清空日志，返回是否清空"""
+        with self._lock:
+            if self._fd is None or not self.records or self.last_count > saved_count:
+                return False
+            os.ftruncate(self._fd, 0)
+            self.records = 0
+            self._dirty = True
+            return True
+
+    def sync(self):
+        """把已追加的记录落盘"""
+        with self._lock:
+            if self._fd is None or not self._dirty:
+                return
+            self._dirty = False
+            fd = self._fd
+            # fsync 较慢，不持有锁，追加可以继续进行
+        os.fsync(fd)
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except OSError:
+                pass
+
+    def close(self):
+        """落盘并关闭日志文件"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            fd, self._fd = self._fd, None
+        if fd is not None:
+            os.fsync(fd)
+            os.close(fd)
@@ -0,0 +1,909 @@
+"""洗练引擎：检测、终止判断和洗练循环，不依赖任何界面
+
+截图后端、点击函数和时钟均由调用方注入，窗口界面和命令行都只是引擎的使用者
+"""
+import threading
+import time
+
+from capture import CaptureCostModel, create_capture_backend, plan_captures
+from classifier import ClassificationCache
+from evaluation import EvaluationPlan, plan_key
+from history import WashHistory
+from input_driver import CallbackInputDriver, create_input_driver
+from locator import AnchorLocator, load_template, save_template
+from metrics import WashMetrics
+from pacing import AdaptivePacer
+from palette import NO_COLOR, RED, ColorEngine, load_palette
+from recorder import SessionRecorder
+from runstate import RunState, RunStopped
+from settle import SettleDetector, frame_signature
+from simulator import DEFAULT_WASHES, OutcomeStats, constraint_steps, simulate
+from strategy import Strategy, legacy_expression
+
+AREA_COUNT = 6
+
+# 洗练循环结束的原因
+FINISH_REACHED = "reached"  # 达到洗练目标
+FINISH_FAILED = "failed"  # 连续失败或缺少必要设置
+FINISH_STOPPED = "stopped"  # 调用 stop()
+FINISH_LIMIT = "limit"  # 达到指定轮数
+
+
+class CycleResult:
+    """一次洗练的检测结果"""
+
+    def __init__(self, wash_count, red_count, area_results, settle_duration, reached, skipped=(),
+                 missed_clicks=0):
+        self.wash_count = wash_count
+        self.red_count = red_count
+        self.area_results = area_results  # 每个区域 {'red', 'has_content', 'colors'}，未设置或失败为 None
+        self.settle_duration = settle_duration
+        self.reached = reached
+        self.skipped = tuple(skipped)  # 提前确定未达到目标而跳过分析的区域
+        self.missed_clicks = missed_clicks  # 这一轮洗练前未生效而重试的点击次数
+
+    def red_count_text(self):
+        """红色数量的显示文本：跳过了区域时只统计了已分析的区域，显示为 至少N"""
+        return f"至少{self.red_count}" if self.skipped else str(self.red_count)
+
+
+class WashEngine:
+    """洗练引擎
+
+    input_driver 为点击驱动（input_driver.InputDriver），为空时按 input_driver_name 创建，
+    也可以只传入点击函数 click(位置)；capture_backend 为空时按 capture_backend_name 创建；
+    clock（时间戳）、perf_counter（计时）和 sleep 可替换为模拟时钟；sleep 为空时
+    洗练循环中的等待都可被暂停和停止立即打断。
+    回调均在洗练线程中调用：
+      on_log(消息, 级别)、on_cycle(CycleResult)、on_stats(统计文本)、
+      on_finished(结束原因, 最后一次 CycleResult 或 None)
+    """
+
+    def __init__(self, click=None, capture_backend=None, clock=time.time,
+                 perf_counter=time.perf_counter, sleep=None, on_log=None, input_driver=None):
+        if input_driver is None and click is not None:
+            input_driver = CallbackInputDriver(click)
+        self.clock = clock
+        self.perf_counter = perf_counter
+        self.sleep = sleep
+
+        self.on_log = on_log
+        self.on_cycle = None
+        self.on_stats = None
+        self.on_finished = None
+        self.stats_interval = 5.0  # 统计回调间隔（秒）
+
+        # 洗练设置
+        self.wash_button_pos = None
+        self.detection_areas = [None] * AREA_COUNT
+        self.use_advanced_strategy = False
+        self.area_color_requirements = [NO_COLOR] * AREA_COUNT
+        self.min_red_count = 1
+        # 策略预设 {名称: 表达式}，选中预设时按表达式判断，否则按上面的基础/高级设置
+        self.strategy_presets = {}
+        self.active_strategy = None
+        self.strategies = {}  # 已编译的策略（真值表），表达式不变时直接复用
+        self.evaluation_plan = None  # 按洗练策略编译的区域分析顺序，策略变化时重建
+        self.outcome_stats = OutcomeStats()  # 各区域实际出现各颜色的次数，用于估算策略代价
+
+        # 运行状态，洗练计数器全局累加，不随开始洗练重置
+        self.run_state = RunState()  # 空闲/运行/暂停/停止中
+        self.wash_count = 0
+        self.last_result = None
+        self.thread = None
+        self.journal = None  # 洗练事件日志（WashJournal），每次确认点击生效后追加计数
+
+        # 分类结果缓存：相同像素内容（如点击未生效、重复测试）直接复用结果
+        self.image_cache = ClassificationCache()
+        self.cache_timeout = 600  # 缓存超时时间（秒）
+
+        # 颜色识别：调色板默认只有红色 (220, 35, 85) ± 30，红色像素 >= 10，非背景像素 > 50
+        # 采样模式默认关闭（步长1、不限采样数），开启后阈值按采样比例缩放
+        self.palette = load_palette(None)
+        self.sampling_stride = 1
+        self.sampling_max_samples = None
+        self.background_level = 240  # 灰度 < 该值视为非背景
+        self.content_threshold = 50  # 非背景像素数 > 该值视为有内容
+        self.color_engine = ColorEngine(self.palette)
+
+        # 截图后端：未注入时首次截图按配置创建，之后复用
+        self.capture_backend_name = "auto"
+        self.replay_path = None
+        self.capture_backend = capture_backend
+
+        # 点击驱动：未注入时首次点击按配置创建，点击不附加任何等待
+        self.input_driver_name = "auto"
+        self.input_driver = input_driver
+
+        # 截图规划：耗时模型在首次洗练时实测，计划随检测区域变化重建
+        self.capture_cost_model = None
+        self.capture_plan = None
+        self.capture_plan_areas = None
+
+        # 检测画面录制（默认关闭），写入定长环形文件
+        self.recording_enabled = False
+        self.recording_path = "session.rec"
+        self.recording_slots = 2000
+        self.recording_max_mb = 256
+        self.session_recorder = None
+
+        # 洗练历史（history_path 为空时不保存），每轮追加一条定长记录
+        self.history_path = None
+        self.history = None
+
+        # 动画结束检测，轮询间隔可在配置中调整
+        self.settle_poll_interval = 0.03
+        self.settle_stable_polls = 2  # 画面变化后连续静止的采样次数
+        self.settle_detector = SettleDetector(poll_interval=self.settle_poll_interval,
+                                              stable_polls=self.settle_stable_polls)
+
+        # 点击确认：等待动画后画面与点击前相同视为点击未生效（失去焦点、客户端卡顿），
+        # 撤销这次计数并立即重新点击，每轮最多重试 click_retries 次
+        self.verify_clicks = True
+        self.click_retries = 2
+        self.click_reference = None  # 最近一次点击前的画面签名
+        self.click_rechecked = False  # 这次点击是否已按响应延迟多等待过一次
+        self.last_click_time = None  # 最近一次点击的时间
+        self.missed_clicks = 0  # 累计未生效的点击，不计入洗练次数
+        self.cycle_missed_clicks = 0  # 当前这一轮已重试的次数
+
+        # 窗口锚点（可选）：每轮洗练前校验，窗口移动后按锚点位移平移按钮和检测区域
+        self.locator = None
+        self.anchor_template_path = "anchor.png"
+        self.screen_size = None  # 屏幕大小 (宽, 高)，锚点的默认搜索范围
+        self.anchor_exclude = ()  # 多开时其他窗口锚点的位置，重新搜索时跳过
+
+        # 洗练节奏：间隔在 [最小, 最大] 范围内自适应
+        self.pacing_min_delay = 0.0
+        self.pacing_max_delay = 1.0
+        self.pacer = AdaptivePacer(min_delay=self.pacing_min_delay, max_delay=self.pacing_max_delay)
+
+        # 性能监控：各阶段耗时直方图和洗练速度
+        self.metrics = WashMetrics()
+
+    def log(self, message, level="INFO"):
+        """记录日志（转发给 on_log 回调）"""
+        if self.on_log:
+            self.on_log(message, level)
+
+    def get_capture_backend(self):
+        """获取截图后端，首次使用时创建"""
+        if self.capture_backend is None:
+            self.capture_backend = create_capture_backend(self.capture_backend_name,
+                                                          self.replay_path)
+            self.log(f"截图后端: {self.capture_backend.name}")
+        return self.capture_backend
+
+    def get_input_driver(self):
+        """获取点击驱动，首次使用时创建"""
+        if self.input_driver is None:
+            self.input_driver = create_input_driver(self.input_driver_name)
+            self.log(f"点击驱动: {self.input_driver.name}")
+        return self.input_driver
+
+    def get_capture_plan(self):
+        """获取当前检测区域的截图计划，区域变化时重新规划"""
+        areas = tuple(self.detection_areas)
+        if self.capture_plan is None or self.capture_plan_areas != areas:
+            self.capture_plan = plan_captures(list(areas), self.capture_cost_model)
+            self.capture_plan_areas = areas
+        return self.capture_plan
+
+    def measure_capture_cost(self):
+        """实测截图耗时模型，用于截图规划"""
+        origin = next((area[:2] for area in self.detection_areas if area), (0, 0))
+        try:
+            self.capture_cost_model = CaptureCostModel.measure(self.get_capture_backend().grab,
+                                                               origin=origin)
+        except Exception as e:
+            self.capture_cost_model = CaptureCostModel()
+            self.log(f"截图耗时测量失败，使用默认模型: {str(e)}", "ERROR")
+
+        self.capture_plan = None
+        plan = self.get_capture_plan()
+        self.log(f"区域截图计划: 每轮{len(plan.rects)}次截图，"
+                 f"预计{plan.estimated_cost * 1000:.1f}ms")
+
+    def capture_areas(self):
+        """按截图计划截取所有检测区域，未设置的区域为 None"""
+        return self.get_capture_plan().capture(self.get_capture_backend().grab)
+
+    def is_red_area(self, image):
+        """判断区域是否为红色"""
+        return RED in self.color_engine.classify(image)[0]
+
+    def is_any_color_area(self, image):
+        """判断区域是否有任意颜色（非空白）"""
+        return self.color_engine.classify(image)[1]
+
+    def classify_area(self, image):
+        """一次遍历得到 (区域中出现的颜色集合, 是否有内容)，相同画面使用缓存结果"""
+        return self.image_cache.classify(image, self.color_engine.classify)
+
+    def rebuild_color_engine(self):
+        """调色板、阈值或采样设置变化后重建颜色识别引擎"""
+        self.color_engine = ColorEngine(self.palette, background_level=self.background_level,
+                                        content_threshold=self.content_threshold,
+                                        stride=self.sampling_stride,
+                                        max_samples=self.sampling_max_samples)
+        self.image_cache.clear()
+        # 策略中的颜色名按调色板校验，调色板变化后重新编译
+        self.strategies.clear()
+
+    def open_session_recorder(self):
+        """按当前检测区域创建录制文件"""
+        self.close_session_recorder()
+        if not self.recording_enabled:
+            return
+
+        try:
+            self.session_recorder = SessionRecorder(self.recording_path, self.detection_areas,
+                                                    slots=self.recording_slots,
+                                                    max_bytes=self.recording_max_mb * 1024 * 1024)
+            previous = self.session_recorder.previous_path
+            self.log(f"检测画面录制已开启: {self.recording_path} "
+                     f"({self.session_recorder.slots}个槽位)"
+                     + (f"，上次的录制已保存为 {previous}" if previous else ""))
+        except Exception as e:
+            self.session_recorder = None
+            self.log(f"创建录制文件失败: {str(e)}", "ERROR")
+
+    def open_history(self):
+        """打开洗练历史文件（已打开时不重复打开）"""
+        if self.history is not None or not self.history_path:
+            return
+        try:
+            self.history = WashHistory(self.history_path)
+        except Exception as e:
+            self.history = None
+            self.log(f"打开洗练历史失败: {str(e)}", "ERROR")
+
+    def close_history(self):
+        """关闭洗练历史文件"""
+        if self.history is not None:
+            try:
+                self.history.close()
+            except Exception as e:
+                self.log(f"关闭洗练历史失败: {str(e)}", "ERROR")
+            self.history = None
+
+    def close_session_recorder(self):
+        """关闭录制文件"""
+        if self.session_recorder is not None:
+            try:
+                self.session_recorder.close()
+            except Exception as e:
+                self.log(f"关闭录制文件失败: {str(e)}", "ERROR")
+            self.session_recorder = None
+
+    def stats_text(self):
+        """界面显示用的性能统计文本"""
+        lines = [self.metrics.summary_text(), self.pacer.summary_text(), self.image_cache.summary_text()]
+        click = self.metrics.histograms["click"]
+        if self.input_driver and click.count:
+            lines.append(f"点击驱动: {self.input_driver.name}，{click.count}次，"
+                         f"平均{click.total / click.count * 1000:.2f}ms")
+        if self.missed_clicks:
+            lines.append(f"点击未生效: {self.missed_clicks}次（已立即重试，不计入洗练次数）")
+        if self.evaluation_plan:
+            lines.append(self.evaluation_plan.summary_text())
+        if self.locator:
+            lines.append(self.locator.summary_text())
+        return "\n".join(lines)
+
+    def set_anchor(self, rect):
+        """以屏幕上 rect 范围的画面作为窗口锚点（应选面板上固定不变的图案，如标题）"""
+        rect = tuple(rect)
+        template = self.get_capture_backend().grab(rect)
+        locator = AnchorLocator(template, rect[:2])
+        save_template(self.anchor_template_path, template)
+        self.locator = locator
+
+    def clear_anchor(self):
+        """停用窗口锚点"""
+        self.locator = None
+
+    def relocate(self):
+        """校验窗口锚点，窗口移动后重新搜索并平移按钮和检测区域，返回是否移动"""
+        locator = self.locator
+        if locator is None:
+            return False
+        grab = self.get_capture_backend().grab
+        if locator.verify(grab):
+            return False
+
+        old_x, old_y = locator.origin
+        stage_start = self.perf_counter()
+        origin = locator.search(grab, locator.default_search_area(self.screen_size), self.anchor_exclude)
+        locator.last_search_time = self.perf_counter() - stage_start
+        if origin is None:
+            raise RuntimeError("未找到窗口锚点，游戏窗口可能被遮挡或最小化")
+
+        dx, dy = origin[0] - old_x, origin[1] - old_y
+        if not dx and not dy:
+            return False
+        self.translate(dx, dy)
+        self.log(f"游戏窗口已移动({dx:+d}, {dy:+d})，"
+                 f"重新定位用时{locator.last_search_time * 1000:.0f}ms")
+        return True
+
+    def translate(self, dx, dy):
+        """平移洗练按钮和所有检测区域"""
+        if self.wash_button_pos:
+            self.wash_button_pos = (self.wash_button_pos[0] + dx, self.wash_button_pos[1] + dy)
+        for i, area in enumerate(self.detection_areas):
+            if area:
+                self.detection_areas[i] = (area[0] + dx, area[1] + dy, area[2] + dx, area[3] + dy)
+        # 旧位置的画面特征不再适用于动画检测
+        self.settle_detector.last_signature = None
+
+    @property
+    def is_running(self):
+        """洗练循环已开始且没有请求停止（包括暂停中）"""
+        return self.run_state.is_running
+
+    @property
+    def is_paused(self):
+        return self.run_state.is_paused
+
+    def start(self, max_cycles=None):
+        """在后台线程中运行洗练循环，已在运行（或仍在停止中）时抛出 RuntimeError"""
+        self.run_state.start()
+        self.thread = threading.Thread(target=self._loop, args=(max_cycles,), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def run(self, max_cycles=None):
+        """在当前线程中运行洗练循环，返回结束原因"""
+        self.run_state.start()
+        return self._loop(max_cycles)
+
+    def pause(self):
+        """暂停洗练，正在进行的等待立即中断；返回是否由运行转为暂停"""
+        return self.run_state.pause()
+
+    def resume(self):
+        resumed = self.run_state.resume()
+        if resumed:
+            # 暂停期间画面可能被改动（换了装备），点击前重新截图作为参考
+            self.settle_detector.last_signature = None
+        return resumed
+
+    def stop(self):
+        """请求停止洗练，正在进行的等待立即结束，不再分析这一轮"""
+        self.run_state.stop()
+
+    def wait(self, seconds):
+        """洗练循环中的等待：等满返回 True，被暂停打断（已继续）返回 False，停止时抛出 RunStopped"""
+        if self.sleep is None:
+            return self.run_state.wait(seconds)
+        # 注入的 sleep（模拟时钟）不能被打断，等完后再检查状态
+        self.sleep(seconds)
+        return self.run_state.checkpoint()
+
+    def _loop(self, max_cycles):
+        """洗练主循环"""
+        consecutive_failures = 0
+        last_stats_update = self.clock()
+        cycles = 0
+        reason = FINISH_STOPPED
+        result = None
+
+        try:
+            if self.capture_cost_model is None:
+                self.measure_capture_cost()
+
+            self.open_session_recorder()
+            self.open_history()
+
+            while True:
+                # 暂停时阻塞在这里直到继续，停止时抛出 RunStopped
+                self.run_state.checkpoint()
+
+                if max_cycles is not None and cycles >= max_cycles:
+                    reason = FINISH_LIMIT
+                    break
+
+                if not self.wash_button_pos:
+                    self.log("洗练按钮位置未设置", "ERROR")
+                    reason = FINISH_FAILED
+                    break
+
+                try:
+                    result = self.run_cycle()
+                    cycles += 1
+                    if self.on_cycle:
+                        self.on_cycle(result)
+
+                    # 定时回调性能统计
+                    current_time = self.clock()
+                    if self.on_stats and current_time - last_stats_update > self.stats_interval:
+                        self.on_stats(self.stats_text())
+                        last_stats_update = current_time
+
+                    if result.reached:
+                        self.log(f"达到目标! 共 {result.red_count} 个红色词条 "
+                                 f"(第{result.wash_count}次洗练)", "SUCCESS")
+                        reason = FINISH_REACHED
+                        break
+
+                    consecutive_failures = 0
+
+                except RunStopped:
+                    raise
+                except Exception as e:
+                    self.log(f"洗练循环出错: {str(e)}", "ERROR")
+                    self.cycle_missed_clicks = 0
+                    consecutive_failures += 1
+                    self.pacer.back_off()
+
+                    if consecutive_failures >= 3:
+                        self.log("连续失败3次，停止洗练", "ERROR")
+                        reason = FINISH_FAILED
+                        break
+
+                # 按自适应节奏等待下一次洗练（被暂停打断时不计入统计）
+                stage_start = self.perf_counter()
+                if self.pacer.delay <= 0 or self.wait(self.pacer.delay):
+                    self.metrics.record("sleep", self.perf_counter() - stage_start)
+        except RunStopped:
+            reason = FINISH_STOPPED
+        finally:
+            self.run_state.finish()
+            self.close_session_recorder()
+            self.close_history()
+
+        if self.on_finished:
+            self.on_finished(reason, result)
+        return reason
+
+    def run_cycle(self):
+        """执行一次洗练：点击、等待动画、分析所有区域并判断是否达到目标"""
+        click_time = self.click_once()
+
+        # 等待动画完成，直接复用最后一次稳定的截图
+        plan = self.get_capture_plan()
+        frames = self.wait_for_animation_complete(plan=plan)
+        # 画面没有变化时立即重新点击，重试次数用完时 confirm_click 抛出 RuntimeError
+        while not self.confirm_click():
+            click_time = self.click_once()
+            plan = self.get_capture_plan()
+            frames = self.wait_for_animation_complete(plan=plan)
+        return self.analyze(plan, frames, click_time, self.clock())
+
+    def click_once(self):
+        """校验窗口位置后点击洗练按钮并累加计数，返回点击时间"""
+        metrics = self.metrics
+        self.relocate()
+        self.click_reference = self.capture_click_reference()
+        self.click_rechecked = False
+
+        self.wash_count += 1
+        click_time = self.clock()
+        driver = self.get_input_driver()
+        stage_start = self.perf_counter()
+        driver.click(self.wash_button_pos)
+        metrics.record("click", self.perf_counter() - stage_start)
+        self.last_click_time = click_time
+        self.log(f"第{self.wash_count}次洗练")
+        return click_time
+
+    def capture_click_reference(self):
+        """点击前的画面签名：沿用上一轮等待动画结束时的签名，没有时（首轮、窗口移动或继续后）立即截图"""
+        detector = self.settle_detector
+        if not self.verify_clicks or detector.last_signature is not None:
+            return detector.last_signature
+        plan = self.get_capture_plan()
+        if not plan.rects:
+            return None
+        try:
+            frames = plan.grab(self.get_capture_backend().grab)
+        except Exception:
+            # 截图失败时这一轮不确认点击
+            return None
+        # 同时作为等待动画的参考签名，尽早确认动画已开始
+        detector.last_signature = frame_signature(plan.extract(frames), detector.block_size)
+        return detector.last_signature
+
+    def late_response_grace(self):
+        """等待动画按宽限时间结束、画面与点击前相同时，判定点击未生效前再等待的时间
+
+        客户端偶尔响应得比宽限时间更慢，再按实测的响应延迟轮询一次，仍没有
+        变化才算未生效；每次点击只多等一次。不需要多等时返回 None
+        """
+        detector = self.settle_detector
+        response_time = self.pacer.response_time
+        if (not self.verify_clicks or self.click_rechecked or response_time is None
+                or detector.last_change_seen or not detector.last_settled
+                or detector.changed_since(self.click_reference)):
+            return None
+        self.click_rechecked = True
+        return max(response_time, self.settle_poll_interval)
+
+    def record_journal(self):
+        """把确认生效的这次洗练追加到洗练日志，未生效的点击不写入（回放按最大计数恢复）"""
+        if self.journal:
+            try:
+                self.journal.record(self.wash_count, self.last_click_time)
+            except OSError as e:
+                self.log(f"写入洗练日志失败: {str(e)}", "ERROR")
+                self.journal = None
+
+    def confirm_click(self):
+        """确认点击已生效：等待动画结束后的画面与点击前不同（无法比较时视为生效）
+
+        没有变化时撤销这次洗练计数、记为未生效并返回 False，调用方应立即重新点击；
+        这一轮未生效的次数超过 click_retries 时抛出 RuntimeError
+        """
+        detector = self.settle_detector
+        if not self.verify_clicks or detector.changed_since(self.click_reference):
+            self.record_journal()
+            return True
+
+        self.wash_count -= 1
+        self.missed_clicks += 1
+        self.cycle_missed_clicks += 1
+        self.pacer.update(detector.last_duration, None, False)
+        if self.cycle_missed_clicks > self.click_retries:
+            missed, self.cycle_missed_clicks = self.cycle_missed_clicks, 0
+            raise RuntimeError(f"连续{missed}次点击未生效（画面没有变化），请检查游戏窗口是否在前台")
+        self.log(f"点击未生效（画面没有变化），立即重试第{self.cycle_missed_clicks}次")
+        return False
+
+    def analyze(self, plan, frames, click_time, settle_time):
+        """分析等待动画得到的截图并判断是否达到目标，返回 CycleResult
+
+        frames 为 None（等待动画失败）时重新截图，且不更新洗练节奏
+        """
+        metrics = self.metrics
+        detector = self.settle_detector
+        if frames is not None:
+            self.pacer.update(detector.last_duration, detector.last_response_time,
+                              detector.last_change_seen)
+
+        if frames is None:
+            stage_start = self.perf_counter()
+            frames = plan.grab(self.get_capture_backend().grab)
+            metrics.record("capture", self.perf_counter() - stage_start)
+        else:
+            metrics.record("capture", detector.last_capture_duration)
+        images = plan.extract(frames)
+
+        # 按评估计划分析区域，确定未达到目标后跳过其余区域
+        stage_start = self.perf_counter()
+        area_results, red_count, skipped = self.get_evaluation_plan().evaluate(images, self.analyze_area)
+        metrics.record("analyze", self.perf_counter() - stage_start)
+        self.outcome_stats.record(area_results)
+
+        if self.session_recorder is not None:
+            try:
+                self.session_recorder.record(self.wash_count, click_time, settle_time,
+                                             self.clock(), images, area_results, skipped)
+            except Exception as e:
+                self.log(f"录制检测画面失败: {str(e)}", "ERROR")
+                self.close_session_recorder()
+
+        # 跳过的区域没有分析，红色数量只是已分析区域中的，实际至少这么多
+        at_least = "至少 " if skipped else ""
+        skipped_text = f"，已确定未达到目标，跳过{len(skipped)}个区域" if skipped else ""
+        self.log(f"检测到 {at_least}{red_count} 个红色词条 "
+                 f"(等待动画 {detector.last_duration * 1000:.0f}ms{skipped_text})")
+
+        # 终止条件按当前设置判断，运行中修改的目标下一轮立即生效
+        stage_start = self.perf_counter()
+        reached = not skipped and self.check_termination_condition(red_count, area_results)
+        metrics.record("termination", self.perf_counter() - stage_start)
+        metrics.mark_wash(self.perf_counter())
+
+        if self.history is not None:
+            try:
+                self.history.append(self.clock(), self.wash_count, area_results, reached, metrics.last)
+            except Exception as e:
+                self.log(f"写入洗练历史失败: {str(e)}", "ERROR")
+                self.close_history()
+
+        self.last_result = CycleResult(self.wash_count, red_count, area_results,
+                                       detector.last_duration, reached, skipped, self.cycle_missed_clicks)
+        self.cycle_missed_clicks = 0
+        return self.last_result
+
+    def analyze_area(self, index, image):
+        """分析一个区域，返回检测结果字典，失败时返回 None"""
+        try:
+            colors, has_content = self.classify_area(image)
+        except Exception as e:
+            self.log(f"区域{index + 1}分析失败: {str(e)}", "ERROR")
+            return None
+        return {
+            'red': RED in colors,
+            'has_content': has_content,
+            'colors': colors
+        }
+
+    def strategy_expression(self):
+        """当前的策略表达式：选中的预设，或由基础/高级设置转换而来"""
+        if self.active_strategy is not None and self.active_strategy in self.strategy_presets:
+            return self.strategy_presets[self.active_strategy]
+        return legacy_expression(self.min_red_count, self.use_advanced_strategy,
+                                 self.area_color_requirements)
+
+    def compile_strategy(self, expression):
+        """编译策略表达式，相同表达式复用已生成的真值表；表达式有误时抛出 ValueError"""
+        strategy = self.strategies.get(expression)
+        if strategy is None:
+            strategy = Strategy(expression, [color.name for color in self.palette])
+            if len(self.strategies) >= 64:
+                self.strategies.clear()
+            self.strategies[expression] = strategy
+        return strategy
+
+    def get_strategy(self):
+        """当前设置对应的已编译策略"""
+        return self.compile_strategy(self.strategy_expression())
+
+    def get_evaluation_plan(self):
+        """获取当前策略的评估计划，策略或检测区域变化时重新编译"""
+        strategy = self.get_strategy()
+        previous = self.evaluation_plan
+        if previous is not None and previous.key == plan_key(self.detection_areas, strategy):
+            return previous
+        plan = EvaluationPlan(self.detection_areas, strategy)
+        if previous is not None:
+            plan.inherit(previous)
+        if plan.impossible:
+            self.log(f"策略 \"{strategy.expression}\" 在已设置的检测区域上无法达成", "ERROR")
+        self.evaluation_plan = plan
+        return plan
+
+    def check_termination_condition(self, red_count, area_results, min_red_count=None,
+                                    use_advanced_strategy=None, area_color_requirements=None):
+        """检查终止条件：按各区域颜色掩码查策略真值表
+
+        未指定目标时使用引擎当前的策略；指定任一目标时按基础/高级设置判断，
+        其余未指定的目标取引擎当前值。red_count 为兼容旧调用保留，
+        红色数量由 area_results 得出
+        """
+        if min_red_count is None and use_advanced_strategy is None and area_color_requirements is None:
+            strategy = self.get_strategy()
+        else:
+            strategy = self.compile_strategy(legacy_expression(
+                self.min_red_count if min_red_count is None else min_red_count,
+                self.use_advanced_strategy if use_advanced_strategy is None else use_advanced_strategy,
+                self.area_color_requirements if area_color_requirements is None else area_color_requirements))
+        return strategy.accepts(strategy.index_of(area_results))
+
+    def cycle_time(self):
+        """实测的平均每轮洗练耗时（秒），还没有洗练速度时返回 None"""
+        washes_per_minute = self.metrics.washes_per_minute()
+        return 60.0 / washes_per_minute if washes_per_minute else None
+
+    def estimate_strategy(self, expression=None, washes=DEFAULT_WASHES, seed=None):
+        """按各区域的实际结果模拟策略（默认为当前策略），逐条累加约束估算洗练次数
+
+        返回 StrategyEstimate 列表，最后一项为完整策略；表达式有误或区域
+        没有洗练记录时抛出 ValueError
+        """
+        expression = expression or self.strategy_expression()
+        strategies = [self.compile_strategy(step) for step in constraint_steps(expression)]
+        return simulate(strategies, self.outcome_stats, self.detection_areas, washes=washes, seed=seed)
+
+    def begin_settle(self, timeout=5):
+        """开始一次分步的动画等待，之后由调用方反复调用 settle_detector.poll()"""
+        detector = self.settle_detector
+        detector.timeout = timeout
+        detector.poll_interval = self.settle_poll_interval
+        detector.stable_polls = self.settle_stable_polls
+        detector.grace = self.pacer.grace(self.settle_poll_interval)
+        detector.start(reference=detector.last_signature, clock=self.perf_counter)
+
+    def wait_for_animation_complete(self, timeout=5, plan=None):
+        """等待动画完成（比较所有检测区域的分块签名）
+
+        返回最后一次截图供区域分析复用，截图失败时返回 None
+        """
+        plan = plan or self.get_capture_plan()
+        if not plan.rects:
+            self.wait(0.5)
+            return None
+
+        capture_backend = self.get_capture_backend()
+        detector = self.settle_detector
+
+        # 以上一轮分析时的画面作为参考，尽早确认动画已开始
+        self.begin_settle(timeout)
+        while True:
+            try:
+                if detector.poll(plan, capture_backend.grab):
+                    # 画面一直没有变化时先按响应延迟再等一次，再由 confirm_click 判定
+                    grace = self.late_response_grace()
+                    if grace is None:
+                        break
+                    detector.extend(grace)
+            except Exception:
+                detector.last_signature = None
+                return None
+            if not self.wait(detector.poll_interval):
+                # 被暂停打断：继续后重新开始等待（暂停的时间不计入超时），
+                # 动画可能还没播完，不能直接分析当前画面
+                self.begin_settle(timeout)
+        frames = detector.frames
+
+        self.metrics.record("settle", detector.last_duration)
+        return frames
+
+    def cleanup(self):
+        """清理过期的分类缓存"""
+        return self.image_cache.expire(self.cache_timeout)
+
+    def close(self):
+        """停止洗练并释放截图后端、录制文件和洗练历史"""
+        self.stop()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.close_session_recorder()
+        self.close_history()
+        if self.capture_backend:
+            self.capture_backend.close()
+            self.capture_backend = None
+        if self.input_driver:
+            self.input_driver.close()
+            self.input_driver = None
+
+    def apply_config(self, config):
+        """应用配置字典（config.json 的内容）中与洗练相关的设置"""
+        if config.get("wash_button_pos"):
+            self.wash_button_pos = tuple(config["wash_button_pos"])
+
+        if config.get("detection_areas"):
+            for i, area in enumerate(config["detection_areas"][:AREA_COUNT]):
+                if area and len(area) == 4:
+                    self.detection_areas[i] = tuple(area)
+
+        if config.get("use_advanced_strategy") is not None:
+            self.use_advanced_strategy = config["use_advanced_strategy"]
+
+        if config.get("palette"):
+            self.palette = load_palette(config["palette"])
+
+        if config.get("area_color_requirements"):
+            self.area_color_requirements = list(config["area_color_requirements"])
+            palette_names = [color.name for color in self.palette]
+            for i in range(len(self.area_color_requirements)):
+                if self.area_color_requirements[i] == "任意颜色":
+                    self.area_color_requirements[i] = NO_COLOR
+                elif self.area_color_requirements[i] not in [NO_COLOR] + palette_names:
+                    self.log(f"区域{i + 1}的颜色需求"
+                             f"\"{self.area_color_requirements[i]}\"不在调色板中，已重置为无",
+                             "ERROR")
+                    self.area_color_requirements[i] = NO_COLOR
+
+        if config.get("min_red_count"):
+            self.min_red_count = config["min_red_count"]
+
+        if config.get("input_driver"):
+            self.input_driver_name = config["input_driver"]
+
+        if config.get("capture_backend"):
+            self.capture_backend_name = config["capture_backend"]
+            self.replay_path = config.get("replay_path")
+
+        pacing = config.get("pacing")
+        if pacing:
+            self.pacing_min_delay = float(pacing.get("min_delay", self.pacing_min_delay))
+            self.pacing_max_delay = float(pacing.get("max_delay", self.pacing_max_delay))
+            self.pacer = AdaptivePacer(min_delay=self.pacing_min_delay,
+                                       max_delay=self.pacing_max_delay)
+
+        sampling = config.get("sampling")
+        if sampling:
+            self.sampling_stride = max(1, int(sampling.get("stride", 1)))
+            self.sampling_max_samples = sampling.get("max_samples")
+
+        content = config.get("content")
+        if content:
+            self.background_level = int(content.get("background_level", self.background_level))
+            self.content_threshold = int(content.get("content_threshold", self.content_threshold))
+
+        self.rebuild_color_engine()
+
+        strategy = config.get("strategy")
+        if strategy:
+            presets = {}
+            for name, expression in (strategy.get("presets") or {}).items():
+                try:
+                    self.compile_strategy(expression)
+                except ValueError as e:
+                    self.log(f"策略预设\"{name}\"无效，已忽略: {str(e)}", "ERROR")
+                    continue
+                presets[name] = expression
+            self.strategy_presets = presets
+            active = strategy.get("active")
+            self.active_strategy = active if active in presets else None
+
+        if config.get("outcome_stats"):
+            try:
+                self.outcome_stats = OutcomeStats.from_config(config["outcome_stats"])
+            except (TypeError, ValueError) as e:
+                self.log(f"洗练结果统计无效，已重新统计: {str(e)}", "ERROR")
+
+        click_check = config.get("click_check")
+        if click_check:
+            self.verify_clicks = bool(click_check.get("enabled", self.verify_clicks))
+            self.click_retries = int(click_check.get("retries", self.click_retries))
+
+        if config.get("settle_poll_interval"):
+            self.settle_poll_interval = float(config["settle_poll_interval"])
+        if config.get("settle_stable_polls"):
+            self.settle_stable_polls = max(1, int(config["settle_stable_polls"]))
+
+        anchor = config.get("anchor")
+        if anchor and anchor.get("origin"):
+            self.anchor_template_path = anchor.get("template") or self.anchor_template_path
+            try:
+                self.locator = AnchorLocator(load_template(self.anchor_template_path), anchor["origin"],
+                                             search_area=anchor.get("search_area"),
+                                             min_score=anchor.get("min_score", 0.8),
+                                             verify_score=anchor.get("verify_score", 0.95))
+            except (OSError, ValueError) as e:
+                self.log(f"加载窗口锚点失败，已停用自动定位: {str(e)}", "ERROR")
+                self.locator = None
+
+        history = config.get("history")
+        if history is not None:
+            self.history_path = history.get("path")
+
+        recording = config.get("session_recording")
+        if recording:
+            self.recording_enabled = bool(recording.get("enabled", False))
+            self.recording_path = recording.get("path", self.recording_path)
+            self.recording_slots = recording.get("slots", self.recording_slots)
+            self.recording_max_mb = recording.get("max_mb", self.recording_max_mb)
+
+        if config.get("wash_count"):
+            self.wash_count = config["wash_count"]
+
+    def to_config(self):
+        """导出与洗练相关的设置，用于写入 config.json"""
+        return {
+            "wash_button_pos": list(self.wash_button_pos) if self.wash_button_pos else None,
+            "detection_areas": [list(area) if area else None for area in self.detection_areas],
+            "use_advanced_strategy": self.use_advanced_strategy,
+            "area_color_requirements": list(self.area_color_requirements),
+            "min_red_count": self.min_red_count,
+            "palette": [color.to_config() for color in self.palette],
+            "input_driver": self.input_driver_name,
+            "capture_backend": self.capture_backend_name,
+            "replay_path": self.replay_path,
+            "content": {
+                "background_level": self.background_level,
+                "content_threshold": self.content_threshold
+            },
+            "sampling": {
+                "stride": self.sampling_stride,
+                "max_samples": self.sampling_max_samples
+            },
+            "strategy": {
+                "active": self.active_strategy,
+                "presets": dict(self.strategy_presets)
+            },
+            "outcome_stats": self.outcome_stats.to_config(),
+            "settle_poll_interval": self.settle_poll_interval,
+            "settle_stable_polls": self.settle_stable_polls,
+            "click_check": {
+                "enabled": self.verify_clicks,
+                "retries": self.click_retries
+            },
+            "anchor": self.locator.to_config(self.anchor_template_path) if self.locator else None,
+            "pacing": {
+                "min_delay": self.pacing_min_delay,
+                "max_delay": self.pacing_max_delay
+            },
+            "history": {"path": self.history_path},
+            "session_recording": {
+                "enabled": self.recording_enabled,
+                "path": self.recording_path,
+                "slots": self.recording_slots,
+                "max_mb": self.recording_max_mb
+            },
+            "wash_count": self.wash_count  # 保存洗练计数器
+        }
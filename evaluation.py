@@ -0,0 +1,103 @@
+"""区域评估计划：按洗练策略排序分析各区域，结论确定未达到目标时跳过其余区域"""
+
+
+def plan_key(areas, strategy):
+    """评估计划的比较键，检测区域和策略都不变时沿用已编译的计划"""
+    return tuple(areas), strategy
+
+
+class EvaluationPlan:
+    """由洗练策略（strategy.Strategy）编译的区域分析顺序
+
+    必需的区域（没有所需颜色就一定失败）最先，其次是其他影响结论的区域，
+    不影响结论的区域最后；同一组内历史上没有出现所需颜色的比例越高越
+    靠前（最可能直接判定失败）。每分析一个区域就查一次策略的 decided()：
+    剩余区域无论结果如何都达不到目标时，这一轮不再分析其余区域
+    """
+
+    def __init__(self, areas, strategy):
+        self.strategy = strategy
+        self.key = plan_key(areas, strategy)
+        self.present = [i for i, area in enumerate(areas) if area]
+        # 未设置的区域视为已知且没有任何颜色
+        self.unset = 0
+        for i in range(len(areas)):
+            if not areas[i]:
+                self.unset |= 1 << i
+        # 在已设置的区域上策略根本无法达成（如要求颜色的区域未设置）
+        self.impossible = strategy.decided(self.unset, 0) is False
+
+        count = len(areas)
+        self.misses = [0] * count  # 分析后没有出现策略所需颜色的次数
+        self.evaluations = [0] * count
+
+        self.cycles = 0
+        self.short_circuits = 0  # 提前确定未达到目标的轮数
+        self.areas_evaluated = 0
+        self.areas_skipped = 0
+
+    def inherit(self, previous):
+        """沿用旧计划的统计（策略或区域变化后重新编译时）"""
+        for i in range(min(len(self.misses), len(previous.misses))):
+            self.misses[i] = previous.misses[i]
+            self.evaluations[i] = previous.evaluations[i]
+        self.cycles = previous.cycles
+        self.short_circuits = previous.short_circuits
+        self.areas_evaluated = previous.areas_evaluated
+        self.areas_skipped = previous.areas_skipped
+
+    def order(self):
+        """本轮的区域分析顺序"""
+        strategy = self.strategy
+
+        def priority(i):
+            group = 0 if strategy.necessary >> i & 1 else 1 if strategy.referenced >> i & 1 else 2
+            # 加一平滑，没有历史时按 0.5 估计
+            return group, -(self.misses[i] + 1) / (self.evaluations[i] + 2)
+
+        return sorted(self.present, key=priority)
+
+    def evaluate(self, images, classify):
+        """按顺序分析区域
+
+        classify(i, image) 返回该区域的检测结果字典（含 'colors'、'red'），
+        失败时返回 None。返回 (area_results, red_count, 跳过的区域)：
+        有跳过的区域说明已确定未达到目标，跳过的区域结果为 None
+        """
+        strategy = self.strategy
+        area_results = [None] * len(images)
+        order = self.order()
+        known, index = self.unset, 0
+        red_count = 0
+        evaluated = 0
+
+        for i in order:
+            if strategy.decided(known, index) is False:
+                break
+            image = images[i]
+            result = classify(i, image) if image is not None else None
+            area_results[i] = result
+            evaluated += 1
+
+            bits = 0
+            if result:
+                red_count += bool(result['red'])
+                bits = strategy.area_index(i, result.get('colors') or ())
+            known |= 1 << i
+            index |= bits
+            self.evaluations[i] += 1
+            self.misses[i] += not bits
+
+        skipped = order[evaluated:]
+        self.cycles += 1
+        self.areas_evaluated += evaluated
+        self.areas_skipped += len(skipped)
+        if skipped:
+            self.short_circuits += 1
+        return area_results, red_count, skipped
+
+    def summary_text(self):
+        total = self.areas_evaluated + self.areas_skipped
+        saved = self.areas_skipped / total * 100 if total else 0.0
+        return (f"提前判定: {self.short_circuits}/{self.cycles}轮，"
+                f"跳过{self.areas_skipped}个区域分析 ({saved:.0f}%)")
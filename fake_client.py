@@ -0,0 +1,208 @@
+"""模拟游戏客户端：在虚拟屏幕上模拟多个洗练窗口，用于在没有游戏的环境中测试调度逻辑"""
+import numpy as np
+
+from capture import CaptureBackend
+
+BACKGROUND = (250, 250, 250)  # 词条区域背景（灰度 >= 240，视为背景）
+DESKTOP = (30, 30, 30)  # 窗口之外的桌面颜色
+TEXT_COLORS = {
+    "red": (220, 35, 85),
+    "white": (60, 60, 60),  # 普通词条：有内容但不是红色
+}
+AREA_GAP = 8
+TITLE_HEIGHT = 16  # 面板标题栏高度，标题图案固定不变，可作为窗口锚点
+FRAME_INTERVAL = 1 / 60  # 动画帧间隔（秒）
+
+
+class SimulatedClock:
+    """模拟时钟：sleep 直接推进时间，测试时不需要真实等待"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+def render_title(height, width):
+    """面板标题栏：深色底上的固定文字图案，所有窗口相同"""
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (90, 70, 40)
+    rng = np.random.default_rng(12345)
+    for left in range(6, width - 10, 9):
+        glyph = rng.integers(0, 2, (height - 6, 6)).astype(bool)
+        image[3:height - 3, left:left + 6][glyph] = (240, 220, 160)
+    return image
+
+
+def render_text(kind, height, width, rng):
+    """生成一个词条区域：浅色背景上几行文字颜色的短横条"""
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND
+    color = TEXT_COLORS[kind]
+    for top in range(2, height - 4, 8):
+        length = int(rng.integers(width // 3, width - 4))
+        image[top:top + 4, 2:2 + length] = color
+    return image
+
+
+class FakeClient:
+    """一个模拟的游戏窗口
+
+    点击洗练按钮后经过 response_delay 秒开始动画，动画持续 animation_time 秒，
+    期间各词条区域每帧随机变化，结束后每个区域以 red_probability 的概率显示
+    红色词条。动画播放中的点击被忽略（与游戏一致）
+    """
+
+    def __init__(self, origin, area_count=3, area_size=(24, 160), button_size=(24, 80),
+                 response_delay=0.05, animation_time=0.4, red_probability=0.3, seed=0):
+        self.origin = tuple(origin)
+        self.area_size = tuple(area_size)
+        self.response_delay = response_delay
+        self.animation_time = animation_time
+        self.red_probability = red_probability
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        x, y = self.origin
+        height, width = self.area_size
+        self.title_rect = (x + AREA_GAP, y + AREA_GAP, x + AREA_GAP + width, y + AREA_GAP + TITLE_HEIGHT)
+        self.title = render_title(TITLE_HEIGHT, width)
+        self.detection_areas = []
+        for i in range(area_count):
+            top = self.title_rect[3] + AREA_GAP + i * (height + AREA_GAP)
+            self.detection_areas.append((x + AREA_GAP, top, x + AREA_GAP + width, top + height))
+
+        button_top = self.title_rect[3] + AREA_GAP + area_count * (height + AREA_GAP)
+        self.button_rect = (x + AREA_GAP, button_top,
+                            x + AREA_GAP + button_size[1], button_top + button_size[0])
+        self.wash_button_pos = ((self.button_rect[0] + self.button_rect[2]) // 2,
+                                (self.button_rect[1] + self.button_rect[3]) // 2)
+
+        self.clicks = 0
+        self.ignored_clicks = 0
+        self.animation_start = None
+        self.animation_end = None
+        self.results = ["white"] * area_count
+        self.shown = [render_text("white", height, width, self.rng) for _ in range(area_count)]
+        self.pending = None
+
+    @property
+    def rect(self):
+        """窗口范围 (x1, y1, x2, y2)"""
+        right = max(area[2] for area in self.detection_areas + [self.button_rect]) + AREA_GAP
+        bottom = self.button_rect[3] + AREA_GAP
+        return self.origin + (right, bottom)
+
+    def settings(self):
+        """该窗口对应的洗练设置（按 config.json 的格式）"""
+        return {
+            "wash_button_pos": list(self.wash_button_pos),
+            "detection_areas": [list(area) for area in self.detection_areas],
+        }
+
+    def move(self, dx, dy):
+        """移动窗口（标题、检测区域和按钮一起平移）"""
+        def shift(rect):
+            return (rect[0] + dx, rect[1] + dy, rect[2] + dx, rect[3] + dy)
+
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+        self.title_rect = shift(self.title_rect)
+        self.detection_areas = [shift(area) for area in self.detection_areas]
+        self.button_rect = shift(self.button_rect)
+        self.wash_button_pos = (self.wash_button_pos[0] + dx, self.wash_button_pos[1] + dy)
+
+    def hit(self, position):
+        x, y = position
+        x1, y1, x2, y2 = self.button_rect
+        return x1 <= x < x2 and y1 <= y < y2
+
+    def animating(self, now):
+        return self.animation_end is not None and now < self.animation_end
+
+    def click(self, now):
+        """点击洗练按钮"""
+        self._update(now)
+        if self.animating(now):
+            self.ignored_clicks += 1
+            return
+        self.clicks += 1
+        self.animation_start = now + self.response_delay
+        self.animation_end = self.animation_start + self.animation_time
+        self.results = ["red" if self.rng.random() < self.red_probability else "white"
+                        for _ in self.detection_areas]
+        height, width = self.area_size
+        self.pending = [render_text(kind, height, width, self.rng) for kind in self.results]
+
+    def _update(self, now):
+        if self.pending is not None and now >= self.animation_end:
+            self.shown = self.pending
+            self.pending = None
+
+    def render_area(self, index, now):
+        """区域 index 在 now 时刻的画面"""
+        self._update(now)
+        if self.animation_start is not None and self.animation_start <= now < self.animation_end:
+            frame = int((now - self.animation_start) / FRAME_INTERVAL)
+            rng = np.random.default_rng((self.seed, self.clicks, frame, index))
+            return rng.integers(0, 256, self.area_size + (3,), dtype=np.uint8)
+        return self.shown[index]
+
+
+class FakeGameScreen(CaptureBackend):
+    """由多个模拟窗口组成的虚拟屏幕，同时提供截图和点击"""
+
+    name = "fake"
+
+    def __init__(self, clients, clock):
+        self.clients = list(clients)
+        self.clock = clock
+        self.missed_clicks = 0  # 没有落在任何洗练按钮上的点击
+
+    def click(self, position):
+        now = self.clock()
+        for client in self.clients:
+            if client.hit(position):
+                client.click(now)
+                return
+        self.missed_clicks += 1
+
+    def grab(self, bbox):
+        x1, y1, x2, y2 = bbox
+        frame = np.empty((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        frame[:] = DESKTOP
+        now = self.clock()
+        for client in self.clients:
+            self._paste(frame, bbox, client.title_rect, client.title)
+            for index, area in enumerate(client.detection_areas):
+                if self._overlaps(bbox, area):
+                    self._paste(frame, bbox, area, client.render_area(index, now))
+        return frame
+
+    @staticmethod
+    def _overlaps(a, b):
+        return max(a[0], b[0]) < min(a[2], b[2]) and max(a[1], b[1]) < min(a[3], b[3])
+
+    def _paste(self, frame, bbox, rect, image):
+        """把位于 rect 的画面贴到从 bbox 截取的 frame 上（只贴重叠部分）"""
+        x1, y1 = bbox[:2]
+        left, top = max(rect[0], bbox[0]), max(rect[1], bbox[1])
+        right, bottom = min(rect[2], bbox[2]), min(rect[3], bbox[3])
+        if left >= right or top >= bottom:
+            return
+        frame[top - y1:bottom - y1, left - x1:right - x1] = \
+            image[top - rect[1]:bottom - rect[1], left - rect[0]:right - rect[0]]
+
+
+def create_fake_clients(count, seed=0, **options):
+    """横向排列 count 个模拟窗口，返回窗口列表"""
+    clients = []
+    x = 0
+    for i in range(count):
+        client = FakeClient((x, 0), seed=seed + i, **options)
+        clients.append(client)
+        x = client.rect[2]
+    return clients
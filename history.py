@@ -0,0 +1,222 @@
+"""洗练历史：每轮洗练追加一条定长记录，保存在可内存映射的文件中，统计时按列批量计算
+
+文件结构：
+  - 头部（HEADER_SIZE 字节）：魔数、已写入记录数、JSON 格式的布局描述
+  - 记录区：按 numpy 结构化类型连续排列，写满后按 CHUNK_RECORDS 条扩展文件
+每条记录包含时间戳、洗练计数、各区域红色/有内容/已分析的位掩码、是否达到
+目标，以及各阶段耗时（秒，节奏等待为本轮点击前的等待）
+"""
+import json
+import os
+
+import numpy as np
+
+from metrics import STAGES
+
+MAGIC = b"SWHIS001"
+HEADER_SIZE = 4096
+COUNT_OFFSET = len(MAGIC)  # 已写入记录数（uint64）
+LAYOUT_OFFSET = COUNT_OFFSET + 16  # 布局 JSON 长度（uint32）后接 JSON 内容
+CHUNK_RECORDS = 65536  # 文件每次扩展的记录数
+QUERY_CHUNK = 1 << 20  # 统计时每次处理的记录数，限制临时数组的大小
+AREA_COUNT = 6
+
+# 0~255 的二进制中 1 的个数，用于由红色掩码得到红色数量
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def history_dtype(stages):
+    fields = [
+        ("time", "<f8"),
+        ("wash_count", "<u8"),
+        ("red_mask", "u1"),
+        ("content_mask", "u1"),
+        ("analyzed_mask", "u1"),
+        ("reached", "u1"),
+    ]
+    fields += [(stage, "<f4") for stage in stages]
+    return np.dtype(fields)
+
+
+def result_masks(area_results):
+    """一轮检测结果的 (红色, 有内容, 已分析) 位掩码，第 i 位对应区域 i+1"""
+    red = content = analyzed = 0
+    for i, result in enumerate(area_results[:AREA_COUNT]):
+        if not result:
+            continue
+        analyzed |= 1 << i
+        if result['red']:
+            red |= 1 << i
+        if result['has_content']:
+            content |= 1 << i
+    return red, content, analyzed
+
+
+class _HistoryFile:
+    """历史文件的公共部分：解析头部、映射记录区和统计查询"""
+
+    def _read_header(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+            raise ValueError(f"不是有效的洗练历史文件: {path}")
+        layout_length = int(np.frombuffer(header, "<u4", 1, LAYOUT_OFFSET)[0])
+        start = LAYOUT_OFFSET + 4
+        self.layout = json.loads(header[start:start + layout_length].decode("utf-8"))
+        self.stages = tuple(self.layout["stages"])
+        self.dtype = history_dtype(self.stages)
+
+    def _map(self, mode, capacity):
+        self._counter = np.memmap(self.path, dtype="<u8", mode=mode, offset=COUNT_OFFSET, shape=(1,))
+        self._records = np.memmap(self.path, dtype=self.dtype, mode=mode,
+                                  offset=HEADER_SIZE, shape=(capacity,)) if capacity else None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def records(self):
+        """已写入的全部记录（内存映射视图，不复制数据）"""
+        if self._records is None:
+            return np.empty(0, dtype=self.dtype)
+        return self._records[:self._count]
+
+    def select(self, start=None, end=None):
+        """时间戳在 [start, end) 内的记录（假定记录按时间顺序追加）"""
+        records = self.records
+        times = records["time"]
+        first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        last = len(records) if end is None else int(np.searchsorted(times, end, side="left"))
+        return records[first:last]
+
+    def area_red_rates(self, start=None, end=None):
+        """各区域出现红色的比例（只统计该区域被分析的轮次），没有记录的区域为 None"""
+        # 先统计每种掩码出现的次数（一次遍历），再按位汇总到各区域
+        red_masks = np.zeros(256, dtype=np.int64)
+        analyzed_masks = np.zeros(256, dtype=np.int64)
+        records = self.select(start, end)
+        for first in range(0, len(records), QUERY_CHUNK):
+            chunk = records[first:first + QUERY_CHUNK]
+            red_masks += np.bincount(chunk["red_mask"], minlength=256)
+            analyzed_masks += np.bincount(chunk["analyzed_mask"], minlength=256)
+        rates = []
+        for i in range(AREA_COUNT):
+            has_bit = (np.arange(256) >> i & 1).astype(bool)
+            analyzed = analyzed_masks[has_bit].sum()
+            rates.append(float(red_masks[has_bit].sum() / analyzed) if analyzed else None)
+        return rates
+
+    def red_count_distribution(self, start=None, end=None):
+        """红色数量为 0~6 的轮数"""
+        counts = np.zeros(AREA_COUNT + 1, dtype=np.int64)
+        records = self.select(start, end)
+        for first in range(0, len(records), QUERY_CHUNK):
+            masks = np.bincount(records[first:first + QUERY_CHUNK]["red_mask"], minlength=256)
+            by_count = np.bincount(POPCOUNT, weights=masks, minlength=AREA_COUNT + 1)
+            counts += by_count[:AREA_COUNT + 1].astype(np.int64)
+        return counts
+
+    def throughput(self, bucket=60.0, start=None, end=None):
+        """按 bucket 秒分段的洗练次数，返回 (各段起始时间, 各段次数)"""
+        times = np.asarray(self.select(start, end)["time"])
+        if not len(times):
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        origin = times[0] if start is None else start
+        counts = np.bincount(((times - origin) // bucket).astype(np.int64))
+        return origin + np.arange(len(counts)) * bucket, counts
+
+    def latency_percentiles(self, stage, percentiles=(50, 95, 99), start=None, end=None):
+        """某阶段耗时的分位数（秒）"""
+        if stage not in self.stages:
+            raise ValueError(f"没有阶段 \"{stage}\" 的耗时记录")
+        values = np.asarray(self.select(start, end)[stage])
+        if not len(values):
+            return [0.0] * len(percentiles)
+        return [float(value) for value in np.percentile(values, percentiles)]
+
+    def summary_text(self, start=None, end=None):
+        records = self.select(start, end)
+        if not len(records):
+            return "洗练历史: 暂无记录"
+        times = records["time"]
+        hours = (float(times[-1]) - float(times[0])) / 3600
+        rates = " ".join(f"{i + 1}:{rate * 100:.0f}%"
+                         for i, rate in enumerate(self.area_red_rates(start, end)) if rate is not None)
+        reached = int(np.count_nonzero(records["reached"]))
+        return (f"洗练历史: {len(records)}次（{hours:.1f}小时），达到目标{reached}次，"
+                f"区域红色概率 {rates}")
+
+
+class WashHistory(_HistoryFile):
+    """追加写入的洗练历史，文件已存在时接着写入（阶段布局不一致时抛出 ValueError）"""
+
+    def __init__(self, path, stages=None):
+        self.path = path
+        stages = tuple(stages or (stage for stage, _ in STAGES))
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE:
+            self._create(stages)
+        self._read_header(path)
+        if self.stages != stages:
+            raise ValueError(f"洗练历史文件的阶段与当前版本不一致: {path}")
+
+        capacity = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+        self._map("r+", capacity)
+        self._count = min(int(self._counter[0]), capacity)
+        self.capacity = capacity
+
+    def _create(self, stages):
+        layout = json.dumps({"version": 1, "stages": list(stages)}).encode("utf-8")
+        header = bytearray(HEADER_SIZE)
+        header[:len(MAGIC)] = MAGIC
+        header[LAYOUT_OFFSET:LAYOUT_OFFSET + 4] = len(layout).to_bytes(4, "little")
+        header[LAYOUT_OFFSET + 4:LAYOUT_OFFSET + 4 + len(layout)] = layout
+        with open(self.path, "wb") as f:
+            f.write(header)
+
+    def _grow(self):
+        """记录区写满时按 CHUNK_RECORDS 条扩展文件并重新映射"""
+        if self._records is not None:
+            self._records.flush()
+            del self._records
+        self.capacity += CHUNK_RECORDS
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + self.capacity * self.dtype.itemsize)
+        self._records = np.memmap(self.path, dtype=self.dtype, mode="r+",
+                                  offset=HEADER_SIZE, shape=(self.capacity,))
+
+    def append(self, timestamp, wash_count, area_results, reached, durations):
+        """追加一轮洗练，durations 为 {阶段: 秒}"""
+        if self._count >= self.capacity:
+            self._grow()
+        red, content, analyzed = result_masks(area_results)
+        self._records[self._count] = ((timestamp, wash_count, red, content, analyzed, bool(reached))
+                                      + tuple(durations.get(stage, 0.0) for stage in self.stages))
+
+        # 最后更新计数，读取方据此判断记录已完整写入
+        self._count += 1
+        self._counter[0] = self._count
+
+    def flush(self):
+        if self._records is not None:
+            self._records.flush()
+        self._counter.flush()
+
+    def close(self):
+        self.flush()
+        self._records = None
+        del self._counter
+
+
+class HistoryReader(_HistoryFile):
+    """只读打开洗练历史文件（可与写入方同时打开，只看到打开时已写入的记录）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._read_header(path)
+        capacity = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+        self._map("r", capacity)
+        self._count = min(int(self._counter[0]), capacity)
+
+    def close(self):
+        self._records = None
+        del self._counter
@@ -0,0 +1,154 @@
+"""鼠标点击：点击驱动接口与实现
+
+pyautogui.click 每次调用后会按 pyautogui.PAUSE 额外休眠，这里的驱动都不附加
+任何等待，两次点击的间隔只由引擎的洗练节奏决定
+"""
+import sys
+import time
+
+
+class InputDriver:
+    """点击驱动接口：click 把鼠标移到 position=(x, y) 并单击左键"""
+
+    name = "base"
+
+    def click(self, position):
+        raise NotImplementedError
+
+    def close(self):
+        """释放驱动持有的资源"""
+        pass
+
+
+class Win32InputDriver(InputDriver):
+    """Windows 点击驱动：SetCursorPos 后用一次 SendInput 发送左键按下和抬起
+
+    与 pyautogui 的 FAILSAFE 一样，鼠标停在屏幕四角时拒绝点击并抛出 RuntimeError，
+    可以随时把鼠标甩到角落来中止洗练。点击时与 GDI 截图一样按物理像素坐标
+    （Per-Monitor DPI感知），缩放的显示器上点击位置与截图中的按钮一致
+    """
+
+    name = "win32"
+
+    INPUT_MOUSE = 0
+    MOUSEEVENTF_LEFTDOWN = 0x0002
+    MOUSEEVENTF_LEFTUP = 0x0004
+    SM_CXSCREEN = 0
+    SM_CYSCREEN = 1
+
+    def __init__(self):
+        if sys.platform != "win32":
+            raise OSError("Win32点击驱动仅支持Windows系统")
+
+        import ctypes
+        from ctypes import wintypes
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [
+                ("dx", wintypes.LONG),
+                ("dy", wintypes.LONG),
+                ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD),
+                ("dwExtraInfo", ctypes.c_size_t),
+            ]
+
+        # INPUT 是联合体，其中 MOUSEINPUT 最大，只声明这一项即可得到正确的大小
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("mi", MOUSEINPUT)]
+
+        self._user32 = ctypes.windll.user32
+        self._set_dpi_context = getattr(self._user32, "SetThreadDpiAwarenessContext", None)
+        if self._set_dpi_context:
+            self._set_dpi_context.restype = ctypes.c_void_p
+            self._set_dpi_context.argtypes = [ctypes.c_void_p]
+        self._point = wintypes.POINT()
+        self._point_ref = ctypes.byref(self._point)
+        self._input_size = ctypes.sizeof(INPUT)
+
+        # 按下和抬起两个事件预先构造好，每次点击只调用 SendInput
+        self._inputs = (INPUT * 2)()
+        for event, flags in zip(self._inputs, (self.MOUSEEVENTF_LEFTDOWN, self.MOUSEEVENTF_LEFTUP)):
+            event.type = self.INPUT_MOUSE
+            event.mi.dwFlags = flags
+
+    def _fail_safe(self):
+        """鼠标在屏幕四角时抛出 RuntimeError"""
+        if not self._user32.GetCursorPos(self._point_ref):
+            return
+        right = self._user32.GetSystemMetrics(self.SM_CXSCREEN) - 1
+        bottom = self._user32.GetSystemMetrics(self.SM_CYSCREEN) - 1
+        if self._point.x in (0, right) and self._point.y in (0, bottom):
+            raise RuntimeError("鼠标位于屏幕角落，已触发安全中止")
+
+    def click(self, position):
+        previous_context = self._set_dpi_context(-3) if self._set_dpi_context else None
+        try:
+            self._fail_safe()
+            x, y = position
+            if not self._user32.SetCursorPos(int(x), int(y)):
+                raise OSError("SetCursorPos 调用失败")
+            if self._user32.SendInput(2, self._inputs, self._input_size) != 2:
+                raise OSError("SendInput 调用失败（可能被更高权限的窗口拦截）")
+        finally:
+            if previous_context:
+                self._set_dpi_context(previous_context)
+
+
+class PyAutoGUIInputDriver(InputDriver):
+    """基于 pyautogui 的点击驱动（非Windows系统），单次点击不附加 PAUSE 休眠"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        pyautogui.FAILSAFE = True
+        self._pyautogui = pyautogui
+
+    def click(self, position):
+        x, y = position
+        self._pyautogui.click(x, y, _pause=False)
+
+
+class CallbackInputDriver(InputDriver):
+    """把任意点击函数包装为驱动（回放、模拟窗口等）"""
+
+    name = "callback"
+
+    def __init__(self, click):
+        self._click = click
+
+    def click(self, position):
+        self._click(position)
+
+
+class RecordingInputDriver(InputDriver):
+    """记录每次点击的时间和位置，可选转发给 target（如模拟窗口），用于测试和只检测不点击"""
+
+    name = "recording"
+
+    def __init__(self, target=None, clock=time.perf_counter):
+        self.target = target
+        self.clock = clock
+        self.clicks = []  # [(时间, (x, y))]
+
+    def click(self, position):
+        self.clicks.append((self.clock(), tuple(position)))
+        if self.target:
+            self.target(position)
+
+
+def create_input_driver(name="auto"):
+    """按名称创建点击驱动，auto 在Windows上使用 Win32 驱动，其他系统使用 pyautogui"""
+    if name in ("auto", Win32InputDriver.name) and sys.platform == "win32":
+        try:
+            return Win32InputDriver()
+        except Exception:
+            if name == Win32InputDriver.name:
+                raise
+    if name in ("auto", PyAutoGUIInputDriver.name):
+        try:
+            return PyAutoGUIInputDriver()
+        except ImportError:
+            raise RuntimeError("没有可用的点击驱动：请安装 pyautogui") from None
+    raise ValueError(f"未知的点击驱动: {name}")
@@ -0,0 +1,218 @@
+"""窗口锚点定位：按模板在屏幕上找到石板面板，窗口移动后平移按钮和检测区域
+
+锚点是面板上一块固定不变的图案（如面板标题）。每轮洗练前只截取锚点
+所在的小块画面做一次相关性校验；校验失败才在缩小的整屏截图上做模板
+匹配，再在原分辨率下于匹配位置附近精确定位。检测区域和洗练按钮都
+视为相对锚点的偏移，锚点移动多少就一起平移多少
+"""
+import numpy as np
+
+DEFAULT_FACTOR = 4  # 粗搜索时截图的缩小倍数
+SEARCH_MARGIN = 600  # 未指定搜索范围时，在锚点原位置周围搜索的距离（像素）
+# 缩小后的画面与模板的像素块可能错位，细小文字的相似度会明显下降，
+# 粗搜索只用较低的阈值筛选候选，由原分辨率的精确匹配决定
+COARSE_SCORE = 0.4
+MAX_CANDIDATES = 16  # 最多精确匹配的候选位置数
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_gray(image):
+    """RGB 图像转为 float32 灰度"""
+    return image[..., :3].astype(np.float32) @ GRAY_WEIGHTS
+
+
+def downscale(gray, factor):
+    """按 factor×factor 块取平均缩小，多余的边缘直接裁掉"""
+    if factor <= 1:
+        return gray
+    height = gray.shape[0] // factor
+    width = gray.shape[1] // factor
+    # 按块内偏移逐片累加，比 reshape 后求均值快得多
+    total = np.zeros((height, width), dtype=np.float32)
+    for dy in range(factor):
+        for dx in range(factor):
+            total += gray[dy:height * factor:factor, dx:width * factor:factor]
+    return total / (factor * factor)
+
+
+def window_sums(image, height, width):
+    """每个 height×width 窗口内的像素和（积分图）"""
+    table = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.float64)
+    table[1:, 1:] = image.cumsum(axis=0, dtype=np.float64).cumsum(axis=1)
+    return (table[height:, width:] - table[:-height, width:]
+            - table[height:, :-width] + table[:-height, :-width])
+
+
+def match_template(image, template):
+    """归一化互相关：返回每个位置的相似度（-1~1），形状 (H-h+1, W-w+1)
+
+    相关项用 FFT 计算，窗口均值和方差用积分图计算，对亮度整体变化不敏感
+    """
+    image_height, image_width = image.shape
+    height, width = template.shape
+    if height > image_height or width > image_width:
+        return np.empty((0, 0))
+
+    image = image.astype(np.float64)
+    centered = template - template.mean()
+    template_norm = np.sqrt((centered * centered).sum())
+
+    shape = (image_height, image_width)
+    spectrum = np.fft.rfft2(image) * np.conj(np.fft.rfft2(centered, s=shape))
+    correlation = np.fft.irfft2(spectrum, s=shape)[:image_height - height + 1, :image_width - width + 1]
+
+    count = height * width
+    sums = window_sums(image, height, width)
+    variance = np.maximum(window_sums(image * image, height, width) - sums * sums / count, 0.0)
+    denominator = np.sqrt(variance) * template_norm
+    scores = np.zeros_like(correlation)
+    np.divide(correlation, denominator, out=scores, where=denominator > 1e-6)
+    return scores
+
+
+def correlation(patch, template):
+    """两块同尺寸灰度图像的归一化相关系数"""
+    a = patch - patch.mean()
+    b = template - template.mean()
+    denominator = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denominator) if denominator > 1e-6 else 0.0
+
+
+def load_template(path):
+    """读取锚点模板图片"""
+    from PIL import Image
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def save_template(path, image):
+    """保存锚点模板图片"""
+    from PIL import Image
+    Image.fromarray(np.ascontiguousarray(image[..., :3])).save(path)
+
+
+class AnchorLocator:
+    """按模板定位石板面板
+
+    origin 为锚点左上角的当前屏幕坐标。verify() 校验该位置的画面，
+    search() 在搜索范围内重新查找并更新 origin
+    """
+
+    def __init__(self, template, origin, search_area=None, factor=DEFAULT_FACTOR,
+                 min_score=0.8, verify_score=0.95):
+        self.template = np.ascontiguousarray(template[..., :3])
+        self.gray = to_gray(self.template)
+        if self.gray.std() < 2.0:
+            raise ValueError("锚点区域没有明显的图案，请选择面板标题等带文字的位置")
+
+        height, width = self.gray.shape
+        self.origin = tuple(origin)
+        self.search_area = tuple(search_area) if search_area else None
+        # 缩小后的模板至少保留 4×4 像素
+        self.factor = max(1, min(factor, height // 4, width // 4))
+        self.small = downscale(self.gray, self.factor)
+        self.min_score = min_score
+        self.verify_score = verify_score
+
+        self.verifications = 0
+        self.searches = 0
+        self.moves = 0
+        self.last_score = None
+        self.last_search_time = None
+
+    @property
+    def size(self):
+        return self.gray.shape[1], self.gray.shape[0]
+
+    @property
+    def bbox(self):
+        x, y = self.origin
+        width, height = self.size
+        return (x, y, x + width, y + height)
+
+    def default_search_area(self, screen_size=None):
+        """未指定搜索范围时：整个屏幕，屏幕大小未知时为锚点周围 SEARCH_MARGIN 像素"""
+        if self.search_area:
+            return self.search_area
+        if screen_size:
+            return (0, 0) + tuple(screen_size)
+        x1, y1, x2, y2 = self.bbox
+        return (max(0, x1 - SEARCH_MARGIN), max(0, y1 - SEARCH_MARGIN),
+                x2 + SEARCH_MARGIN, y2 + SEARCH_MARGIN)
+
+    def verify(self, grab):
+        """只截取锚点所在的小块画面，判断锚点是否仍在原位置"""
+        self.verifications += 1
+        patch = grab(self.bbox)
+        if patch.shape[:2] != self.gray.shape:
+            return False
+        self.last_score = correlation(to_gray(patch), self.gray)
+        return self.last_score >= self.verify_score
+
+    def search(self, grab, area, exclude=()):
+        """在 area 范围内搜索锚点，找到时更新并返回新的 origin，否则返回 None
+
+        多开时屏幕上可能有多个相同的面板：跳过 exclude 中（其他窗口锚点的
+        左上角坐标）附近的匹配，从离上次位置最近的候选开始精确匹配
+        """
+        self.searches += 1
+        x0, y0 = area[:2]
+        screen = to_gray(grab(area))
+        factor = self.factor
+        reach = 2 * factor  # 粗匹配位置的误差范围
+
+        scores = match_template(downscale(screen, factor), self.small)
+        ys, xs = np.nonzero(scores >= COARSE_SCORE)
+        order = np.argsort(-scores[ys, xs])
+        xs, ys = xs[order] * factor + x0, ys[order] * factor + y0
+
+        # 非极大值抑制：相距不到半个模板的候选视为同一处匹配，只保留相似度最高的；
+        # 与其他窗口锚点重叠的候选直接跳过
+        width, height = self.size
+        peaks = []
+        occupied = list(exclude)
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            if any(abs(x - ox) < width / 2 and abs(y - oy) < height / 2 for ox, oy in occupied):
+                continue
+            peaks.append((x, y))
+            occupied.append((x, y))
+            if len(peaks) >= MAX_CANDIDATES:
+                break
+
+        peaks.sort(key=lambda peak: (peak[0] - self.origin[0]) ** 2 + (peak[1] - self.origin[1]) ** 2)
+        for x, y in peaks:
+            origin = self._refine(screen, x - x0, y - y0, reach)
+            if origin is not None:
+                origin = (origin[0] + x0, origin[1] + y0)
+                if origin != self.origin:
+                    self.moves += 1
+                self.origin = origin
+                return origin
+        return None
+
+    def _refine(self, screen, x, y, reach):
+        """原分辨率下在 (x, y) 周围 ±reach 像素内精确匹配，返回相对 screen 的位置"""
+        height, width = self.gray.shape
+        top, left = max(0, y - reach), max(0, x - reach)
+        region = screen[top:y + reach + height, left:x + reach + width]
+        fine = match_template(region, self.gray)
+        if not fine.size:
+            return None
+        fine_y, fine_x = np.unravel_index(np.argmax(fine), fine.shape)
+        self.last_score = float(fine[fine_y, fine_x])
+        if self.last_score < self.min_score:
+            return None
+        return left + int(fine_x), top + int(fine_y)
+
+    def summary_text(self):
+        search_time = f"，上次搜索{self.last_search_time * 1000:.0f}ms" if self.last_search_time else ""
+        return f"锚点: 校验{self.verifications}次，搜索{self.searches}次，移动{self.moves}次{search_time}"
+
+    def to_config(self, template_path):
+        return {
+            "template": template_path,
+            "origin": list(self.origin),
+            "search_area": list(self.search_area) if self.search_area else None,
+            "min_score": self.min_score,
+            "verify_score": self.verify_score
+        }
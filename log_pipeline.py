@@ -0,0 +1,79 @@
+"""日志管道：工作线程只入队，界面线程定时批量取出显示"""
+import time
+from collections import deque
+from datetime import datetime
+
+LEVEL_PREFIX = {
+    "ERROR": "[错误] ",
+    "SUCCESS": "[成功] ",
+}
+
+
+class LogPipeline:
+    """无锁日志队列
+
+    push 可在任意线程调用，只做一次 deque.append（在 CPython 中是原子操作）和丢弃计数；
+    drain 在界面线程调用，按批取出并格式化。队列满时丢弃最旧的记录，并在
+    下一批开头插入一条提示丢弃了多少条，日志中能看出缺了记录；
+    可选地把完整历史写入按大小滚动的日志文件
+    """
+
+    def __init__(self, capacity=10000, log_file=None, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.queue = deque(maxlen=capacity)
+        self.dropped = 0  # 队列满时丢弃的记录总数（多线程同时写入时为近似值）
+        self._reported_dropped = 0
+        self.file_logger = None
+        if log_file:
+            self.open_file(log_file, max_bytes, backup_count)
+
+    def open_file(self, log_file, max_bytes=5 * 1024 * 1024, backup_count=3):
+        """开启日志文件输出"""
+        # logging 只在开启文件输出时才需要，延迟导入以加快启动
+        import logging.handlers
+
+        self.close_file()
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                       backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"{__name__}.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.file_logger = logger
+
+    def close_file(self):
+        """关闭日志文件输出"""
+        if self.file_logger:
+            for handler in list(self.file_logger.handlers):
+                handler.close()
+                self.file_logger.removeHandler(handler)
+            self.file_logger = None
+
+    def push(self, message, level="INFO"):
+        """记录一条日志，不做格式化和任何阻塞操作"""
+        queue = self.queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append((time.time(), level, message))
+
+    @staticmethod
+    def _format(timestamp, level, message):
+        time_text = datetime.fromtimestamp(timestamp).strftime("[%H:%M:%S]")
+        return level, message, f"{time_text} {LEVEL_PREFIX.get(level, '')}{message}"
+
+    def drain(self, limit=500):
+        """取出最多 limit 条日志，返回 [(级别, 原始消息, 带时间戳的完整文本), ...]"""
+        records = []
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped += dropped
+            records.append(self._format(time.time(), "ERROR", f"日志过多，已丢弃 {dropped} 条较早的记录"))
+            limit += 1  # 提示行不占用本批的条数
+
+        queue = self.queue
+        while queue and len(records) < limit:
+            records.append(self._format(*queue.popleft()))
+
+        if records and self.file_logger:
+            self.file_logger.info("\n".join(text for _, _, text in records))
+        return records
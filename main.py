@@ -1,49 +1,91 @@
+import time
+
+# 启动计时从导入界面模块之前开始（--profile-startup）
+STARTUP_BEGIN = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import json
+import argparse
 import os
 import threading
-import time
 from datetime import datetime
-import pyautogui
-from PIL import ImageGrab, Image
-import numpy as np
-import winsound
-from pynput import keyboard, mouse
 import sys
 import gc
 
+from config_store import ConfigStore, WashJournal
+from log_pipeline import LogPipeline
+from startup import StartupProfiler
 
-class StoneWashingAssistant:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("石板洗练助手 v3.0")
-        self.root.geometry("1000x820")
-        self.root.resizable(True, True)
+STARTUP_IMPORT_TIME = time.perf_counter() - STARTUP_BEGIN
+
+# 以下模块较重，窗口显示后由后台线程导入（见 load_heavy_modules）。
+# 鼠标键盘控制和提示音仅在Windows桌面环境可用，缺失时为 None
+pyautogui = None
+keyboard = mouse = None
+winsound = None
+
+# 后台预先导入的识别相关模块，界面中用到时再从模块中取用
+HEAVY_MODULES = ("numpy", "PIL.Image", "engine", "calibration")
+
+# 策略预设下拉框中表示“不使用预设”的选项
+CUSTOM_STRATEGY = "按基础/高级设置"
+
+
+def load_heavy_modules(profiler):
+    """导入识别、截图、键鼠控制和提示音模块，逐个记录耗时"""
+    global pyautogui, keyboard, mouse, winsound
+    for name in HEAVY_MODULES:
+        profiler.import_module(name)
+    profiler.import_module("PIL.ImageGrab", optional=True)
+
+    # pyautogui 只用于读取鼠标位置，洗练点击由引擎的点击驱动完成（不附加 PAUSE 等待）
+    pyautogui = profiler.import_module("pyautogui", optional=True)
+    keyboard = profiler.import_module("pynput.keyboard", optional=True)
+    mouse = profiler.import_module("pynput.mouse", optional=True)
+    winsound = profiler.import_module("winsound", optional=True)
 
-        # 设置程序图标（如果有的话）
-        try:
-            if os.path.exists("icon.ico"):
-                self.root.iconbitmap("icon.ico")
-        except:
-            pass
 
-        # 配置变量
+class StoneWashingAssistant:
+    def __init__(self, profiler=None, exit_after_startup=False):
+        # 启动计时；exit_after_startup 为 True 时加载完成后输出统计并退出
+        self.profiler = profiler or StartupProfiler()
+        self.exit_after_startup = exit_after_startup
+
+        with self.profiler.stage("创建窗口"):
+            self.root = tk.Tk()
+            self.root.title("石板洗练助手 v3.0")
+            self.root.geometry("1000x820")
+            self.root.resizable(True, True)
+
+            # 设置程序图标（如果有的话）
+            try:
+                if os.path.exists("icon.ico"):
+                    self.root.iconbitmap("icon.ico")
+            except:
+                pass
+
+        # 配置文件
         self.config_file = "config.json"
-        self.wash_button_pos = None
-        self.detection_areas = [None] * 6
-        self.use_advanced_strategy = False
-        self.area_color_requirements = ["无"] * 6
-        self.min_red_count = 1
+        self.journal_file = "wash_journal.log"
+
+        # 配置修改合并后在后台原子写入；每次洗练追加到洗练日志，崩溃后据此恢复计数
+        self.config_store = ConfigStore(self.config_file,
+                                        on_error=lambda message: self.log_message(message, "ERROR"))
+        self.wash_journal = WashJournal(self.journal_file)
+        self.config_store.on_written = lambda config: self.wash_journal.compact(config.get("wash_count", 0))
+
+        # 洗练引擎：检测、终止判断和洗练循环都在引擎中，界面只负责设置和显示。
+        # 引擎依赖的模块在后台导入，完成后才创建
+        self.engine = None
 
         # 状态变量
-        self.is_running = False
-        self.is_paused = False
         self.current_state = "等待开始操作..."
-        self.log_lock = threading.Lock()
 
-        # 洗练计数器 - 改为全局累加，不再重置
-        self.wash_count = 0
+        # 日志：工作线程只入队，界面线程定时批量显示，滚动区保留有限行数
+        self.log_pipeline = LogPipeline()
+        self.log_max_lines = 2000
+        self.log_flush_interval = 100  # 毫秒
+        self.log_file = None
 
         # 监听器
         self.key_listener = None
@@ -59,29 +101,87 @@ class StoneWashingAssistant:
         # 选择按钮提示窗口
         self.selection_prompt_window = None
 
-        # 图像处理缓存
-        self.image_cache = {}
-        self.cache_timeout = 5  # 缓存超时时间（秒）
-
-        # 性能监控
-        self.performance_stats = {
-            "screenshot_time": 0,
-            "analysis_time": 0,
-            "total_cycles": 0
-        }
+        # 颜色校准：对话框打开期间收集的样本
+        self.calibration = None
+        self.calibration_window = None
 
         # 初始化GUI
-        self.setup_ui()
+        with self.profiler.stage("构建界面"):
+            self.setup_ui()
 
-        # 加载配置
-        self.load_config()
+        # 定时把日志队列刷新到界面
+        self.root.after(self.log_flush_interval, self.flush_log)
 
-        # 延迟启动热键监听，避免PyCharm兼容性问题
-        self.root.after(1000, self.start_hotkey_listener)
+        # 窗口先显示，较重的模块在后台导入，完成后创建引擎并加载配置
+        self.root.after_idle(lambda: self.profiler.mark("窗口可交互"))
+        threading.Thread(target=self.load_modules, daemon=True).start()
 
         # 设置内存清理定时器
         self.root.after(60000, self.cleanup_memory)
 
+    def load_modules(self):
+        """后台线程：导入较重的模块，完成后回到界面线程初始化引擎"""
+        try:
+            load_heavy_modules(self.profiler)
+            error = None
+        except Exception as e:
+            error = e
+
+        try:
+            self.root.after(0, lambda: self.on_modules_loaded(error))
+        except RuntimeError:
+            pass  # 加载完成前窗口已关闭
+
+    def on_modules_loaded(self, error):
+        """创建洗练引擎、加载配置并启动热键监听"""
+        if error is not None:
+            self.log_message(f"加载识别模块失败: {str(error)}", "ERROR")
+            return
+
+        from engine import WashEngine
+
+        with self.profiler.stage("创建洗练引擎"):
+            self.engine = WashEngine(on_log=self.log_message)
+            self.engine.on_stats = self.on_engine_stats
+            self.engine.on_finished = self.on_engine_finished
+            # 界面模式默认保存洗练历史，配置中 history.path 为 null 时关闭
+            self.engine.history_path = "wash_history.bin"
+            self.engine.screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+            self.update_color_choices()
+
+        # 加载配置
+        with self.profiler.stage("加载配置"):
+            self.load_config()
+
+        # 按配置创建点击驱动，缺少依赖时启动阶段就提示
+        with self.profiler.stage("创建点击驱动"):
+            try:
+                self.engine.get_input_driver()
+            except Exception as e:
+                self.log_message(f"点击驱动不可用，无法洗练: {str(e)}", "ERROR")
+
+        self.profiler.mark("加载完成")
+        if self.exit_after_startup:
+            report = "\n".join(self.profiler.report_lines())
+            print(report)
+            self.config_store.close()
+            self.wash_journal.close()
+            self.root.destroy()
+            return
+
+        self.log_message(f"组件加载完成（启动耗时 {self.profiler.elapsed() * 1000:.0f}ms）")
+
+        # 延迟启动热键监听，避免PyCharm兼容性问题
+        if keyboard:
+            self.root.after(1000, self.start_hotkey_listener)
+
+    def check_ready(self):
+        """引擎创建前（后台仍在加载模块）界面操作无效"""
+        if self.engine is None:
+            self.log_message("组件加载中，请稍候...")
+            return False
+        return True
+
     def setup_ui(self):
         """设置用户界面"""
         # 左侧控制面板
@@ -168,6 +268,30 @@ class StoneWashingAssistant:
                   command=self.test_all_areas,
                   font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5, expand=True)
 
+        tk.Button(global_frame, text="校准颜色",
+                  command=self.open_calibration_window,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5, expand=True)
+
+        # 窗口锚点：游戏窗口移动后自动重新定位按钮和检测区域
+        anchor_frame = tk.LabelFrame(scrollable_frame, text="窗口锚点 (可选)",
+                                     font=("微软雅黑", 10), bg="#f0f0f0")
+        anchor_frame.pack(padx=10, pady=3, fill=tk.X)
+
+        anchor_buttons = tk.Frame(anchor_frame, bg="#f0f0f0")
+        anchor_buttons.pack(padx=5, pady=3, fill=tk.X)
+
+        tk.Button(anchor_buttons, text="📌 选择锚点",
+                  command=self.capture_anchor,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5, expand=True)
+
+        tk.Button(anchor_buttons, text="清除锚点",
+                  command=self.clear_anchor,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5, expand=True)
+
+        self.anchor_label = tk.Label(anchor_frame, text="未设置（框选面板标题等固定不变的图案）",
+                                     font=("微软雅黑", 9), bg="#f0f0f0", fg="gray")
+        self.anchor_label.pack(pady=3)
+
         # 洗练策略设置
         strategy_frame = tk.LabelFrame(scrollable_frame, text="洗练目标策略",
                                        font=("微软雅黑", 10), bg="#f0f0f0")
@@ -187,6 +311,32 @@ class StoneWashingAssistant:
         min_red_combo.pack(side=tk.LEFT, padx=5)
         min_red_combo.bind("<<ComboboxSelected>>", self.save_config)
 
+        # 策略预设（在 config.json 的 strategy.presets 中编辑），选中后代替下方设置
+        preset_frame = tk.Frame(strategy_frame, bg="#f0f0f0")
+        preset_frame.pack(padx=10, pady=3, fill=tk.X)
+
+        tk.Label(preset_frame, text="策略预设:",
+                 font=("微软雅黑", 9), bg="#f0f0f0").pack(side=tk.LEFT)
+
+        self.preset_var = tk.StringVar(value=CUSTOM_STRATEGY)
+        self.preset_combo = ttk.Combobox(preset_frame, textvariable=self.preset_var,
+                                         values=[CUSTOM_STRATEGY], width=16, state="readonly")
+        self.preset_combo.pack(side=tk.LEFT, padx=5)
+        self.preset_combo.bind("<<ComboboxSelected>>", self.save_config)
+
+        self.estimate_btn = tk.Button(preset_frame, text="估算洗练次数",
+                                      command=self.estimate_strategy, font=("微软雅黑", 8))
+        self.estimate_btn.pack(side=tk.LEFT, padx=5)
+
+        self.strategy_label = tk.Label(strategy_frame, text="", font=("Consolas", 8),
+                                       bg="#f0f0f0", fg="gray", wraplength=320, justify=tk.LEFT)
+        self.strategy_label.pack(anchor="w", padx=10)
+
+        # 策略估算结果（按实际洗练结果模拟）
+        self.estimate_label = tk.Label(strategy_frame, text="", font=("微软雅黑", 8),
+                                       bg="#f0f0f0", fg="#666", wraplength=320, justify=tk.LEFT)
+        self.estimate_label.pack(anchor="w", padx=10)
+
         # 高级策略开关
         self.advanced_var = tk.BooleanVar(value=False)
         advanced_check = tk.Checkbutton(strategy_frame, text="启用高级洗练目标策略",
@@ -203,6 +353,7 @@ class StoneWashingAssistant:
 
         # 创建6个区域的颜色需求下拉框
         self.color_vars = []
+        self.color_combos = []
         color_frame = tk.Frame(self.advanced_frame, bg="#f0f0f0")
         color_frame.pack(padx=10, pady=3)
 
@@ -215,12 +366,13 @@ class StoneWashingAssistant:
 
             color_var = tk.StringVar(value="无")
             color_combo = ttk.Combobox(frame, textvariable=color_var,
-                                       values=["无", "红"],
+                                       values=["无"],
                                        width=10, state="readonly", font=("微软雅黑", 8))
             color_combo.pack(side=tk.LEFT, padx=2)
             color_combo.bind("<<ComboboxSelected>>", self.save_config)
 
             self.color_vars.append(color_var)
+            self.color_combos.append(color_combo)
 
         # 执行控制
         execute_frame = tk.LabelFrame(scrollable_frame, text="执行控制",
@@ -233,6 +385,12 @@ class StoneWashingAssistant:
                                    width=15, height=2)
         self.start_btn.pack(pady=8)
 
+        self.record_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(execute_frame, text="录制检测画面（用于离线复现）",
+                       variable=self.record_var,
+                       command=self.toggle_recording,
+                       font=("微软雅黑", 8), bg="#f0f0f0").pack()
+
         tk.Label(execute_frame, text="热键: F2 暂停/继续",
                  font=("微软雅黑", 8), bg="#f0f0f0", fg="#666").pack()
 
@@ -241,6 +399,10 @@ class StoneWashingAssistant:
                                     font=("微软雅黑", 8), bg="#f0f0f0", fg="#666")
         self.stats_label.pack(pady=3)
 
+        tk.Button(execute_frame, text="导出性能统计",
+                  command=self.export_metrics,
+                  font=("微软雅黑", 8)).pack(pady=(0, 5))
+
         # 修复：只在内容超出时启用滚动，并正确绑定鼠标滚轮事件
         def on_mousewheel(event):
             # 获取scrollable_frame和canvas的实际尺寸
@@ -284,24 +446,41 @@ class StoneWashingAssistant:
         self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD,
                                                   font=("Consolas", 9))
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        for color in ("black", "red", "green"):
+            self.log_text.tag_config(color, foreground=color)
 
         # 初始日志
         self.log_message("石板洗练助手 v3.0 已启动")
 
     def toggle_advanced_strategy(self):
         """切换高级策略显示"""
+        if not self.check_ready():
+            return
+
         if self.advanced_var.get():
             self.advanced_frame.pack(padx=10, pady=3, fill=tk.X)
             for i, var in enumerate(self.color_vars):
-                var.set(self.area_color_requirements[i])
+                var.set(self.engine.area_color_requirements[i])
         else:
             self.advanced_frame.pack_forget()
 
-        self.use_advanced_strategy = self.advanced_var.get()
+        self.save_config()
+
+    def toggle_recording(self):
+        """切换检测画面录制，下次开始洗练时生效"""
+        if not self.check_ready():
+            return
+        self.engine.recording_enabled = self.record_var.get()
         self.save_config()
 
     def select_wash_button(self):
         """选择洗练按钮位置"""
+        if not self.check_ready():
+            return
+        if keyboard is None or pyautogui is None:
+            messagebox.showerror("错误", "缺少 pyautogui 或 pynput，无法选择洗练按钮位置")
+            return
+
         if self.key_listener:
             self.key_listener.stop()
             self.key_listener = None
@@ -366,7 +545,7 @@ class StoneWashingAssistant:
                     self.key_listener.stop()
                     self.key_listener = None
 
-                self.wash_button_pos = pyautogui.position()
+                self.engine.wash_button_pos = tuple(pyautogui.position())
 
                 if self.selection_prompt_window:
                     self.selection_prompt_window.destroy()
@@ -383,7 +562,58 @@ class StoneWashingAssistant:
 
     def capture_area(self, area_index):
         """捕获检测区域"""
+        if not self.check_ready():
+            return
+
         self.current_area_index = area_index
+
+        def on_selected(rect):
+            self.engine.detection_areas[area_index] = rect
+            self.update_area_ui(area_index)
+            self.log_message(f"区域{area_index + 1}已设置")
+            self.save_config()
+
+        self.select_screen_rect(on_selected, "区域选择已取消")
+
+    def capture_anchor(self):
+        """框选窗口锚点"""
+        if not self.check_ready():
+            return
+
+        def on_selected(rect):
+            # 等选择遮罩从屏幕上消失后再截取锚点画面
+            self.root.after(200, lambda: self.set_anchor(rect))
+
+        self.select_screen_rect(on_selected, "锚点选择已取消")
+
+    def set_anchor(self, rect):
+        try:
+            self.engine.set_anchor(rect)
+        except Exception as e:
+            self.log_message(f"设置锚点失败: {str(e)}", "ERROR")
+            return
+        self.update_anchor_ui()
+        self.log_message("锚点已设置，游戏窗口移动后将自动重新定位")
+        self.save_config()
+
+    def clear_anchor(self):
+        """停用窗口锚点"""
+        if not self.check_ready():
+            return
+        self.engine.clear_anchor()
+        self.update_anchor_ui()
+        self.log_message("锚点已清除")
+        self.save_config()
+
+    def update_anchor_ui(self):
+        """更新锚点状态"""
+        if self.engine.locator:
+            self.anchor_label.config(text="✓ 已设置", fg="green")
+        else:
+            self.anchor_label.config(text="未设置（框选面板标题等固定不变的图案）", fg="gray")
+
+    def select_screen_rect(self, on_selected, cancel_message):
+        """全屏半透明遮罩上拖动框选一个矩形，完成后调用 on_selected((x1, y1, x2, y2))"""
         self.selecting_area = True
 
         self.selection_window = tk.Toplevel(self.root)
@@ -418,15 +648,11 @@ class StoneWashingAssistant:
                 x1, x2 = min(x1, x2), max(x1, x2)
                 y1, y2 = min(y1, y2), max(y1, y2)
 
-                self.detection_areas[area_index] = (x1, y1, x2, y2)
-                self.update_area_ui(area_index)
-
                 self.selection_window.destroy()
                 self.selecting_area = False
                 self.selection_start = None
 
-                self.log_message(f"区域{area_index + 1}已设置")
-                self.save_config()
+                on_selected((x1, y1, x2, y2))
 
         canvas.bind("<Button-1>", on_mouse_down)
         canvas.bind("<B1-Motion>", on_mouse_move)
@@ -435,13 +661,13 @@ class StoneWashingAssistant:
         def on_escape(event):
             self.selection_window.destroy()
             self.selecting_area = False
-            self.log_message("区域选择已取消")
+            self.log_message(cancel_message)
 
         self.selection_window.bind("<Escape>", on_escape)
 
     def update_area_ui(self, area_index):
         """更新区域UI状态"""
-        area = self.detection_areas[area_index]
+        area = self.engine.detection_areas[area_index]
         if area:
             self.area_status_labels[area_index].config(text="✓ 已设置", fg="green")
         else:
@@ -449,8 +675,11 @@ class StoneWashingAssistant:
 
     def reset_all_areas(self):
         """重置所有检测区域"""
-        for i in range(6):
-            self.detection_areas[i] = None
+        if not self.check_ready():
+            return
+
+        for i in range(len(self.engine.detection_areas)):
+            self.engine.detection_areas[i] = None
             self.update_area_ui(i)
 
         self.log_message("所有区域已重置")
@@ -458,277 +687,201 @@ class StoneWashingAssistant:
 
     def test_all_areas(self):
         """测试所有检测区域"""
-        for i in range(6):
-            area = self.detection_areas[i]
-            if not area:
+        if not self.check_ready():
+            return
+        if self.engine.is_running:
+            # 洗练线程正在截图和分析同样的区域，测试需在停止洗练后进行
+            self.log_message("洗练进行中，请先停止洗练再测试区域")
+            return
+
+        try:
+            images = self.engine.capture_areas()
+        except Exception as e:
+            self.log_message(f"区域截图失败: {str(e)}", "ERROR")
+            return
+
+        for i, image in enumerate(images):
+            if image is None:
                 continue
 
             try:
-                screenshot = ImageGrab.grab(bbox=area)
-                is_red = self.is_red_area(screenshot)
-                result = "红" if is_red else "非红"
+                colors = self.engine.classify_area(image)[0]
+                names = self.engine.color_engine.names
+                result = "、".join(name for name in names if name in colors) or f"非{'/'.join(names)}"
                 self.log_message(f"区域{i + 1}测试 → {result}")
             except Exception as e:
                 self.log_message(f"区域{i + 1}测试失败: {str(e)}", "ERROR")
 
-    def is_red_area(self, image):
-        """判断区域是否为红色"""
-        # 目标RGB和容差
-        target_r, target_g, target_b = (220, 35, 85)
-        tolerance = 30
-
-        # 转换为numpy数组并预计算掩码
-        img_array = np.array(image)
-
-        # 使用向量化操作，提高性能
-        red_mask = (
-                (img_array[:, :, 0] >= target_r - tolerance) &
-                (img_array[:, :, 0] <= target_r + tolerance) &
-                (img_array[:, :, 1] >= target_g - tolerance) &
-                (img_array[:, :, 1] <= target_g + tolerance) &
-                (img_array[:, :, 2] >= target_b - tolerance) &
-                (img_array[:, :, 2] <= target_b + tolerance)
-        )
+    def update_color_choices(self):
+        """调色板变化后更新各区域颜色需求下拉框的选项"""
+        from palette import NO_COLOR
+
+        for combo in self.color_combos:
+            combo.config(values=[NO_COLOR] + self.engine.color_engine.names)
+
+    def open_calibration_window(self):
+        """打开颜色校准窗口：为每个区域标注当前画面后采集样本，拟合颜色和阈值"""
+        if not self.check_ready():
+            return
+        from calibration import CalibrationSession, calibration_labels
+
+        if self.calibration_window is not None and self.calibration_window.winfo_exists():
+            self.calibration_window.lift()
+            return
+        if not any(self.engine.detection_areas):
+            messagebox.showwarning("警告", "请先设置检测区域")
+            return
+
+        self.calibration = CalibrationSession()
+        window = tk.Toplevel(self.root)
+        window.title("颜色校准")
+        window.attributes('-topmost', True)
+        self.calibration_window = window
 
-        red_pixel_count = np.sum(red_mask)
+        tk.Label(window, text="在游戏中洗出不同结果，为每个区域选择当前画面的实际内容后采集样本",
+                 font=("微软雅黑", 9), wraplength=320, justify=tk.LEFT).pack(padx=10, pady=5)
 
-        return red_pixel_count >= 10
+        labels = calibration_labels(self.engine.palette)
+        self.calibration_vars = []
+        label_frame = tk.Frame(window)
+        label_frame.pack(padx=10, pady=3)
+        for i, area in enumerate(self.engine.detection_areas):
+            if not area:
+                self.calibration_vars.append(None)
+                continue
+            frame = tk.Frame(label_frame)
+            frame.pack(anchor="w", pady=1)
+            tk.Label(frame, text=f"区域{i + 1}:", font=("微软雅黑", 9)).pack(side=tk.LEFT)
+            var = tk.StringVar(value=labels[0])
+            ttk.Combobox(frame, textvariable=var, values=labels, width=10,
+                         state="readonly", font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5)
+            self.calibration_vars.append(var)
+
+        self.calibration_label = tk.Label(window, text="已采集0个样本", font=("微软雅黑", 9), fg="#666")
+        self.calibration_label.pack(pady=3)
+
+        button_frame = tk.Frame(window)
+        button_frame.pack(padx=10, pady=5)
+        tk.Button(button_frame, text="采集样本", command=self.collect_calibration_sample,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="拟合并保存", command=self.apply_calibration,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="关闭", command=window.destroy,
+                  font=("微软雅黑", 9)).pack(side=tk.LEFT, padx=5)
+
+    def collect_calibration_sample(self):
+        """按当前标注采集所有区域的截图"""
+        try:
+            images = self.engine.capture_areas()
+        except Exception as e:
+            self.log_message(f"校准截图失败: {str(e)}", "ERROR")
+            return
 
-    def is_any_color_area(self, image):
-        """判断区域是否有任意颜色（非空白）"""
-        # 转换为灰度图
-        gray_image = image.convert('L')
-        gray_array = np.array(gray_image)
+        for image, var in zip(images, self.calibration_vars):
+            if image is not None and var is not None:
+                self.calibration.add_sample(image, var.get())
 
-        # 计算非背景像素
-        non_bg_pixels = np.sum(gray_array < 240)
+        counts = "，".join(f"{label}{count}" for label, count in self.calibration.label_counts().items())
+        self.calibration_label.config(text=f"已采集{len(self.calibration)}个样本（{counts}）")
 
-        return non_bg_pixels > 50
+    def apply_calibration(self):
+        """用采集的样本拟合调色板和内容阈值，应用并保存"""
+        if self.calibration is None or not len(self.calibration):
+            messagebox.showwarning("警告", "请先采集样本", parent=self.calibration_window)
+            return
+
+        engine = self.engine
+        try:
+            engine.palette, engine.background_level, engine.content_threshold, report = \
+                self.calibration.fit(engine.palette, engine.background_level, engine.content_threshold)
+        except Exception as e:
+            self.log_message(f"颜色校准失败: {str(e)}", "ERROR")
+            return
+
+        engine.rebuild_color_engine()
+        self.update_color_choices()
+        self.save_config()
+        self.log_message(f"颜色校准完成（{len(self.calibration)}个样本）", "SUCCESS")
+        for line in report:
+            self.log_message(f"校准 {line}")
+
+    def export_metrics(self):
+        """导出性能统计到 JSON 文件"""
+        if not self.check_ready():
+            return
+        path = datetime.now().strftime("metrics_%Y%m%d_%H%M%S.json")
+        try:
+            self.engine.metrics.dump(path)
+            self.stats_label.config(text=self.engine.metrics.summary_text())
+            self.log_message(f"性能统计已导出: {path}")
+        except Exception as e:
+            self.log_message(f"导出性能统计失败: {str(e)}", "ERROR")
 
     def toggle_washing(self):
         """切换洗练状态"""
-        if not self.is_running:
-            if not self.wash_button_pos:
+        if not self.check_ready():
+            return
+
+        from runstate import STATE_IDLE, STATE_PAUSED, STATE_RUNNING
+
+        engine = self.engine
+        state = engine.run_state.state
+        if state == STATE_IDLE:
+            if not engine.wash_button_pos:
                 messagebox.showerror("错误", "请先设置洗练按钮位置")
                 return
 
-            if not any(self.detection_areas):
+            if not any(engine.detection_areas):
                 messagebox.showerror("错误", "请至少设置一个检测区域")
                 return
 
-            self.is_running = True
-            self.is_paused = False
+            self.save_config()
             self.start_btn.config(text="暂停", bg="#FF9800")
             self.current_state = "洗练中..."
             self.update_status()
 
             # 注意：这里不再重置洗练计数器，保持累加
-
-            self.washing_thread = threading.Thread(target=self.washing_loop, daemon=True)
-            self.washing_thread.start()
+            engine.start()
 
             self.log_message("开始洗练...")
 
-        elif not self.is_paused:
-            self.is_paused = True
-            self.start_btn.config(text="继续", bg="#4CAF50")
-            self.current_state = "已暂停"
-            self.update_status()
-            self.log_message("洗练已暂停")
-        else:
-            self.is_paused = False
-            self.start_btn.config(text="暂停", bg="#FF9800")
-            self.current_state = "洗练中..."
-            self.update_status()
-            self.log_message("洗练继续")
-
-    def washing_loop(self):
-        """洗练主循环"""
-        consecutive_failures = 0
-        last_performance_update = time.time()
-
-        while self.is_running:
-            if self.is_paused:
-                time.sleep(0.1)
-                continue
-
-            try:
-                start_time = time.time()
-
-                if self.wash_button_pos:
-                    self.wash_count += 1  # 计数器累加
-                    pyautogui.click(self.wash_button_pos)
-                    self.log_message(f"第{self.wash_count}次洗练")
-                else:
-                    self.log_message("洗练按钮位置未设置", "ERROR")
-                    break
-
-                # 等待动画完成
-                self.wait_for_animation_complete()
-
-                # 分析所有区域
-                red_count = 0
-                area_results = []
-
-                for i, area in enumerate(self.detection_areas):
-                    if not area:
-                        area_results.append(None)
-                        continue
-
-                    try:
-                        # 截图并分析
-                        screenshot_start = time.time()
-                        screenshot = ImageGrab.grab(bbox=area)
-                        self.performance_stats["screenshot_time"] += time.time() - screenshot_start
-
-                        analysis_start = time.time()
-                        is_red = self.is_red_area(screenshot)
-                        has_content = self.is_any_color_area(screenshot)
-                        self.performance_stats["analysis_time"] += time.time() - analysis_start
-
-                        area_results.append({
-                            'red': is_red,
-                            'has_content': has_content
-                        })
-
-                        if is_red:
-                            red_count += 1
-
-                    except Exception as e:
-                        area_results.append(None)
-                        self.log_message(f"区域{i + 1}分析失败: {str(e)}", "ERROR")
-
-                self.performance_stats["total_cycles"] += 1
-
-                # 更新性能统计显示（每10次循环更新一次）
-                current_time = time.time()
-                if current_time - last_performance_update > 5:
-                    avg_screenshot = self.performance_stats["screenshot_time"] / self.performance_stats[
-                        "total_cycles"] if self.performance_stats["total_cycles"] > 0 else 0
-                    avg_analysis = self.performance_stats["analysis_time"] / self.performance_stats["total_cycles"] if \
-                        self.performance_stats["total_cycles"] > 0 else 0
-
-                    stats_text = f"性能: 截图{avg_screenshot:.3f}s/次, 分析{avg_analysis:.3f}s/次"
-                    self.root.after(0, lambda: self.stats_label.config(text=stats_text))
-                    last_performance_update = current_time
-
-                # 记录结果
-                self.log_message(f"检测到 {red_count} 个红色词条")
-
-                # 实时获取当前设置的目标条件
-                current_min_red_count = int(self.min_red_var.get())
-                current_use_advanced_strategy = self.advanced_var.get()
-
-                # 修复：在检查终止条件之前获取当前的颜色需求设置
-                current_area_color_requirements = []
-                if current_use_advanced_strategy:
-                    current_area_color_requirements = [var.get() for var in self.color_vars]
-                else:
-                    current_area_color_requirements = ["无"] * 6
-
-                # 检查终止条件
-                if self.check_termination_condition(red_count, area_results,
-                                                    current_min_red_count,
-                                                    current_use_advanced_strategy,
-                                                    current_area_color_requirements):
-                    self.log_message(f"达到目标! 共 {red_count} 个红色词条 (第{self.wash_count}次洗练)", "SUCCESS")
-
-                    try:
-                        winsound.Beep(1000, 1000)
-                    except:
-                        pass
-
-                    self.root.after(0, lambda: messagebox.showinfo(
-                        "洗练完成",
-                        f"已达到洗练目标!\n第{self.wash_count}次洗练，共检测到 {red_count} 个红色词条"
-                    ))
-
-                    self.is_running = False
-                    self.root.after(0, self.reset_ui_state)
-                    break
-
-                consecutive_failures = 0
-
-            except Exception as e:
-                self.log_message(f"洗练循环出错: {str(e)}", "ERROR")
-                consecutive_failures += 1
-
-                if consecutive_failures >= 3:
-                    self.log_message("连续失败3次，停止洗练", "ERROR")
-                    self.is_running = False
-                    self.root.after(0, self.reset_ui_state)
-                    break
-
-            # 根据性能动态调整延迟
-            cycle_time = time.time() - start_time
-            if cycle_time < 0.3:
-                time.sleep(0.3 - cycle_time)
-            else:
-                time.sleep(0.1)
-
-    def check_termination_condition(self, red_count, area_results,
-                                    min_red_count, use_advanced_strategy, area_color_requirements):
-        """检查终止条件"""
-        if not use_advanced_strategy:
-            return red_count >= min_red_count
-
-        # 高级策略检查
-        for i in range(6):
-            req = area_color_requirements[i]
-            if req == "无":
-                continue
-
-            if i >= len(area_results) or area_results[i] is None:
-                return False
-
-            if req == "红" and not area_results[i]['red']:
-                return False
-
-        return red_count >= min_red_count
-
-    def wait_for_animation_complete(self, timeout=5):
-        """等待动画完成（基于灰度变化检测）"""
-        reference_area = None
-        for area in self.detection_areas:
-            if area:
-                reference_area = area
-                break
+        elif state == STATE_RUNNING:
+            # 正在等待动画或洗练间隔时立即中断
+            if engine.pause():
+                self.start_btn.config(text="继续", bg="#4CAF50")
+                self.current_state = "已暂停"
+                self.update_status()
+                self.log_message("洗练已暂停")
+        elif state == STATE_PAUSED:
+            if engine.resume():
+                self.start_btn.config(text="暂停", bg="#FF9800")
+                self.current_state = "洗练中..."
+                self.update_status()
+                self.log_message("洗练继续")
 
-        if not reference_area:
-            time.sleep(0.5)
-            return
+    def on_engine_stats(self, text):
+        """引擎定时回调性能统计（洗练线程）"""
+        self.root.after(0, lambda: self.stats_label.config(text=text))
 
-        # 优化：减少采样次数
-        prev_gray = None
-        stable_count = 0
-        start_time = time.time()
+    def on_engine_finished(self, reason, result):
+        """洗练循环结束（洗练线程）"""
+        from engine import FINISH_REACHED
 
-        while time.time() - start_time < timeout:
+        if reason == FINISH_REACHED:
             try:
-                screenshot = ImageGrab.grab(bbox=reference_area)
-                gray_img = screenshot.convert('L')
-                current_gray = np.mean(np.array(gray_img))
-
-                if prev_gray is None:
-                    prev_gray = current_gray
-                elif abs(current_gray - prev_gray) < 5:
-                    stable_count += 1
-                    if stable_count >= 2:
-                        break
-                else:
-                    stable_count = 0
+                winsound.Beep(1000, 1000)
+            except:
+                pass
 
-                prev_gray = current_gray
-                time.sleep(0.08)
+            self.root.after(0, lambda: messagebox.showinfo(
+                "洗练完成",
+                f"已达到洗练目标!\n第{result.wash_count}次洗练，共检测到 {result.red_count} 个红色词条"
+            ))
 
-            except Exception:
-                time.sleep(0.08)
-                continue
+        self.root.after(0, self.reset_ui_state)
 
     def reset_ui_state(self):
         """重置UI状态"""
-        self.is_running = False
-        self.is_paused = False
         self.start_btn.config(text="开始洗练", bg="#4CAF50")
         self.current_state = "等待开始操作..."
         self.update_status()
@@ -737,7 +890,7 @@ class StoneWashingAssistant:
         """启动热键监听器"""
 
         def on_f2_press(key):
-            if key == keyboard.Key.f2 and self.is_running:
+            if key == keyboard.Key.f2 and self.engine.is_running:
                 self.root.after(0, self.toggle_washing)
 
         self.hotkey_listener = keyboard.Listener(on_press=on_f2_press)
@@ -747,14 +900,8 @@ class StoneWashingAssistant:
         """清理内存"""
         try:
             # 清理过期的图像缓存
-            current_time = time.time()
-            expired_keys = []
-            for key, (timestamp, _) in list(self.image_cache.items()):
-                if current_time - timestamp > self.cache_timeout:
-                    expired_keys.append(key)
-
-            for key in expired_keys:
-                del self.image_cache[key]
+            if self.engine:
+                self.engine.cleanup()
 
             # 强制垃圾回收
             gc.collect()
@@ -766,30 +913,34 @@ class StoneWashingAssistant:
             print(f"内存清理出错: {e}")
 
     def log_message(self, message, level="INFO"):
-        """记录日志消息"""
-        timestamp = datetime.now().strftime("[%H:%M:%S]")
-
-        if level == "ERROR":
-            color = "red"
-            prefix = "[错误] "
-        elif level == "SUCCESS":
-            color = "green"
-            prefix = "[成功] "
-        else:
-            color = "black"
-            prefix = ""
+        """记录日志消息（可在任意线程调用，不阻塞）"""
+        self.log_pipeline.push(message, level)
 
-        full_message = f"{timestamp} {prefix}{message}"
-
-        with self.log_lock:
-            self.log_text.insert(tk.END, full_message + "\n")
-            self.log_text.tag_add(color, f"end-{len(full_message) + 2}c", "end-1c")
-            self.log_text.tag_config(color, foreground=color)
-            self.log_text.see(tk.END)
+    def flush_log(self):
+        """把队列中的日志批量写入界面，并限制滚动区行数"""
+        try:
+            records = self.log_pipeline.drain()
+            if records:
+                colors = {"ERROR": "red", "SUCCESS": "green"}
+                chunks = []
+                for level, _, text in records:
+                    chunks.extend((text + "\n", colors.get(level, "black")))
+                self.log_text.insert(tk.END, *chunks)
+
+                line_count = int(self.log_text.index("end-1c").split(".")[0])
+                if line_count > self.log_max_lines:
+                    self.log_text.delete("1.0", f"{line_count - self.log_max_lines + 1}.0")
+                self.log_text.see(tk.END)
+
+                for level, message, _ in reversed(records):
+                    if level == "INFO" and not message.startswith("区域"):
+                        self.current_state = message
+                        self.update_status()
+                        break
+        except Exception as e:
+            print(f"刷新日志出错: {e}")
 
-        if level == "INFO" and not message.startswith("区域"):
-            self.current_state = message
-            self.update_status()
+        self.root.after(self.log_flush_interval, self.flush_log)
 
     def update_status(self):
         """更新状态栏"""
@@ -797,83 +948,129 @@ class StoneWashingAssistant:
 
     def save_config(self, event=None):
         """保存配置到文件"""
+        if self.engine is None:
+            return
+
+        from palette import NO_COLOR
+
         try:
-            # 更新当前设置到实例变量
-            self.min_red_count = int(self.min_red_var.get())
-            self.use_advanced_strategy = self.advanced_var.get()
-            if self.use_advanced_strategy:
-                self.area_color_requirements = [var.get() for var in self.color_vars]
+            # 界面上的洗练目标同步到引擎，运行中修改下一轮即生效
+            engine = self.engine
+            engine.min_red_count = int(self.min_red_var.get())
+            engine.use_advanced_strategy = self.advanced_var.get()
+            if engine.use_advanced_strategy:
+                engine.area_color_requirements = [var.get() for var in self.color_vars]
             else:
-                self.area_color_requirements = ["无"] * 6
+                engine.area_color_requirements = [NO_COLOR] * len(engine.detection_areas)
+            preset = self.preset_var.get()
+            engine.active_strategy = preset if preset in engine.strategy_presets else None
+            self.update_strategy_label()
 
-            config = {
-                "wash_button_pos": list(self.wash_button_pos) if self.wash_button_pos else None,
-                "detection_areas": [list(area) if area else None for area in self.detection_areas],
-                "use_advanced_strategy": self.use_advanced_strategy,
-                "area_color_requirements": self.area_color_requirements,
-                "min_red_count": self.min_red_count,
-                "wash_count": self.wash_count  # 保存洗练计数器
-            }
+            config = engine.to_config()
+            config["log_max_lines"] = self.log_max_lines
+            config["log_file"] = self.log_file
 
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            self.config_store.save(config)
 
         except Exception as e:
             self.log_message(f"保存配置失败: {str(e)}", "ERROR")
 
-    def load_config(self):
-        """从文件加载配置"""
-        if not os.path.exists(self.config_file):
-            self.log_message("未找到配置文件，使用默认配置")
+    def update_strategy_label(self):
+        """显示当前生效的策略表达式"""
+        self.strategy_label.config(text=f"当前策略: {self.engine.strategy_expression()}")
+
+    def estimate_strategy(self):
+        """按各区域的实际洗练结果模拟当前策略，在后台线程中计算"""
+        if not self.check_ready():
             return
+        self.save_config()
+        engine = self.engine
+        self.estimate_btn.config(state=tk.DISABLED)
+        self.estimate_label.config(text="正在估算...")
 
-        try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+        def worker():
+            try:
+                from simulator import report_lines
+                estimates = engine.estimate_strategy()
+                lines = [engine.outcome_stats.summary_text()] + report_lines(estimates, engine.cycle_time())
+                text = "\n".join(lines)
+            except ValueError as e:
+                text = f"无法估算: {str(e)}"
+            except Exception as e:
+                text = ""
+                self.log_message(f"策略估算失败: {str(e)}", "ERROR")
 
-            if config.get("wash_button_pos"):
-                self.wash_button_pos = tuple(config["wash_button_pos"])
-                self.wash_pos_label.config(text="✓ 已设置", fg="green")
+            def done():
+                self.estimate_label.config(text=text)
+                self.estimate_btn.config(state=tk.NORMAL)
 
-            if config.get("detection_areas"):
-                for i, area in enumerate(config["detection_areas"]):
-                    if area and len(area) == 4:
-                        self.detection_areas[i] = tuple(area)
-                        self.update_area_ui(i)
+            self.root.after(0, done)
 
-            if config.get("use_advanced_strategy") is not None:
-                self.use_advanced_strategy = config["use_advanced_strategy"]
-                self.advanced_var.set(self.use_advanced_strategy)
+        threading.Thread(target=worker, daemon=True).start()
 
-            if config.get("area_color_requirements"):
-                self.area_color_requirements = config["area_color_requirements"]
-                for i in range(len(self.area_color_requirements)):
-                    if self.area_color_requirements[i] == "任意颜色":
-                        self.area_color_requirements[i] = "无"
+    def load_config(self):
+        """从文件加载配置，并按洗练日志恢复上次未保存的洗练计数"""
+        try:
+            config = self.config_store.load()
+            if config is None:
+                self.log_message("未找到配置文件，使用默认配置")
+            else:
+                engine = self.engine
+                engine.apply_config(config)
+
+                if engine.wash_button_pos:
+                    self.wash_pos_label.config(text="✓ 已设置", fg="green")
+
+                for i in range(len(engine.detection_areas)):
+                    self.update_area_ui(i)
+                self.update_anchor_ui()
 
-            if config.get("min_red_count"):
-                self.min_red_count = config["min_red_count"]
-                self.min_red_var.set(str(self.min_red_count))
+                self.advanced_var.set(engine.use_advanced_strategy)
+                self.min_red_var.set(str(engine.min_red_count))
+                self.record_var.set(engine.recording_enabled)
+                self.update_color_choices()
+                self.preset_combo.config(values=[CUSTOM_STRATEGY] + list(engine.strategy_presets))
+                self.preset_var.set(engine.active_strategy or CUSTOM_STRATEGY)
+                self.update_strategy_label()
 
-            # 加载洗练计数器
-            if config.get("wash_count"):
-                self.wash_count = config["wash_count"]
+                if config.get("log_max_lines"):
+                    self.log_max_lines = max(100, int(config["log_max_lines"]))
 
-            if self.use_advanced_strategy:
-                self.advanced_frame.pack(padx=10, pady=3, fill=tk.X)
-                for i, var in enumerate(self.color_vars):
-                    if i < len(self.area_color_requirements):
-                        var.set(self.area_color_requirements[i])
+                if config.get("log_file"):
+                    self.log_file = config["log_file"]
+                    self.log_pipeline.open_file(self.log_file)
 
-            self.log_message(f"已自动加载上次配置，累计洗练次数: {self.wash_count}")
+                if engine.use_advanced_strategy:
+                    self.advanced_frame.pack(padx=10, pady=3, fill=tk.X)
+                    for i, var in enumerate(self.color_vars):
+                        if i < len(engine.area_color_requirements):
+                            var.set(engine.area_color_requirements[i])
+
+                self.log_message(f"已自动加载上次配置，累计洗练次数: {engine.wash_count}")
 
         except Exception as e:
             self.log_message(f"加载配置失败: {str(e)}", "ERROR")
 
+        self.open_wash_journal()
+
+    def open_wash_journal(self):
+        """回放洗练日志恢复计数，然后开始记录本次的洗练"""
+        engine = self.engine
+        try:
+            journaled = self.wash_journal.replay()
+            if journaled > engine.wash_count:
+                self.log_message(f"已从洗练日志恢复洗练次数: {engine.wash_count} → {journaled}")
+                engine.wash_count = journaled
+                self.save_config()
+            self.wash_journal.open()
+            engine.journal = self.wash_journal
+        except Exception as e:
+            self.log_message(f"打开洗练日志失败: {str(e)}", "ERROR")
+
     def on_closing(self):
         """程序关闭时的清理工作"""
-        if self.is_running:
-            self.is_running = False
+        if self.engine:
+            self.engine.stop()
 
         if self.key_listener:
             self.key_listener.stop()
@@ -888,7 +1085,13 @@ class StoneWashingAssistant:
             except:
                 pass
 
-        self.save_config()
+        if self.engine:
+            self.save_config()
+            self.engine.close()
+        self.config_store.close()
+        self.wash_journal.close()
+        self.log_pipeline.drain(limit=len(self.log_pipeline.queue))
+        self.log_pipeline.close_file()
         self.root.destroy()
 
     def run(self):
@@ -899,15 +1102,20 @@ class StoneWashingAssistant:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="石板洗练助手")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="输出各模块导入耗时和各初始化阶段耗时后退出")
+    args = parser.parse_args()
+
     if sys.platform != "win32":
         print("错误：本程序仅支持Windows系统")
         return
 
-    pyautogui.FAILSAFE = True
-    pyautogui.PAUSE = 0.1
+    profiler = StartupProfiler(started_at=STARTUP_BEGIN)
+    profiler.record_import("tkinter 等界面模块", STARTUP_IMPORT_TIME)
 
     try:
-        app = StoneWashingAssistant()
+        app = StoneWashingAssistant(profiler, exit_after_startup=args.profile_startup)
         app.run()
     except Exception as e:
         with open("error.log", "w", encoding="utf-8") as f:
@@ -0,0 +1,145 @@
+"""洗练各阶段耗时统计：固定分桶直方图 + 吞吐量"""
+import json
+import time
+from array import array
+from bisect import bisect_left
+
+# 洗练循环的各阶段及显示名称
+STAGES = (
+    ("click", "点击"),
+    ("settle", "等待动画"),
+    ("capture", "截图"),
+    ("analyze", "分析"),
+    ("termination", "终止判断"),
+    ("sleep", "节奏等待"),
+)
+
+
+def default_bucket_edges():
+    """分桶上界（秒）：10us ~ 10s 对数分布，每个数量级 10 个桶"""
+    edges = []
+    value = 1e-5
+    while value < 10.0:
+        edges.append(value)
+        value *= 10 ** 0.1
+    edges.append(10.0)
+    return tuple(edges)
+
+
+class LatencyHistogram:
+    """固定分桶直方图，记录时只做二分查找和计数，不分配容器"""
+
+    def __init__(self, edges=None):
+        self.edges = edges or default_bucket_edges()
+        # 最后一个桶收集超过最大上界的值
+        self.counts = array("Q", bytes(8 * (len(self.edges) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """估算分位数（取所在桶的上界，不超过实际最大值）"""
+        if not self.count:
+            return 0.0
+        target = q / 100.0 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target and bucket_count:
+                upper = self.edges[index] if index < len(self.edges) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def reset(self):
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class WashMetrics:
+    """洗练循环指标：各阶段直方图，以及最近若干次洗练的吞吐量"""
+
+    def __init__(self, window=64):
+        self.histograms = {stage: LatencyHistogram() for stage, _ in STAGES}
+        self.last = {stage: 0.0 for stage, _ in STAGES}  # 各阶段最近一次的耗时
+        # 最近 window 次洗练完成时间的环形缓冲区
+        self.wash_times = array("d", bytes(8 * window))
+        self.wash_total = 0
+        self.started_at = time.time()
+
+    def record(self, stage, seconds):
+        """记录一个阶段的耗时（秒）"""
+        self.histograms[stage].record(seconds)
+        self.last[stage] = seconds
+
+    def mark_wash(self, timestamp=None):
+        """记录一次洗练完成"""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        self.wash_times[self.wash_total % len(self.wash_times)] = timestamp
+        self.wash_total += 1
+
+    def washes_per_minute(self):
+        """最近窗口内的洗练速度（次/分）"""
+        samples = min(self.wash_total, len(self.wash_times))
+        if samples < 2:
+            return 0.0
+        newest = self.wash_times[(self.wash_total - 1) % len(self.wash_times)]
+        oldest = self.wash_times[(self.wash_total - samples) % len(self.wash_times)]
+        if newest <= oldest:
+            return 0.0
+        return (samples - 1) * 60.0 / (newest - oldest)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.wash_total = 0
+        self.started_at = time.time()
+
+    def snapshot(self):
+        """当前所有指标（耗时单位为秒）"""
+        return {
+            "started_at": self.started_at,
+            "washes": self.wash_total,
+            "washes_per_minute": self.washes_per_minute(),
+            "stages": {stage: self.histograms[stage].summary() for stage, _ in STAGES},
+        }
+
+    def summary_text(self):
+        """界面显示用的简要文本，耗时单位毫秒"""
+        lines = [f"速度: {self.washes_per_minute():.1f}次/分  (p50/p95/p99/max ms)"]
+        for stage, label in STAGES:
+            histogram = self.histograms[stage]
+            if not histogram.count:
+                continue
+            lines.append(f"{label}: {histogram.percentile(50) * 1000:.1f}/"
+                         f"{histogram.percentile(95) * 1000:.1f}/"
+                         f"{histogram.percentile(99) * 1000:.1f}/"
+                         f"{histogram.max * 1000:.1f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """把指标和原始分桶写入 JSON 文件"""
+        data = self.snapshot()
+        data["bucket_edges"] = list(self.histograms[STAGES[0][0]].edges)
+        data["buckets"] = {stage: list(self.histograms[stage].counts) for stage, _ in STAGES}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,78 @@
+"""洗练节奏控制：根据实际响应延迟自适应调整两次洗练之间的间隔"""
+
+
+class AdaptivePacer:
+    """闭环节奏控制器
+
+    - 延迟：对有效点击"点击到画面开始变化"的响应延迟和等待动画耗时做
+      指数平滑，据此给出等待动画时判定"无变化"的宽限时间
+    - 间隔：出现无效点击（点击后画面没有变化）时按 backoff 倍数放大，但不超过
+      由实测延迟推算的上限（响应延迟 × delay_factor，还没有响应延迟时按等待动画
+      耗时）——客户端在这段时间内已能接受下一次点击，等得更久只会降低速度，
+      偶发的漏点（失去焦点）也不会把间隔推到 max_delay；每次有效点击后按
+      recovery 比例向 min_delay 收敛，间隔越大恢复越快
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=1.0, initial_delay=0.1, recovery=0.2,
+                 backoff=2.0, backoff_floor=0.05, delay_factor=2.0, smoothing=0.2,
+                 min_grace=0.05, max_grace=1.0, grace_factor=2.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.recovery = recovery
+        self.backoff = backoff
+        self.backoff_floor = backoff_floor
+        self.delay_factor = delay_factor
+        self.smoothing = smoothing
+        self.min_grace = min_grace
+        self.max_grace = max_grace
+        self.grace_factor = grace_factor
+
+        self.delay = min(max(initial_delay, min_delay), max_delay)
+        self.response_time = None  # 平滑后的响应延迟（秒）
+        self.settle_time = None  # 平滑后有效点击的等待动画耗时（秒）
+        self.effective_clicks = 0
+        self.missed_clicks = 0
+        self.consecutive_misses = 0
+
+    def _smooth(self, current, sample):
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def update(self, settle_time, response_time, click_effective):
+        """每轮洗练后根据等待动画的结果更新间隔（无效点击的等待只是宽限时间，不计入延迟）"""
+        if click_effective:
+            self.settle_time = self._smooth(self.settle_time, settle_time)
+            if response_time is not None:
+                self.response_time = self._smooth(self.response_time, response_time)
+            self.effective_clicks += 1
+            self.consecutive_misses = 0
+            self.delay -= (self.delay - self.min_delay) * self.recovery
+        else:
+            self.missed_clicks += 1
+            self.consecutive_misses += 1
+            self.back_off(self.latency_limit())
+
+    def latency_limit(self):
+        """由实测延迟推算的间隔上限，还没有测到延迟时为 max_delay"""
+        latency = self.response_time if self.response_time is not None else self.settle_time
+        if latency is None:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, self.backoff_floor, latency * self.delay_factor))
+
+    def back_off(self, limit=None):
+        """放大间隔（无效点击时不超过 limit，循环出错时不超过 max_delay）"""
+        limit = self.max_delay if limit is None else limit
+        self.delay = min(limit, max(self.delay * self.backoff, self.backoff_floor))
+
+    def grace(self, poll_interval=0.0):
+        """等待动画时，多久没有变化即判定为无效点击"""
+        if self.response_time is None:
+            return self.max_grace
+        grace = self.response_time * self.grace_factor + poll_interval
+        return min(self.max_grace, max(self.min_grace, grace))
+
+    def summary_text(self):
+        response = f"{self.response_time * 1000:.0f}ms" if self.response_time is not None else "-"
+        return (f"节奏: 间隔{self.delay * 1000:.0f}ms（上限{self.latency_limit() * 1000:.0f}ms）, 响应{response}, "
+                f"无效点击{self.missed_clicks}次")
@@ -0,0 +1,154 @@
+"""多颜色词条识别：由调色板生成各通道的颜色范围位掩码查找表"""
+import numpy as np
+
+from classifier import RegionClassifier, sampling_steps, scale_thresholds
+
+# 未指定颜色需求
+NO_COLOR = "无"
+# 红色词条（基础模式"最低红色词条数量"统计的颜色）
+RED = "红"
+
+DEFAULT_PALETTE = [
+    {"name": RED, "rgb": [220, 35, 85], "tolerance": 30, "min_pixels": 10},
+]
+
+MAX_COLORS = 64  # 每种颜色占位掩码的一位
+GRAY_WEIGHTS = (19595, 38470, 7471)  # 与 PIL 'L' 模式公式一致，已放大 65536 倍
+
+
+class PaletteColor:
+    """调色板中的一种颜色：目标 RGB、各通道容差和判定所需的最少像素数"""
+
+    def __init__(self, name, rgb, tolerance=30, min_pixels=10):
+        self.name = name
+        self.rgb = tuple(int(c) for c in rgb)
+        self.tolerance = int(tolerance)
+        self.min_pixels = int(min_pixels)
+
+    @classmethod
+    def from_config(cls, entry):
+        return cls(entry["name"], entry["rgb"], entry.get("tolerance", 30), entry.get("min_pixels", 10))
+
+    def to_config(self):
+        return {"name": self.name, "rgb": list(self.rgb),
+                "tolerance": self.tolerance, "min_pixels": self.min_pixels}
+
+
+def load_palette(entries):
+    """从配置加载调色板，名称重复或为"无"的条目会被忽略，缺少红色时自动补上"""
+    colors = []
+    names = set()
+    for entry in entries or DEFAULT_PALETTE:
+        color = PaletteColor.from_config(entry)
+        if color.name == NO_COLOR or color.name in names:
+            continue
+        names.add(color.name)
+        colors.append(color)
+    if RED not in names:
+        colors.insert(0, PaletteColor.from_config(DEFAULT_PALETTE[0]))
+    return colors
+
+
+class ColorEngine:
+    """颜色识别引擎：一次遍历得到区域内每种颜色的像素数和非背景像素数
+
+    每个通道一张 256 项的位掩码表，第 i 位表示该通道的值落在第 i 种颜色的
+    容差范围内，三张表按位与后即得到像素属于哪些颜色，逐像素精确判定。
+    各颜色独立计数（落在多种颜色范围内的像素每种都计入），因此每种颜色的
+    结论与只有这一种颜色时完全相同，添加颜色不会改变红色的判定。
+    调色板只有一种颜色时直接使用精确的融合分类器（支持提前结束）
+    """
+
+    def __init__(self, palette=None, background_level=240, content_threshold=50,
+                 stride=1, max_samples=None):
+        self.colors = palette or load_palette(None)
+        if len(self.colors) > MAX_COLORS:
+            raise ValueError(f"调色板最多支持{MAX_COLORS}种颜色")
+        self.names = [color.name for color in self.colors]
+        self.background_level = background_level
+        self.content_threshold = content_threshold
+        self.stride = stride
+        self.max_samples = max_samples
+        self._sampling = {}
+
+        self._single = None
+        if len(self.colors) == 1:
+            color = self.colors[0]
+            self._single = RegionClassifier(color.rgb, color.tolerance, color.min_pixels,
+                                            background_level, content_threshold,
+                                            stride=stride, max_samples=max_samples)
+            self._single_name = frozenset([color.name])
+            return
+
+        mask_type = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64)
+                         if np.iinfo(dtype).bits >= len(self.colors))
+        values = np.arange(256, dtype=np.int64)
+        self.mask_luts = []
+        for channel in range(3):
+            lut = np.zeros(256, dtype=np.uint64)
+            for i, color in enumerate(self.colors):
+                in_range = np.abs(values - color.rgb[channel]) <= color.tolerance
+                lut[in_range] |= np.uint64(1 << i)
+            self.mask_luts.append(lut.astype(mask_type))
+        self._bits = [mask_type(1 << i) for i in range(len(self.colors))]
+        # 不超过8种颜色时位掩码只有256种取值，一次直方图即可得到各颜色的计数
+        self._members = None
+        if mask_type is np.uint8:
+            self._members = [np.flatnonzero(np.arange(256) & (1 << i)) for i in range(len(self.colors))]
+
+        self.gray_luts = [(values * weight).astype(np.int32) for weight in GRAY_WEIGHTS]
+        self.gray_luts[0] += 0x8000  # 灰度四舍五入
+        self.content_level = background_level << 16
+
+    def _thresholds(self, height, width):
+        """区域尺寸对应的 (纵向步长, 横向步长, 各颜色像素阈值, 内容阈值)"""
+        key = (height, width)
+        plan = self._sampling.get(key)
+        if plan is None:
+            step_y, step_x, scale = sampling_steps(height, width, self.stride, self.max_samples)
+            min_pixels = np.array([scale_thresholds(color.min_pixels, 0, scale)[0]
+                                   for color in self.colors], dtype=np.int64)
+            content = scale_thresholds(1, self.content_threshold, scale)[1]
+            plan = (step_y, step_x, min_pixels, content)
+            self._sampling[key] = plan
+        return plan
+
+    def count(self, image):
+        """返回 (各颜色像素数数组, 非背景像素数)，按调色板顺序"""
+        pixels = np.asarray(image)
+        if self._single is not None:
+            red_pixels, content_pixels = self._single.count(pixels, early_exit=False)
+            return np.array([red_pixels], dtype=np.int64), int(content_pixels)
+
+        red, green, blue = pixels[:, :, 0], pixels[:, :, 1], pixels[:, :, 2]
+        mask_r, mask_g, mask_b = self.mask_luts
+        masks = np.take(mask_r, red)
+        masks &= np.take(mask_g, green)
+        masks &= np.take(mask_b, blue)
+        if self._members is not None:
+            histogram = np.bincount(masks.ravel(), minlength=256)
+            class_counts = np.array([histogram[members].sum() for members in self._members], dtype=np.int64)
+        else:
+            class_counts = np.array([np.count_nonzero(masks & bit) for bit in self._bits], dtype=np.int64)
+
+        gray_r, gray_g, gray_b = self.gray_luts
+        gray = np.take(gray_r, red)
+        gray += np.take(gray_g, green)
+        gray += np.take(gray_b, blue)
+        content_pixels = int(np.count_nonzero(gray < self.content_level))
+        return class_counts, content_pixels
+
+    def classify(self, image):
+        """返回 (区域中出现的颜色名称集合, 是否有内容)"""
+        pixels = np.asarray(image)
+        if self._single is not None:
+            present, has_content = self._single.classify(pixels)
+            return (self._single_name if present else frozenset()), has_content
+
+        step_y, step_x, min_pixels, content_threshold = self._thresholds(*pixels.shape[:2])
+        if step_y > 1 or step_x > 1:
+            pixels = pixels[step_y // 2::step_y, step_x // 2::step_x]
+
+        class_counts, content_pixels = self.count(pixels)
+        present = frozenset(name for name, hit in zip(self.names, class_counts >= min_pixels) if hit)
+        return present, content_pixels > content_threshold
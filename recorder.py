@@ -0,0 +1,219 @@
+"""洗练过程录制：把每轮的区域截图和检测结果写入内存映射的环形文件
+
+文件结构：
+  - 头部（HEADER_SIZE 字节）：魔数、已写入记录总数、JSON 格式的布局描述
+  - 记录区：slots 个定长槽位，按 numpy 结构化类型排列，循环覆盖
+每个槽位包含时间戳、红色数量、各区域标志位和各区域的原始像素
+"""
+import json
+import os
+
+import numpy as np
+
+MAGIC = b"SWREC001"
+HEADER_SIZE = 4096
+COUNT_OFFSET = len(MAGIC)  # 已写入记录总数（uint64）
+LAYOUT_OFFSET = COUNT_OFFSET + 16  # 布局 JSON 长度（uint32）后接 JSON 内容
+
+FLAG_PRESENT = 1
+FLAG_RED = 2
+FLAG_CONTENT = 4
+FLAG_ANALYZED = 8
+FLAG_SKIPPED = 16  # 提前确定未达到目标而跳过分析（没有 FLAG_ANALYZED 也没有该位的是分析失败）
+
+
+def rotated_path(path, index):
+    """第 index 份旧录制的文件名：session.rec → session.1.rec"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}{ext}"
+
+
+def rotate_recordings(path, keep=3):
+    """把已有的录制文件依次改名为 .1、.2…，最多保留 keep 份，返回上一份录制的新文件名"""
+    if keep <= 0 or not os.path.exists(path) or os.path.getsize(path) <= HEADER_SIZE:
+        return None
+    for index in range(keep - 1, 0, -1):
+        if os.path.exists(rotated_path(path, index)):
+            os.replace(rotated_path(path, index), rotated_path(path, index + 1))
+    os.replace(path, rotated_path(path, 1))
+    return rotated_path(path, 1)
+
+
+def record_dtype(area_shapes):
+    """根据各区域尺寸 (高, 宽) 生成槽位的结构化类型，未设置的区域为 None"""
+    fields = [
+        ("seq", "<u8"),
+        ("wash_count", "<u8"),
+        ("click_time", "<f8"),
+        ("settle_time", "<f8"),
+        ("result_time", "<f8"),
+        ("red_count", "u1"),
+        ("flags", "u1", (len(area_shapes),)),
+    ]
+    for i, shape in enumerate(area_shapes):
+        if shape:
+            fields.append((f"area{i}", "u1", (shape[0], shape[1], 3)))
+    return np.dtype(fields)
+
+
+class _RingFile:
+    """环形文件的公共部分：解析头部并映射记录区"""
+
+    def _map(self, path, mode):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+            raise ValueError(f"不是有效的录制文件: {path}")
+
+        layout_length = int(np.frombuffer(header, "<u4", 1, LAYOUT_OFFSET)[0])
+        start = LAYOUT_OFFSET + 4
+        self.layout = json.loads(header[start:start + layout_length].decode("utf-8"))
+        self.area_shapes = [tuple(shape) if shape else None for shape in self.layout["area_shapes"]]
+        self.slots = self.layout["slots"]
+        self.dtype = record_dtype(self.area_shapes)
+
+        self._counter = np.memmap(path, dtype="<u8", mode=mode, offset=COUNT_OFFSET, shape=(1,))
+        self.records = np.memmap(path, dtype=self.dtype, mode=mode,
+                                 offset=HEADER_SIZE, shape=(self.slots,))
+
+    @property
+    def total_written(self):
+        """累计写入的记录数（包括已被覆盖的）"""
+        return int(self._counter[0])
+
+    def __len__(self):
+        return min(self.total_written, self.slots)
+
+
+class SessionRecorder(_RingFile):
+    """录制器：预分配定长槽位，热路径上只做内存拷贝
+
+    slots 为槽位数，max_bytes 限制文件大小（两者取较小的槽位数）；
+    path 已有录制时先改名保留（最多 keep 份），不会覆盖上次想回放的录制
+    """
+
+    def __init__(self, path, areas, slots=2000, max_bytes=256 * 1024 * 1024, keep=3):
+        self.path = path
+        area_shapes = [[area[3] - area[1], area[2] - area[0]] if area else None for area in areas]
+        slot_size = record_dtype(area_shapes).itemsize
+        slots = max(1, min(int(slots), max(1, max_bytes // slot_size)))
+
+        layout = json.dumps({
+            "version": 1,
+            "slots": slots,
+            "areas": [list(area) if area else None for area in areas],
+            "area_shapes": area_shapes,
+        }).encode("utf-8")
+        if LAYOUT_OFFSET + 4 + len(layout) > HEADER_SIZE:
+            raise ValueError("录制文件布局描述过长")
+
+        self.previous_path = rotate_recordings(path, keep)
+
+        # 预分配整个文件，运行中不再扩展
+        with open(path, "wb") as f:
+            header = bytearray(HEADER_SIZE)
+            header[:len(MAGIC)] = MAGIC
+            header[LAYOUT_OFFSET:LAYOUT_OFFSET + 4] = len(layout).to_bytes(4, "little")
+            header[LAYOUT_OFFSET + 4:LAYOUT_OFFSET + 4 + len(layout)] = layout
+            f.write(header)
+            f.truncate(HEADER_SIZE + slots * slot_size)
+
+        self._map(path, "r+")
+        self._area_fields = [f"area{i}" if shape else None for i, shape in enumerate(self.area_shapes)]
+
+    def record(self, wash_count, click_time, settle_time, result_time, images, area_results, skipped=()):
+        """写入一轮洗练：images 为各区域图像，area_results 为对应检测结果，skipped 为跳过分析的区域"""
+        total = int(self._counter[0])
+        slot = self.records[total % self.slots]
+        slot["seq"] = total + 1
+        slot["wash_count"] = wash_count
+        slot["click_time"] = click_time
+        slot["settle_time"] = settle_time
+        slot["result_time"] = result_time
+
+        flags = slot["flags"]
+        red_count = 0
+        for i, field in enumerate(self._area_fields):
+            flag = 0
+            image = images[i] if i < len(images) else None
+            result = area_results[i] if i < len(area_results) else None
+            if field and image is not None and image.shape[:2] == self.area_shapes[i]:
+                np.copyto(slot[field], image[:, :, :3])
+                flag = FLAG_PRESENT
+            if result:
+                flag |= FLAG_ANALYZED
+                if result['red']:
+                    flag |= FLAG_RED
+                    red_count += 1
+                if result['has_content']:
+                    flag |= FLAG_CONTENT
+            elif i in skipped:
+                flag |= FLAG_SKIPPED
+            flags[i] = flag
+        slot["red_count"] = red_count
+
+        # 最后更新计数，读取方据此判断记录已完整写入
+        self._counter[0] = total + 1
+
+    def flush(self):
+        self.records.flush()
+        self._counter.flush()
+
+    def close(self):
+        self.flush()
+        del self.records
+        del self._counter
+
+
+class SessionReader(_RingFile):
+    """录制文件读取器，按时间顺序访问记录，图像以 numpy 视图返回"""
+
+    def __init__(self, path):
+        self.path = path
+        self._map(path, "r")
+
+    def _slot_index(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("录制记录索引超出范围")
+        return (self.total_written - count + index) % self.slots
+
+    def frames(self, index):
+        """第 index 条记录（从旧到新）的各区域图像，未录制的区域为 None"""
+        slot = self.records[self._slot_index(index)]
+        return [slot[f"area{i}"] if shape and slot["flags"][i] & FLAG_PRESENT else None
+                for i, shape in enumerate(self.area_shapes)]
+
+    def __getitem__(self, index):
+        """第 index 条记录的元数据和图像"""
+        slot = self.records[self._slot_index(index)]
+        flags = slot["flags"]
+        return {
+            "seq": int(slot["seq"]),
+            "wash_count": int(slot["wash_count"]),
+            "click_time": float(slot["click_time"]),
+            "settle_time": float(slot["settle_time"]),
+            "result_time": float(slot["result_time"]),
+            "red_count": int(slot["red_count"]),
+            "area_results": [{'red': bool(flag & FLAG_RED), 'has_content': bool(flag & FLAG_CONTENT)}
+                             if flag & FLAG_ANALYZED else None for flag in flags],
+            "skipped": [i for i, flag in enumerate(flags) if flag & FLAG_SKIPPED],
+            "frames": self.frames(index),
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def ordered(self):
+        """按时间顺序排列的全部记录（会复制数据，只需元数据时请取单个字段）"""
+        count = len(self)
+        start = (self.total_written - count) % self.slots
+        order = (np.arange(count) + start) % self.slots
+        return self.records[order]
+
+    def close(self):
+        del self.records
+        del self._counter
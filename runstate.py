@@ -0,0 +1,115 @@
+"""洗练运行状态：空闲 → 运行 ⇄ 暂停 → 停止中 → 空闲
+
+状态保存在条件变量中，暂停、继续和停止会立即唤醒正在等待的洗练线程；
+暂停期间洗练线程阻塞在条件变量上，不占用CPU
+"""
+import threading
+import time
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_PAUSED = "paused"
+STATE_STOPPING = "stopping"
+
+STATE_NAMES = {
+    STATE_IDLE: "空闲",
+    STATE_RUNNING: "运行中",
+    STATE_PAUSED: "已暂停",
+    STATE_STOPPING: "正在停止",
+}
+
+# 允许的状态转换
+TRANSITIONS = {
+    STATE_IDLE: (STATE_RUNNING,),
+    STATE_RUNNING: (STATE_PAUSED, STATE_STOPPING, STATE_IDLE),
+    STATE_PAUSED: (STATE_RUNNING, STATE_STOPPING, STATE_IDLE),
+    STATE_STOPPING: (STATE_IDLE,),
+}
+
+
+class RunStopped(Exception):
+    """等待过程中收到了停止请求"""
+
+
+class RunState:
+    """洗练循环的运行状态
+
+    控制方（界面、热键、命令行）调用 start/pause/resume/stop，洗练线程
+    用 wait() 代替 sleep、在每轮开始前调用 checkpoint()
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.state = STATE_IDLE
+
+    def _transition(self, state):
+        """在锁内切换状态，不允许的转换返回 False"""
+        if state not in TRANSITIONS[self.state]:
+            return False
+        self.state = state
+        self._condition.notify_all()
+        return True
+
+    def start(self):
+        """开始运行，不在空闲状态时抛出 RuntimeError"""
+        with self._condition:
+            if not self._transition(STATE_RUNNING):
+                raise RuntimeError(f"洗练{STATE_NAMES[self.state]}，无法开始")
+
+    def pause(self):
+        with self._condition:
+            return self.state == STATE_RUNNING and self._transition(STATE_PAUSED)
+
+    def resume(self):
+        with self._condition:
+            return self.state == STATE_PAUSED and self._transition(STATE_RUNNING)
+
+    def stop(self):
+        """请求停止，正在进行的等待立即结束"""
+        with self._condition:
+            return self.state in (STATE_RUNNING, STATE_PAUSED) and self._transition(STATE_STOPPING)
+
+    def finish(self):
+        """洗练循环退出后回到空闲状态"""
+        with self._condition:
+            if self.state != STATE_IDLE:
+                self._transition(STATE_IDLE)
+
+    @property
+    def is_running(self):
+        """已开始且没有请求停止（包括暂停中）"""
+        return self.state in (STATE_RUNNING, STATE_PAUSED)
+
+    @property
+    def is_paused(self):
+        return self.state == STATE_PAUSED
+
+    def _hold(self):
+        """在锁内：暂停时阻塞到继续（返回 False），停止时抛出 RunStopped"""
+        interrupted = False
+        while self.state == STATE_PAUSED:
+            interrupted = True
+            self._condition.wait()
+        if self.state == STATE_STOPPING:
+            raise RunStopped()
+        return not interrupted
+
+    def checkpoint(self):
+        """暂停时阻塞到继续，停止时抛出 RunStopped；没有被暂停时返回 True"""
+        with self._condition:
+            return self._hold()
+
+    def wait(self, seconds):
+        """可打断的等待
+
+        等满 seconds 秒返回 True；期间被暂停时立即中断，阻塞到继续后返回 False；
+        收到停止请求时立即抛出 RunStopped。空闲状态（未通过 start 运行）下为普通等待
+        """
+        deadline = time.monotonic() + seconds
+        with self._condition:
+            while self.state in (STATE_RUNNING, STATE_IDLE):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._condition.wait(remaining)
+            return self._hold()
@@ -0,0 +1,316 @@
+"""多客户端洗练调度：在一个线程中交替驱动多个游戏窗口的洗练会话"""
+import threading
+import time
+
+from engine import FINISH_FAILED, FINISH_LIMIT, FINISH_REACHED, FINISH_STOPPED
+
+# 会话的调度状态
+STATE_CLICK = "click"  # 到期后点击洗练按钮
+STATE_SETTLE = "settle"  # 轮询等待动画结束，结束后立即分析
+STATE_DONE = "done"  # 已结束（见 finish_reason）
+
+
+class WashSession:
+    """一个客户端的洗练会话：独立的引擎（按钮、区域、策略、计数、节奏）和调度状态"""
+
+    def __init__(self, name, engine, max_cycles=None):
+        self.name = name
+        self.engine = engine
+        self.max_cycles = max_cycles
+        self.state = STATE_CLICK
+        self.paused = False
+        self.due = 0.0  # 下一步的执行时间（调度器时钟）
+        self.cycles = 0
+        self.consecutive_failures = 0
+        self.finish_reason = None
+        self.last_result = None
+        self.started = False
+        self._plan = None
+        self._click_time = None
+
+    @property
+    def finished(self):
+        return self.state == STATE_DONE
+
+    def summary_text(self):
+        engine = self.engine
+        state = "已暂停" if self.paused and not self.finished else {
+            STATE_CLICK: "等待点击", STATE_SETTLE: "等待动画", STATE_DONE: f"已结束({self.finish_reason})"
+        }[self.state]
+        red = f"，上次红色{self.last_result.red_count_text()}个" if self.last_result else ""
+        missed = f"，点击未生效{engine.missed_clicks}次" if engine.missed_clicks else ""
+        return (f"{self.name}: {state}，本次{self.cycles}次/累计{engine.wash_count}次，"
+                f"{engine.metrics.washes_per_minute():.1f}次/分{red}{missed}")
+
+
+class WashScheduler:
+    """多会话调度器
+
+    每个会话按 点击 → 轮询等待动画 → 分析 → 节奏间隔 循环，每一步都很短。
+    调度器总是执行到期时间最早的一步：一个会话等待动画或节奏间隔时，
+    去点击和分析其他会话，所有会话都未到期时才休眠。所有会话共用同一个
+    鼠标，在单线程中点击天然串行，不会互相抢占。
+
+    暂停在会话当前这一轮分析完成后生效。暂停、继续和停止可在任意线程调用：
+    只在锁内记下请求并唤醒调度线程，由调度线程在执行下一步之前处理，
+    结束会话（关闭录制文件和洗练历史）不会与正在进行的分析同时发生。
+    sleep 为空时 run() 的休眠可被这些请求立即唤醒，所有会话都暂停时不占用CPU。
+    回调（在调度线程中调用）：
+      on_cycle(会话, CycleResult)、on_finished(会话, 结束原因)
+    """
+
+    def __init__(self, clock=time.perf_counter, sleep=None, failure_limit=3):
+        self.clock = clock
+        self.sleep = sleep
+        self.failure_limit = failure_limit
+        self.sessions = []
+        self.on_cycle = None
+        self.on_finished = None
+        self.is_running = False
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._requests = []  # [(会话名称或 None, 操作)]，由调度线程处理
+        self._owner = None  # 正在执行 run() 的线程
+        self.idle_time = 0.0  # 所有会话都未到期、调度器休眠的总时间
+        self.steps = 0
+
+    def add_session(self, name, engine, max_cycles=None):
+        """添加一个会话，引擎应已配置好按钮、区域和洗练目标"""
+        if any(session.name == name for session in self.sessions):
+            raise ValueError(f"会话名称重复: {name}")
+        session = WashSession(name, engine, max_cycles)
+        session.due = self.clock()
+        self.sessions.append(session)
+        return session
+
+    def session(self, name):
+        for session in self.sessions:
+            if session.name == name:
+                return session
+        raise KeyError(name)
+
+    def _select(self, name):
+        return self.sessions if name is None else [self.session(name)]
+
+    def pause(self, name=None):
+        """暂停会话（不指定名称时暂停全部）"""
+        self._request(name, self._pause)
+
+    def resume(self, name=None):
+        """继续会话（不指定名称时继续全部）"""
+        self._request(name, self._resume)
+
+    def stop(self, name=None):
+        """结束会话（不指定名称时结束全部并退出 run()）"""
+        self._request(name, self._stop)
+
+    def _request(self, name, action):
+        """记下请求并唤醒调度线程；没有在其他线程运行 run() 时直接处理"""
+        self._select(name)  # 名称不存在时在调用方抛出 KeyError
+        with self._lock:
+            self._requests.append((name, action))
+        if self._owner is None or self._owner is threading.current_thread():
+            self._apply_requests()
+        self._wakeup.set()
+
+    def _apply_requests(self):
+        """在调度线程中按顺序处理暂停、继续和停止请求"""
+        with self._lock:
+            requests, self._requests = self._requests, []
+        for name, action in requests:
+            action(name)
+
+    def _pause(self, name):
+        for session in self._select(name):
+            session.paused = True
+
+    def _resume(self, name):
+        now = self.clock()
+        for session in self._select(name):
+            if session.paused and session.state == STATE_CLICK:
+                session.due = max(session.due, now)
+                # 暂停期间画面可能被改动，点击前重新截图作为参考
+                session.engine.settle_detector.last_signature = None
+            session.paused = False
+
+    def _stop(self, name):
+        for session in self._select(name):
+            if not session.finished:
+                self._finish(session, FINISH_STOPPED)
+        if name is None:
+            self.is_running = False
+
+    def _next_session(self):
+        """到期时间最早、可以执行下一步的会话（暂停的会话只完成正在进行的一轮）"""
+        candidates = [session for session in self.sessions
+                      if not session.finished and not (session.paused and session.state == STATE_CLICK)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda session: session.due)
+
+    def step(self):
+        """执行一个到期的步骤
+
+        返回 0（执行了一步）、距最早到期步骤的秒数，或 None（没有可执行的会话）
+        """
+        self._apply_requests()
+        session = self._next_session()
+        if session is None:
+            return None
+        now = self.clock()
+        if session.due > now:
+            return session.due - now
+
+        self.steps += 1
+        engine = session.engine
+        try:
+            if session.state == STATE_CLICK:
+                self._click(session)
+            else:
+                self._poll(session)
+        except Exception as e:
+            engine.log(f"洗练循环出错: {str(e)}", "ERROR")
+            engine.cycle_missed_clicks = 0
+            session.consecutive_failures += 1
+            engine.pacer.back_off()
+            session.state = STATE_CLICK
+            session.due = self.clock() + engine.pacer.delay
+            if session.consecutive_failures >= self.failure_limit:
+                engine.log(f"连续失败{self.failure_limit}次，停止洗练", "ERROR")
+                self._finish(session, FINISH_FAILED)
+        return 0.0
+
+    def _click(self, session):
+        engine = session.engine
+        if session.max_cycles is not None and session.cycles >= session.max_cycles:
+            self._finish(session, FINISH_LIMIT)
+            return
+        if not engine.wash_button_pos:
+            engine.log("洗练按钮位置未设置", "ERROR")
+            self._finish(session, FINISH_FAILED)
+            return
+
+        if not any(engine.detection_areas):
+            engine.log("未设置检测区域", "ERROR")
+            self._finish(session, FINISH_FAILED)
+            return
+
+        if not session.started:
+            session.started = True
+            if engine.capture_cost_model is None:
+                engine.measure_capture_cost()
+            engine.open_session_recorder()
+            engine.open_history()
+
+        # 多个窗口的面板相同，重新定位时不能认成其他会话的窗口
+        engine.anchor_exclude = [other.engine.locator.origin for other in self.sessions
+                                 if other is not session and other.engine.locator]
+        # 点击前可能因窗口移动重新定位了检测区域，点击后再取截图计划
+        session._click_time = engine.click_once()
+        session._plan = engine.get_capture_plan()
+        engine.begin_settle()
+        session.state = STATE_SETTLE
+        session.due = self.clock()
+
+    def _poll(self, session):
+        engine = session.engine
+        detector = engine.settle_detector
+        try:
+            settled = detector.poll(session._plan, engine.get_capture_backend().grab)
+            frames = detector.frames
+        except Exception:
+            # 与阻塞等待一致：截图失败时放弃等待，分析时重新截图
+            detector.last_signature = None
+            settled, frames = True, None
+
+        if not settled:
+            session.due = self.clock() + detector.poll_interval
+            return
+
+        # 画面一直没有变化时先按响应延迟再等一次，再判定点击是否生效
+        if frames is not None:
+            grace = engine.late_response_grace()
+            if grace is not None:
+                detector.extend(grace)
+                session.due = self.clock() + detector.poll_interval
+                return
+
+        if frames is not None:
+            engine.metrics.record("settle", detector.last_duration)
+        if not engine.confirm_click():
+            # 点击未生效：不分析、不计入轮数，立即重新点击
+            session.state = STATE_CLICK
+            session.due = self.clock()
+            return
+        result = engine.analyze(session._plan, frames, session._click_time, engine.clock())
+        session.cycles += 1
+        session.consecutive_failures = 0
+        session.last_result = result
+        if self.on_cycle:
+            self.on_cycle(session, result)
+            # 回调中可能已结束这个会话（stop），不能再排下一轮
+            if session.finished:
+                return
+
+        if result.reached:
+            engine.log(f"达到目标! 共 {result.red_count} 个红色词条 "
+                       f"(第{result.wash_count}次洗练)", "SUCCESS")
+            self._finish(session, FINISH_REACHED)
+            return
+
+        session.state = STATE_CLICK
+        session.due = self.clock() + engine.pacer.delay
+
+    def _finish(self, session, reason):
+        session.state = STATE_DONE
+        session.finish_reason = reason
+        session.engine.close_session_recorder()
+        session.engine.close_history()
+        if self.on_finished:
+            self.on_finished(session, reason)
+
+    def run(self):
+        """运行到所有会话结束或调用 stop()，返回 {会话名称: 结束原因}"""
+        self.is_running = True
+        self._owner = threading.current_thread()
+        try:
+            while self.is_running:
+                # 先清除唤醒标志再决定下一步，之后的暂停/继续/停止都会唤醒休眠
+                self._wakeup.clear()
+                wait = self.step()
+                if wait is None:
+                    # 剩下的会话都已暂停，等待继续
+                    if any(not session.finished for session in self.sessions):
+                        self._idle(None)
+                        continue
+                    break
+                if wait > 0:
+                    start = self.clock()
+                    self._idle(wait)
+                    self.idle_time += self.clock() - start
+        finally:
+            # 退出前处理剩下的请求（如 stop() 结束全部会话）
+            self._apply_requests()
+            self._owner = None
+            self.is_running = False
+            for session in self.sessions:
+                session.engine.close_session_recorder()
+                session.engine.close_history()
+        return {session.name: session.finish_reason for session in self.sessions}
+
+    def _idle(self, seconds):
+        """休眠 seconds 秒（None 为一直等到被唤醒）"""
+        if self.sleep is not None:
+            # 注入的 sleep（模拟时钟）不能被唤醒，暂停时按 0.1 秒间隔检查
+            self.sleep(0.1 if seconds is None else seconds)
+        else:
+            self._wakeup.wait(seconds)
+
+    def washes_per_minute(self):
+        """所有会话的洗练速度之和（次/分）"""
+        return sum(session.engine.metrics.washes_per_minute() for session in self.sessions)
+
+    def summary_text(self):
+        lines = [f"总速度: {self.washes_per_minute():.1f}次/分"]
+        lines.extend(session.summary_text() for session in self.sessions)
+        return "\n".join(lines)
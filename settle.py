@@ -0,0 +1,148 @@
+"""洗练动画结束检测：比较所有检测区域的分块均值签名"""
+import time
+from collections import deque
+
+import numpy as np
+
+
+def block_signature(image, block_size=8):
+    """把区域按 block_size 分块，返回各块各通道均值组成的一维签名"""
+    height, width = image.shape[:2]
+    if height == 0 or width == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    rows, cols = max(1, height // block_size), max(1, width // block_size)
+    block_h, block_w = height // rows, width // cols
+    blocks = image[:rows * block_h, :cols * block_w].reshape(rows, block_h, cols, block_w, -1)
+    sums = blocks.sum(axis=(1, 3), dtype=np.uint32)
+    return (sums / np.float32(block_h * block_w)).astype(np.float32).ravel()
+
+
+def frame_signature(images, block_size=8):
+    """多个区域的签名拼接在一起，未设置的区域跳过"""
+    signatures = [block_signature(image, block_size) for image in images if image is not None]
+    if not signatures:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(signatures)
+
+
+class SettleDetector:
+    """动画结束检测器
+
+    每隔 poll_interval 秒按截图计划截图并计算签名，任一分块变化量都小于
+    threshold 即视为这次采样静止。先要观察到画面变化（相对点击前的参考签名
+    或第一次采样），之后连续 stable_polls 次采样静止才判定结束，动画中
+    偶尔重复的一帧不会提前结束等待；若 grace 秒内画面一直没有变化（动画
+    已在首次采样前结束），也判定结束。
+
+    wait() 阻塞等待；start() + poll() 为分步接口，供调度器在轮询间隙处理其他会话
+    """
+
+    def __init__(self, poll_interval=0.03, threshold=6.0, grace=0.15, timeout=5.0,
+                 block_size=8, history=200, stable_polls=2):
+        self.poll_interval = poll_interval
+        self.threshold = threshold
+        self.stable_polls = stable_polls
+        self.grace = grace
+        self.timeout = timeout
+        self.block_size = block_size
+        self.durations = deque(maxlen=history)
+        self.last_duration = 0.0
+        self.last_signature = None
+        self.last_settled = True
+        self.last_capture_duration = 0.0  # 最后一次截图的耗时
+        self.last_change_seen = True  # 本次等待中是否观察到画面变化
+        self.last_response_time = None  # 从开始等待到首次观察到变化的耗时
+        self.frames = None  # 当前（或最后一次）等待中最后一次截图
+        self.start()
+
+    def _changed(self, previous, current):
+        if current.size == 0:
+            return False
+        return float(np.max(np.abs(current - previous))) >= self.threshold
+
+    def start(self, reference=None, clock=time.perf_counter):
+        """开始一次分步等待，之后反复调用 poll() 直到返回 True
+
+        reference 为点击前的签名（通常是上一轮分析时的画面），可以更快确认动画已开始
+        """
+        self._clock = clock
+        self._start = clock()
+        self._previous = reference
+        self._change_seen = False
+        self._stable = 0  # 最近连续静止的采样次数
+        self._response_time = None
+        self.frames = None
+
+    def poll(self, plan, grab):
+        """截图一次并判断画面是否已静止（或已超时），结束时返回 True
+
+        最后一次截图保存在 frames 中（每个截图矩形一个数组）
+        """
+        clock = self._clock
+        capture_start = clock()
+        self.frames = plan.grab(grab)
+        self.last_capture_duration = clock() - capture_start
+        signature = frame_signature(plan.extract(self.frames), self.block_size)
+        now = clock() - self._start
+
+        settled = False
+        previous = self._previous
+        # 检测区域变化后参考签名失效，按首次采样处理
+        if previous is not None and previous.shape == signature.shape:
+            if self._changed(previous, signature):
+                if not self._change_seen:
+                    self._response_time = now
+                self._change_seen = True
+                self._stable = 0
+            else:
+                self._stable += 1
+                if self._change_seen:
+                    settled = self._stable >= self.stable_polls
+                else:
+                    settled = now >= self.grace
+        self._previous = signature
+
+        if not settled and now + self.poll_interval < self.timeout:
+            return False
+
+        self.last_duration = clock() - self._start
+        self.last_signature = signature
+        self.last_settled = settled
+        self.last_change_seen = self._change_seen
+        self.last_response_time = self._response_time
+        self.durations.append(self.last_duration)
+        return True
+
+    def extend(self, grace):
+        """上一次等待一直没有变化、按宽限时间结束后，从现在起最多再等待 grace 秒
+
+        等待继续进行：耗时和响应延迟仍从最初的 start() 开始计算，之后照常
+        用 poll() 轮询，期间出现变化则等到画面静止为止
+        """
+        self.grace = self.last_duration + grace
+        self._previous = self.last_signature
+        self._change_seen = False
+        self._stable = 0
+        if self.durations:
+            self.durations.pop()
+
+    def changed_since(self, reference):
+        """最后一次等待结束时的画面与 reference（点击前的签名）相比是否有变化，无法比较时返回 True"""
+        signature = self.last_signature
+        if reference is None or signature is None or signature.size == 0 or reference.shape != signature.shape:
+            return True
+        return self._changed(reference, signature)
+
+    def wait(self, plan, grab, reference=None, sleep=time.sleep, clock=time.perf_counter):
+        """等待画面静止，返回最后一次截图（每个截图矩形一个数组）"""
+        self.start(reference, clock)
+        while not self.poll(plan, grab):
+            sleep(self.poll_interval)
+        return self.frames
+
+    def average_duration(self):
+        """最近若干次等待的平均耗时（秒）"""
+        if not self.durations:
+            return 0.0
+        return sum(self.durations) / len(self.durations)
@@ -0,0 +1,202 @@
+"""洗练策略模拟：按实际洗练结果估计各区域的颜色概率，用批量随机抽样估算达到目标的代价
+
+每个区域每轮出现的颜色组合按历史频率独立抽样，抽样结果按策略的颜色掩码
+拼成下标，直接在策略真值表（strategy.Strategy.table）中查出是否达到目标，
+与洗练时的终止判断完全一致。各轮洗练相互独立，达到目标所需的洗练次数
+服从几何分布，期望和分位数由模拟得到的单轮成功率计算
+"""
+import math
+
+import numpy as np
+
+from palette import RED
+from strategy import AREA_BITS, conjuncts
+
+DEFAULT_WASHES = 1_000_000  # 每个策略模拟的洗练轮数
+BATCH_SIZE = 200_000  # 每批抽样的轮数，限制临时数组的内存占用
+PERCENTILES = (50, 90, 99)
+
+
+class OutcomeStats:
+    """各区域实际检测结果的统计：每个区域出现各颜色组合的次数
+
+    跳过（已确定未达到目标）和分析失败的区域不计入。是否跳过只取决于
+    其他区域的结果，因此不影响对该区域概率的估计
+    """
+
+    def __init__(self, area_count=AREA_BITS):
+        self.observed = [0] * area_count
+        self.patterns = [{} for _ in range(area_count)]  # {颜色名称元组: 次数}
+
+    def record(self, area_results):
+        for i, result in enumerate(area_results[:len(self.observed)]):
+            if not result:
+                continue
+            colors = result.get('colors')
+            if colors is None:
+                colors = (RED,) if result['red'] else ()
+            key = tuple(sorted(colors))
+            self.observed[i] += 1
+            self.patterns[i][key] = self.patterns[i].get(key, 0) + 1
+
+    def record_recording(self, reader):
+        """从录制文件（recorder.SessionReader）中统计，录制只保存红色标志"""
+        for index in range(len(reader)):
+            self.record(reader[index]["area_results"])
+
+    def probability(self, area, color=RED):
+        """区域 area 出现 color 的频率，没有记录时返回 None"""
+        if not self.observed[area]:
+            return None
+        hits = sum(count for key, count in self.patterns[area].items() if color in key)
+        return hits / self.observed[area]
+
+    def reset(self):
+        for i in range(len(self.observed)):
+            self.observed[i] = 0
+            self.patterns[i].clear()
+
+    def summary_text(self):
+        cells = []
+        for i, observed in enumerate(self.observed):
+            if observed:
+                cells.append(f"{i + 1}:{self.probability(i) * 100:.0f}%")
+        if not cells:
+            return "区域红色概率: 暂无洗练记录"
+        return f"区域红色概率（{max(self.observed)}轮）: " + " ".join(cells)
+
+    def to_config(self):
+        return [[[list(key), count] for key, count in patterns.items()] for patterns in self.patterns]
+
+    @classmethod
+    def from_config(cls, data):
+        stats = cls(max(AREA_BITS, len(data)))
+        for i, patterns in enumerate(data):
+            for colors, count in patterns:
+                key = tuple(sorted(colors))
+                stats.patterns[i][key] = stats.patterns[i].get(key, 0) + int(count)
+                stats.observed[i] += int(count)
+        return stats
+
+
+class StrategyEstimate:
+    """一个策略的模拟结果"""
+
+    def __init__(self, expression, washes, hits):
+        self.expression = expression
+        self.washes = washes
+        self.hits = hits
+
+    @property
+    def probability(self):
+        """单轮达到目标的概率"""
+        return self.hits / self.washes if self.washes else 0.0
+
+    @property
+    def expected_washes(self):
+        """期望洗练次数，模拟中从未达到目标时为 None"""
+        return 1 / self.probability if self.hits else None
+
+    def percentile(self, q):
+        """有 q% 的把握在多少次洗练内达到目标"""
+        p = self.probability
+        if not self.hits:
+            return None
+        if p >= 1.0:
+            return 1
+        return max(1, math.ceil(math.log(1 - q / 100) / math.log(1 - p)))
+
+    def summary_text(self, cycle_time=None, previous=None):
+        """cycle_time 为每轮耗时（秒），previous 为少一条约束时的估算结果"""
+        if not self.hits:
+            # 三倍法则：零次命中时成功率 95% 置信上限约为 3/N
+            return (f"{self.expression}: 模拟{self.washes}轮未达到目标，"
+                    f"期望洗练次数大于{self.washes // 3}次")
+        # 成功率的相对标准误差
+        error = math.sqrt((1 - self.probability) / self.hits)
+        percentiles = "/".join(f"{self.percentile(q)}" for q in PERCENTILES)
+        text = (f"{self.expression}: 单轮{self.probability * 100:.3g}% (±{error * 100:.1f}%)，"
+                f"期望{self.expected_washes:.0f}次，p50/p90/p99 {percentiles}次")
+        if previous is not None and previous.hits:
+            text += f"，代价×{self.expected_washes / previous.expected_washes:.1f}"
+        if cycle_time:
+            text += f"，约{format_duration(self.expected_washes * cycle_time)}"
+        return text
+
+
+def report_lines(estimates, cycle_time=None):
+    """逐条约束的估算结果文本"""
+    lines = []
+    previous = None
+    for estimate in estimates:
+        lines.append(estimate.summary_text(cycle_time, previous))
+        previous = estimate
+    return lines
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}分钟"
+    return f"{seconds / 3600:.1f}小时"
+
+
+def area_distributions(stats, areas):
+    """各已设置区域的颜色组合及其频率 [(区域, [颜色元组], 累积概率数组)]"""
+    distributions = []
+    for i, area in enumerate(areas[:len(stats.observed)]):
+        if not area:
+            continue
+        observed = stats.observed[i]
+        if not observed:
+            distributions.append((i, None, None))
+            continue
+        keys = list(stats.patterns[i])
+        counts = np.array([stats.patterns[i][key] for key in keys], dtype=np.float64)
+        cumulative = np.cumsum(counts / observed)
+        cumulative[-1] = 1.0
+        distributions.append((i, keys, cumulative))
+    return distributions
+
+
+def simulate(strategies, stats, areas, washes=DEFAULT_WASHES, seed=None):
+    """模拟 washes 轮洗练，返回每个策略的 StrategyEstimate
+
+    所有策略使用同一批随机结果，比较约束之间的代价差异时不受抽样噪声影响。
+    策略用到的区域没有洗练记录时抛出 ValueError
+    """
+    distributions = area_distributions(stats, areas)
+    for i, keys, _ in distributions:
+        if keys is None and any(strategy.referenced >> i & 1 for strategy in strategies):
+            raise ValueError(f"区域{i + 1}还没有洗练记录，无法估算")
+    distributions = [item for item in distributions if item[1] is not None]
+
+    # 每个策略下各区域每种颜色组合对应的下标位
+    tables = [np.frombuffer(strategy.table, dtype=np.uint8) for strategy in strategies]
+    area_bits = [[np.array([strategy.area_index(i, key) for key in keys], dtype=np.int64)
+                  for i, keys, _ in distributions] for strategy in strategies]
+
+    rng = np.random.default_rng(seed)
+    hits = [0] * len(strategies)
+    remaining = washes
+    while remaining > 0:
+        count = min(BATCH_SIZE, remaining)
+        remaining -= count
+        draws = rng.random((len(distributions), count))
+        choices = [np.searchsorted(cumulative, draws[k], side="right")
+                   for k, (_, _, cumulative) in enumerate(distributions)]
+        for s, table in enumerate(tables):
+            index = np.zeros(count, dtype=np.int64)
+            for k, choice in enumerate(choices):
+                index |= area_bits[s][k][choice]
+            hits[s] += int(table[index].sum(dtype=np.int64))
+
+    return [StrategyEstimate(strategy.expression, washes, hits[s])
+            for s, strategy in enumerate(strategies)]
+
+
+def constraint_steps(expression):
+    """逐条累加约束得到的表达式列表，最后一项为完整策略"""
+    parts = conjuncts(expression)
+    return [" & ".join(parts[:n]) for n in range(1, len(parts) + 1)]
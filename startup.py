@@ -0,0 +1,78 @@
+"""启动耗时统计：记录各模块的导入耗时和各初始化阶段耗时（--profile-startup）"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """启动过程计时
+
+    导入耗时按导入顺序增量统计：已被之前的模块导入过的依赖不再重复计时。
+    每条记录为 (类别, 名称, 耗时秒数, 新加载的模块数, 是否在后台线程)，
+    类别为 "import"（导入）、"stage"（初始化阶段）或 "mark"（距启动的时间点）
+    """
+
+    def __init__(self, started_at=None, clock=time.perf_counter):
+        self.clock = clock
+        self.started_at = clock() if started_at is None else started_at
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _add(self, kind, name, seconds, modules=0):
+        background = threading.current_thread() is not threading.main_thread()
+        with self._lock:
+            self.records.append((kind, name, seconds, modules, background))
+
+    def record_import(self, name, seconds, modules=0):
+        """记录一段已完成的导入（如主模块顶部的界面模块）"""
+        self._add("import", name, seconds, modules)
+
+    def import_module(self, name, optional=False):
+        """导入模块并记录耗时；optional 为 True 时导入失败返回 None"""
+        before = len(sys.modules)
+        start = self.clock()
+        try:
+            module = importlib.import_module(name)
+        except Exception:
+            if not optional:
+                raise
+            module = None
+        self._add("import", name if module else f"{name}（不可用）",
+                  self.clock() - start, len(sys.modules) - before)
+        return module
+
+    @contextmanager
+    def stage(self, name):
+        """记录一个初始化阶段的耗时"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self._add("stage", name, self.clock() - start)
+
+    def mark(self, name):
+        """记录从启动到现在经过的时间"""
+        self._add("mark", name, self.clock() - self.started_at)
+
+    def elapsed(self):
+        return self.clock() - self.started_at
+
+    def report_lines(self):
+        """按记录顺序生成报告文本，耗时单位毫秒"""
+        labels = {"import": "导入", "stage": "阶段", "mark": "时间点"}
+        lines = [f"启动耗时统计（至今 {self.elapsed() * 1000:.1f}ms）"]
+        with self._lock:
+            records = list(self.records)
+        for kind, name, seconds, modules, background in records:
+            if kind == "mark":
+                text = f"  {labels[kind]} {name}: 启动后 {seconds * 1000:.1f}ms"
+            else:
+                text = f"  {labels[kind]} {name}: {seconds * 1000:.1f}ms"
+                if modules:
+                    text += f"（{modules}个模块）"
+            if background:
+                text += " [后台]"
+            lines.append(text)
+        return lines
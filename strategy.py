@@ -0,0 +1,276 @@
+"""洗练策略表达式：编译为按各区域颜色掩码索引的真值表，终止判断只需一次查表
+
+语法（区域编号 1~6，颜色默认为红）:
+  area1              区域1 为红色；area1:金 为区域1 出现金色
+  count>=4           红色区域的数量（count:金>=2 为金色），比较符 >= > <= < == !=
+  any 2 of {2,4,6}   指定区域中至少 2 个为红色（any 2 of {2,4,6}:金 同理）
+  true / false
+  a & b、a | b、!a、(a)   与、或、非、括号（也可写 and、or、not）
+例: "area1 & area3 & count>=4"、"any 2 of {2,4,6} | area1:金"
+
+每种颜色在一轮洗练中的结果是一个 6 位掩码（第 i 位表示区域 i+1 出现该颜色），
+表达式用到的颜色的掩码拼成真值表的下标：只用红色时真值表有 64 项
+"""
+import operator
+import re
+
+from palette import NO_COLOR, RED
+
+AREA_BITS = 6
+AREA_MASK = (1 << AREA_BITS) - 1
+MAX_COLORS = 3  # 表达式最多使用的颜色数（真值表 2^18 项）
+
+TOKEN_PATTERN = re.compile(r"\s*(>=|<=|==|!=|[<>&|!(){},:]|\d+|[^\W\d]+)")
+COMPARISONS = {
+    ">=": operator.ge, ">": operator.gt, "<=": operator.le,
+    "<": operator.lt, "==": operator.eq, "!=": operator.ne,
+}
+KEYWORDS = {"and": "&", "or": "|", "not": "!"}
+
+
+def tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ValueError(f"策略表达式第{position + 1}个字符无法识别: {expression[position:]}")
+        token = match.group(1)
+        tokens.append(KEYWORDS.get(token.lower(), token))
+        position = match.end()
+    return tokens
+
+
+def conjuncts(expression):
+    """按最外层的 & 拆分表达式，返回各约束的原文（用于逐条估算约束的代价）"""
+    parts = []
+    depth = 0
+    start = position = 0
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            break
+        token = KEYWORDS.get(match.group(1).lower(), match.group(1))
+        if token in "({":
+            depth += 1
+        elif token in ")}":
+            depth -= 1
+        elif token == "&" and depth == 0:
+            parts.append(expression[start:match.start(1)].strip())
+            start = match.end()
+        position = match.end()
+    parts.append(expression[start:].strip())
+    return [part for part in parts if part]
+
+
+class _Parser:
+    """递归下降解析，生成以各颜色掩码元组为参数的判断函数"""
+
+    def __init__(self, tokens, palette_names):
+        self.tokens = tokens
+        self.position = 0
+        self.palette_names = palette_names
+        self.colors = []
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None:
+            raise ValueError("策略表达式不完整")
+        if expected is not None and token.lower() != expected:
+            raise ValueError(f"策略表达式中应为 \"{expected}\"，实际为 \"{token}\"")
+        self.position += 1
+        return token
+
+    def number(self, low=None, high=None):
+        token = self.take()
+        if not token.isdigit():
+            raise ValueError(f"策略表达式中应为数字，实际为 \"{token}\"")
+        value = int(token)
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ValueError(f"数字 {value} 超出范围 {low}~{high}")
+        return value
+
+    def color(self):
+        """可选的 :颜色 后缀，返回该颜色在掩码元组中的位置"""
+        name = RED
+        if self.peek() == ":":
+            self.take()
+            name = self.take()
+            if self.palette_names is not None and name not in self.palette_names:
+                raise ValueError(f"调色板中没有颜色 \"{name}\"")
+        if name not in self.colors:
+            if len(self.colors) >= MAX_COLORS:
+                raise ValueError(f"策略表达式最多使用{MAX_COLORS}种颜色")
+            self.colors.append(name)
+        return self.colors.index(name)
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"策略表达式多余的内容: \"{self.peek()}\"")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == "|":
+            self.take()
+            left, right = node, self.parse_and()
+            node = lambda masks, left=left, right=right: left(masks) or right(masks)
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == "&":
+            self.take()
+            left, right = node, self.parse_not()
+            node = lambda masks, left=left, right=right: left(masks) and right(masks)
+        return node
+
+    def parse_not(self):
+        if self.peek() == "!":
+            self.take()
+            inner = self.parse_not()
+            return lambda masks: not inner(masks)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.take()
+        word = token.lower()
+        if token == "(":
+            node = self.parse_or()
+            self.take(")")
+            return node
+        if word in ("true", "false"):
+            value = word == "true"
+            return lambda masks: value
+        if word == "area":
+            bit = 1 << (self.number(1, AREA_BITS) - 1)
+            k = self.color()
+            return lambda masks: bool(masks[k] & bit)
+        if word == "count":
+            k = self.color()
+            compare = COMPARISONS.get(self.take())
+            if compare is None:
+                raise ValueError("count 后应为比较符 >= > <= < == !=")
+            value = self.number()
+            return lambda masks: compare(bin(masks[k]).count("1"), value)
+        if word == "any":
+            need = self.number()
+            self.take("of")
+            self.take("{")
+            subset = 1 << (self.number(1, AREA_BITS) - 1)
+            while self.peek() == ",":
+                self.take()
+                subset |= 1 << (self.number(1, AREA_BITS) - 1)
+            self.take("}")
+            k = self.color()
+            return lambda masks: bin(masks[k] & subset).count("1") >= need
+        raise ValueError(f"策略表达式中无法识别 \"{token}\"")
+
+
+class Strategy:
+    """编译后的洗练策略
+
+    table[下标] 表示该组颜色掩码是否达到目标，下标为各颜色掩码按 colors
+    顺序每 6 位拼接。decided() 判断只知道部分区域结果时是否已能确定结论
+    """
+
+    def __init__(self, expression, palette_names=None):
+        self.expression = " ".join(expression.split())
+        parser = _Parser(tokenize(self.expression), palette_names)
+        accept = parser.parse()
+        self.colors = tuple(parser.colors)
+
+        count = len(self.colors)
+        table = bytearray(1 << (AREA_BITS * count))
+        for index in range(len(table)):
+            masks = tuple((index >> (AREA_BITS * k)) & AREA_MASK for k in range(count))
+            table[index] = bool(accept(masks))
+        self.table = bytes(table)
+
+        # 对结论有影响的区域：改变该区域的颜色会改变某些情况下的结论；
+        # 必需的区域：该区域没有任何所需颜色时一定达不到目标
+        self.referenced = 0
+        self.necessary = 0
+        accepted = [index for index in range(len(table)) if table[index]]
+        for area in range(AREA_BITS):
+            bits = self.area_bits(area)
+            if any(table[index] != table[index ^ bits] for index in range(len(table))):
+                self.referenced |= 1 << area
+            if accepted and all(index & bits for index in accepted):
+                self.necessary |= 1 << area
+        self._decided = {}
+
+    def area_bits(self, area):
+        """区域 area（从 0 开始）在下标中的所有位"""
+        bits = 0
+        for k in range(len(self.colors)):
+            bits |= 1 << (area + AREA_BITS * k)
+        return bits
+
+    def area_index(self, area, colors):
+        """区域 area 出现 colors 中的颜色时在下标中对应的位"""
+        bits = 0
+        for k, name in enumerate(self.colors):
+            if name in colors:
+                bits |= 1 << (area + AREA_BITS * k)
+        return bits
+
+    def index_of(self, area_results):
+        """一轮检测结果对应的真值表下标，未设置或分析失败的区域视为没有任何颜色"""
+        index = 0
+        for area, result in enumerate(area_results[:AREA_BITS]):
+            if result:
+                colors = result.get('colors')
+                if colors is None:
+                    colors = (RED,) if result['red'] else ()
+                index |= self.area_index(area, colors)
+        return index
+
+    def accepts(self, index):
+        return bool(self.table[index])
+
+    def decided(self, known, index):
+        """已知 known（区域位掩码）中各区域的结果为 index 时的结论
+
+        所有可能的剩余结果都达到（或都达不到）目标时返回 True（False），否则返回 None
+        """
+        key = (known, index)
+        if key in self._decided:
+            return self._decided[key]
+        unknown = AREA_MASK & ~known
+        if not unknown:
+            result = self.accepts(index)
+        else:
+            area = (unknown & -unknown).bit_length() - 1
+            bits = self.area_bits(area)
+            result = None
+            subset = bits
+            # 枚举该区域所有颜色组合（bits 的所有子集）
+            while True:
+                outcome = self.decided(known | (1 << area), index | subset)
+                if outcome is None or (result is not None and outcome != result):
+                    result = None
+                    break
+                result = outcome
+                if not subset:
+                    break
+                subset = (subset - 1) & bits
+        self._decided[key] = result
+        return result
+
+
+def legacy_expression(min_red_count, use_advanced_strategy, requirements):
+    """把基础/高级模式的设置转换为策略表达式"""
+    parts = []
+    if use_advanced_strategy:
+        for i, requirement in enumerate(requirements[:AREA_BITS]):
+            if requirement == NO_COLOR:
+                continue
+            parts.append(f"area{i + 1}" if requirement == RED else f"area{i + 1}:{requirement}")
+    parts.append(f"count>={min_red_count}")
+    return " & ".join(parts)
@@ -0,0 +1,129 @@
+"""配置持久化测试：合并写入、原子替换、洗练日志的崩溃恢复和清空
+
+用法: python -m pytest tests
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_store import ConfigStore, WashJournal  # noqa: E402
+
+
+def write_journal(path, counts, tail=""):
+    """写入一份洗练日志，tail 模拟崩溃时只写了一半的最后一行"""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, count in enumerate(counts):
+            f.write(json.dumps({"wash_count": count, "time": float(i)}) + "\n")
+        f.write(tail)
+
+
+def test_saves_are_coalesced_into_one_atomic_write(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path), delay=60, max_delay=60)
+    for count in range(1, 6):
+        store.save({"wash_count": count})
+    # 延迟未到时还没有写入
+    assert not path.exists()
+    assert store.requests == 5
+
+    store.close()
+    assert store.writes == 1
+    assert json.loads(path.read_text(encoding="utf-8")) == {"wash_count": 5}
+    assert not (tmp_path / "config.json.tmp").exists()
+
+
+def test_background_write_after_delay(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path), delay=0.01)
+    written = []
+    store.on_written = written.append
+    store.save({"wash_count": 1})
+    # 不调用 flush/close，等后台线程在延迟后自行写入
+    deadline = time.monotonic() + 2
+    while not written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert written == [{"wash_count": 1}]
+    store.close()
+    assert store.writes == 1
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"wash_count": 3}), encoding="utf-8")
+    errors = []
+    store = ConfigStore(str(path), on_error=errors.append)
+    store.save({"wash_count": object()})  # 无法序列化，写临时文件时失败
+    store.close()
+    assert errors
+    assert json.loads(path.read_text(encoding="utf-8")) == {"wash_count": 3}
+    assert store.writes == 0
+
+
+def test_corrupt_config_is_moved_aside(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"wash_count": 1', encoding="utf-8")
+    with pytest.raises(ValueError):
+        ConfigStore(str(path)).load()
+    assert not path.exists()
+    assert (tmp_path / "config.json.corrupt").read_text(encoding="utf-8") == '{"wash_count": 1'
+
+
+def test_replay_after_crash_skips_truncated_record(tmp_path):
+    path = str(tmp_path / "wash_journal.log")
+    write_journal(path, [41, 42, 43], tail='{"wash_count": 4')
+    journal = WashJournal(path)
+    assert journal.replay() == 43
+    assert journal.records == 3
+
+    # 恢复后继续追加，半行记录不影响之后的回放
+    journal.open()
+    journal.record(44, 10.0)
+    journal.close()
+    assert WashJournal(path).replay() == 44
+
+
+def test_replay_returns_max_count(tmp_path):
+    path = str(tmp_path / "wash_journal.log")
+    write_journal(path, [7, 9, 8])
+    assert WashJournal(path).replay() == 9
+
+
+def test_compact_keeps_records_above_saved_count(tmp_path):
+    path = str(tmp_path / "wash_journal.log")
+    write_journal(path, [10, 11, 12])
+    journal = WashJournal(path)
+    journal.replay()
+    journal.open()
+    journal.record(13, 1.0)
+
+    # 配置中保存的计数小于日志中的最大计数时不能清空
+    assert not journal.compact(12)
+    journal.close()
+    assert WashJournal(path).replay() == 13
+
+
+def test_compact_after_config_saved(tmp_path):
+    config_path = tmp_path / "config.json"
+    journal_path = str(tmp_path / "wash_journal.log")
+    journal = WashJournal(journal_path)
+    journal.open()
+    for count in (1, 2, 3):
+        journal.record(count, float(count))
+
+    # 与界面相同：配置写入后按其中的计数清空日志
+    store = ConfigStore(str(config_path), delay=60)
+    store.on_written = lambda config: journal.compact(config.get("wash_count", 0))
+    store.save({"wash_count": 3})
+    store.close()
+    assert journal.records == 0
+    journal.record(4, 4.0)
+    journal.close()
+
+    # 崩溃后重新启动：配置中的计数加上日志中之后的记录
+    saved = json.loads(config_path.read_text(encoding="utf-8"))["wash_count"]
+    assert max(saved, WashJournal(journal_path).replay()) == 4
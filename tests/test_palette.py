@@ -0,0 +1,69 @@
+"""多颜色识别测试：容差边界逐像素精确，添加颜色不改变红色的判定
+
+用法: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from palette import RED, ColorEngine, load_palette  # noqa: E402
+
+GOLD = {"name": "金", "rgb": [230, 180, 40], "tolerance": 30, "min_pixels": 10}
+# 与红色容差范围重叠的颜色：重叠部分的像素对两种颜色都计数
+PINK = {"name": "粉", "rgb": [240, 60, 110], "tolerance": 30, "min_pixels": 10}
+
+
+def engines(*extra):
+    single = ColorEngine(load_palette(None))
+    multi = ColorEngine(load_palette([load_palette(None)[0].to_config(), *extra]))
+    return single, multi
+
+
+def region(rgb, pixels=10, size=(20, 40)):
+    """白底区域，左上角 pixels 个像素为 rgb"""
+    image = np.full(size + (3,), 255, dtype=np.uint8)
+    image.reshape(-1, 3)[:pixels] = rgb
+    return image
+
+
+def test_red_tolerance_edges_are_exact():
+    # 红色目标 (220, 35, 85)，容差 30：R 在 190..250 之间为红色
+    for engine in engines(GOLD):
+        for red, expected in ((189, False), (190, True), (191, True), (250, True), (251, False)):
+            present, has_content = engine.classify(region((red, 35, 85)))
+            assert (RED in present) == expected, (red, len(engine.colors))
+
+
+def test_red_verdicts_identical_with_one_and_two_colours():
+    rng = np.random.default_rng(7)
+    single, multi = engines(GOLD)
+    _, overlapping = engines(PINK)
+    for _ in range(300):
+        # 在红色容差边界附近取色，像素数在阈值附近
+        rgb = (rng.integers(180, 256), rng.integers(0, 80), rng.integers(50, 125))
+        image = region(rgb, pixels=int(rng.integers(5, 15)))
+        image[rng.random(image.shape[:2]) < 0.05] = rng.integers(0, 256, 3)
+        expected = single.classify(image)
+        for engine in (multi, overlapping):
+            present, has_content = engine.classify(image)
+            assert (RED in present, has_content) == (RED in expected[0], expected[1])
+
+
+def test_counts_match_single_colour_classifier():
+    rng = np.random.default_rng(11)
+    single, multi = engines(GOLD, PINK)
+    image = rng.integers(0, 256, (30, 60, 3), dtype=np.uint8)
+    red_single, content_single = single.count(image)
+    counts, content = multi.count(image)
+    assert counts[0] == red_single[0]
+    assert content == content_single
+
+
+def test_second_colour_detected():
+    _, multi = engines(GOLD)
+    present, has_content = multi.classify(region((230, 180, 40), pixels=60))
+    assert present == {"金"}
+    assert has_content
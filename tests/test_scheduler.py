@@ -0,0 +1,196 @@
+"""多客户端调度行为测试：模拟游戏窗口 + 模拟时钟，结果确定，不需要真实等待
+
+用法: python -m pytest tests
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FINISH_FAILED, FINISH_LIMIT, FINISH_REACHED, FINISH_STOPPED, WashEngine  # noqa: E402
+from fake_client import FakeGameScreen, SimulatedClock, create_fake_clients  # noqa: E402
+from input_driver import CallbackInputDriver, RecordingInputDriver  # noqa: E402
+from scheduler import WashScheduler  # noqa: E402
+
+
+def failing_click(position):
+    raise OSError("点击失败")
+
+
+def make_scheduler(count, max_cycles=None, **options):
+    """count 个模拟窗口，每个窗口一个会话（名称 A、B、…），默认永远达不到目标"""
+    clock = SimulatedClock()
+    clients = create_fake_clients(count, **options)
+    screen = FakeGameScreen(clients, clock)
+    driver = RecordingInputDriver(target=screen.click, clock=clock)
+    scheduler = WashScheduler(clock=clock, sleep=clock.sleep)
+    for i, client in enumerate(clients):
+        engine = WashEngine(input_driver=driver, capture_backend=screen, clock=clock,
+                            perf_counter=clock, sleep=clock.sleep)
+        engine.apply_config(client.settings())
+        engine.min_red_count = len(client.detection_areas) + 1
+        scheduler.add_session(chr(ord("A") + i), engine, max_cycles=max_cycles)
+    return scheduler, clients, driver, clock
+
+
+def clicked_client(clients, position):
+    return next(i for i, client in enumerate(clients) if client.hit(position))
+
+
+def test_clicks_other_client_while_one_animates():
+    scheduler, clients, driver, clock = make_scheduler(2, max_cycles=5)
+    assert scheduler.run() == {"A": FINISH_LIMIT, "B": FINISH_LIMIT}
+
+    # 第一次点击 A 后不等它的动画结束，立即点击 B
+    first, second = driver.clicks[:2]
+    assert clicked_client(clients, first[1]) == 0
+    assert clicked_client(clients, second[1]) == 1
+    assert second[0] < first[0] + clients[0].response_delay + clients[0].animation_time
+
+    # 两个窗口交替洗练，总耗时远小于依次洗练
+    single, _, _, single_clock = make_scheduler(1, max_cycles=5)
+    single.run()
+    assert clock() < 1.5 * single_clock()
+    assert [client.clicks for client in clients] == [5, 5]
+    assert sum(client.ignored_clicks for client in clients) == 0
+
+
+def test_paused_session_waits_while_others_continue():
+    scheduler, clients, driver, clock = make_scheduler(2, max_cycles=4)
+    paused_at = {}
+
+    def on_cycle(session, result):
+        if session.name == "A" and session.cycles == 2:
+            scheduler.pause("A")
+
+    def on_finished(session, reason):
+        if session.name == "B":
+            paused_at["A"] = scheduler.session("A").cycles
+            paused_at["clicks"] = clients[0].clicks
+            scheduler.resume("A")
+
+    scheduler.on_cycle = on_cycle
+    scheduler.on_finished = on_finished
+    assert scheduler.run() == {"A": FINISH_LIMIT, "B": FINISH_LIMIT}
+
+    # B 洗完之前 A 停在暂停时的轮数，也没有再点击；继续后洗完剩下的轮数
+    assert paused_at == {"A": 2, "clicks": 2}
+    assert scheduler.session("A").cycles == 4
+    assert clients[0].clicks == 4
+
+
+def test_all_sessions_paused_has_no_step():
+    scheduler, clients, driver, clock = make_scheduler(2)
+    scheduler.pause()
+    assert scheduler.step() is None
+    assert driver.clicks == []
+
+    scheduler.resume("B")
+    assert scheduler.step() == 0.0
+    assert [clicked_client(clients, position) for _, position in driver.clicks] == [1]
+
+
+def test_failing_session_does_not_stop_others():
+    scheduler, clients, driver, clock = make_scheduler(2, max_cycles=3)
+    scheduler.session("A").engine.input_driver = CallbackInputDriver(failing_click)
+
+    assert scheduler.run() == {"A": FINISH_FAILED, "B": FINISH_LIMIT}
+    assert scheduler.session("A").consecutive_failures == scheduler.failure_limit
+    assert scheduler.session("A").cycles == 0
+    assert scheduler.session("B").cycles == 3
+    assert clients[1].clicks == 3
+
+
+def test_session_stops_on_target_and_others_on_limit():
+    scheduler, clients, driver, clock = make_scheduler(2, max_cycles=3)
+    clients[0].red_probability = 1.0
+    scheduler.session("A").engine.min_red_count = 1
+
+    assert scheduler.run() == {"A": FINISH_REACHED, "B": FINISH_LIMIT}
+    assert scheduler.session("A").cycles == 1
+    assert scheduler.session("A").last_result.reached
+    # 达到目标后不再点击这个窗口
+    assert clients[0].clicks == 1
+    assert clients[1].clicks == 3
+
+
+def test_stop_one_session_by_name():
+    scheduler, clients, driver, clock = make_scheduler(2, max_cycles=4)
+
+    def on_cycle(session, result):
+        if session.name == "A" and session.cycles == 1:
+            scheduler.stop("A")
+
+    scheduler.on_cycle = on_cycle
+    assert scheduler.run() == {"A": FINISH_STOPPED, "B": FINISH_LIMIT}
+    assert scheduler.session("A").cycles == 1
+    assert clients[0].clicks == 1
+    assert scheduler.session("B").cycles == 4
+
+
+def test_stop_all_exits_run():
+    scheduler, clients, driver, clock = make_scheduler(2)
+
+    def on_cycle(session, result):
+        if session.cycles == 2:
+            scheduler.stop()
+
+    scheduler.on_cycle = on_cycle
+    assert scheduler.run() == {"A": FINISH_STOPPED, "B": FINISH_STOPPED}
+    assert not scheduler.is_running
+    assert all(session.finished for session in scheduler.sessions)
+
+
+def test_stop_from_other_thread_finishes_on_scheduler_thread():
+    scheduler, clients, driver, clock = make_scheduler(2)
+    finish_threads = []
+    for session in scheduler.sessions:
+        def close_session_recorder(original=session.engine.close_session_recorder):
+            finish_threads.append(threading.current_thread())
+            original()
+        session.engine.close_session_recorder = close_session_recorder
+
+    started = threading.Event()
+    scheduler.on_cycle = lambda session, result: started.set()
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    assert started.wait(5)
+
+    # 其他线程只记下请求，结束会话（关闭录制文件等）都在调度线程中进行
+    scheduler.pause("A")
+    scheduler.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert all(session.finish_reason == FINISH_STOPPED for session in scheduler.sessions)
+    assert finish_threads and all(t is thread for t in finish_threads)
+
+
+def test_slow_response_is_not_a_missed_click():
+    # 前几轮响应 0.05 秒，之后客户端变慢到超过等待动画的宽限时间
+    scheduler, clients, driver, clock = make_scheduler(1, max_cycles=8)
+
+    def on_cycle(session, result):
+        if session.cycles == 4:
+            clients[0].response_delay = 0.2
+
+    scheduler.on_cycle = on_cycle
+    scheduler.run()
+    engine = scheduler.session("A").engine
+    assert engine.missed_clicks == 0
+    assert clients[0].ignored_clicks == 0
+    assert engine.wash_count == clients[0].clicks == 8
+
+    # 不经调度器的阻塞洗练循环同样先按响应延迟多等一次
+    scheduler, clients, driver, clock = make_scheduler(1)
+    engine = scheduler.session("A").engine
+
+    def slow_down(result):
+        if result.wash_count == 4:
+            clients[0].response_delay = 0.2
+
+    engine.on_cycle = slow_down
+    engine.run(max_cycles=8)
+    assert engine.missed_clicks == 0
+    assert clients[0].ignored_clicks == 0
+    assert engine.wash_count == clients[0].clicks == 8
@@ -0,0 +1,78 @@
+"""动画结束检测测试：按脚本给出每次采样的画面，模拟时钟，结果确定
+
+用法: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_client import SimulatedClock  # noqa: E402
+from settle import SettleDetector, frame_signature  # noqa: E402
+
+
+def frame(level):
+    """一个检测区域的纯色画面，level 不同即视为画面变化"""
+    return np.full((16, 32, 3), level, dtype=np.uint8)
+
+
+class ScriptedPlan:
+    """按顺序返回脚本中的画面的截图计划"""
+
+    def __init__(self, levels):
+        self.levels = list(levels)
+        self.grabs = 0
+
+    def grab(self, grab):
+        level = self.levels[min(self.grabs, len(self.levels) - 1)]
+        self.grabs += 1
+        return [frame(level)]
+
+    def extract(self, frames):
+        return frames
+
+
+def run(levels, reference=0, **options):
+    """从 reference 画面开始等待，返回 (截图次数, 检测器)"""
+    clock = SimulatedClock()
+    detector = SettleDetector(**options)
+    plan = ScriptedPlan(levels)
+    detector.wait(plan, None, reference=frame_signature([frame(reference)]),
+                  sleep=clock.sleep, clock=clock)
+    return plan.grabs, detector
+
+
+def test_repeated_frame_during_animation_does_not_settle():
+    # 动画中间重复了一帧（100, 100），之后画面继续变化
+    grabs, detector = run([50, 100, 100, 150, 150, 150])
+    assert grabs == 6
+    assert detector.last_settled
+    assert detector.last_signature[0] == 150
+
+
+def test_single_stable_poll_keeps_old_behaviour():
+    grabs, detector = run([50, 100, 100, 150, 150, 150], stable_polls=1)
+    assert grabs == 3
+    assert detector.last_signature[0] == 100
+
+
+def test_stable_polls_configurable():
+    grabs, detector = run([50, 100, 100, 100, 150, 150, 150, 150], stable_polls=3)
+    assert grabs == 8
+    assert detector.last_signature[0] == 150
+
+
+def test_no_change_settles_after_grace():
+    grabs, detector = run([0], grace=0.1, poll_interval=0.03)
+    assert detector.last_settled
+    assert not detector.last_change_seen
+    assert detector.last_duration >= 0.1
+
+
+def test_never_stable_times_out():
+    levels = [(i * 40) % 256 for i in range(1, 200)]
+    grabs, detector = run(levels, timeout=1.0, poll_interval=0.03)
+    assert not detector.last_settled
+    assert detector.last_duration < 1.0
@@ -0,0 +1,144 @@
+"""洗练策略表达式测试：真值表与逐项判断一致，decided() 与穷举所有剩余结果一致
+
+用法: python -m pytest tests
+"""
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from palette import NO_COLOR, RED  # noqa: E402
+from strategy import AREA_BITS, AREA_MASK, Strategy, conjuncts, legacy_expression  # noqa: E402
+
+GOLD = "金"
+PALETTE = [RED, GOLD]
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def has(mask, area):
+    """区域 area（从 1 开始）是否在掩码中"""
+    return bool(mask >> (area - 1) & 1)
+
+
+def check_table(strategy, reference):
+    """真值表每一项都与 reference(各颜色掩码字典) 一致"""
+    for index in range(len(strategy.table)):
+        masks = {name: (index >> (AREA_BITS * k)) & AREA_MASK for k, name in enumerate(strategy.colors)}
+        red, gold = masks.get(RED, 0), masks.get(GOLD, 0)
+        assert strategy.accepts(index) == reference(red, gold), (strategy.expression, index)
+
+
+def test_readme_examples():
+    check_table(Strategy("area3 & count>=2", PALETTE),
+                lambda red, gold: has(red, 3) and popcount(red) >= 2)
+    check_table(Strategy("any 2 of {2,4,6}", PALETTE),
+                lambda red, gold: popcount(red & 0b101010) >= 2)
+    check_table(Strategy("area1:金 | count>=3", PALETTE),
+                lambda red, gold: has(gold, 1) or popcount(red) >= 3)
+    check_table(Strategy("area1 & area3 & count>=4", PALETTE),
+                lambda red, gold: has(red, 1) and has(red, 3) and popcount(red) >= 4)
+
+
+def test_operators_and_keywords():
+    check_table(Strategy("!(area1 or area2) and not count:金==0", PALETTE),
+                lambda red, gold: not (has(red, 1) or has(red, 2)) and popcount(gold) != 0)
+    check_table(Strategy("true"), lambda red, gold: True)
+    check_table(Strategy("false | count<1"), lambda red, gold: red == 0)
+
+
+@pytest.mark.parametrize("min_red", range(0, 7))
+@pytest.mark.parametrize("requirements", [
+    [NO_COLOR] * 6,
+    [RED, NO_COLOR, NO_COLOR, RED, NO_COLOR, NO_COLOR],
+    [GOLD, RED, NO_COLOR, NO_COLOR, NO_COLOR, GOLD],
+])
+def test_legacy_expression_matches_settings(min_red, requirements):
+    """基础/高级设置转换的表达式与按设置逐项判断一致"""
+    def reference(red, gold):
+        masks = {RED: red, GOLD: gold}
+        for area, requirement in enumerate(requirements, start=1):
+            if requirement != NO_COLOR and not has(masks[requirement], area):
+                return False
+        return popcount(red) >= min_red
+
+    for advanced in (False, True):
+        strategy = Strategy(legacy_expression(min_red, advanced, requirements), PALETTE)
+        check_table(strategy, reference if advanced else lambda red, gold: popcount(red) >= min_red)
+
+
+@pytest.mark.parametrize("expression", [
+    "area1 area2",
+    "area7",
+    "area0",
+    "any 2 of {1,7}",
+    "area1:紫",
+    "count>>2",
+    "count",
+    "(area1",
+    "area1 & ",
+    "area1 @ area2",
+    "area1:金 & area2:紫",
+])
+def test_parse_errors(expression):
+    with pytest.raises(ValueError):
+        Strategy(expression, PALETTE)
+
+
+def test_referenced_and_necessary_areas():
+    strategy = Strategy("area2 & (area4 | area5:金)", PALETTE)
+    assert strategy.referenced == 0b011010
+    assert strategy.necessary == 0b000010
+
+    # 只要求数量时所有区域都影响结论，但没有哪个区域是必需的
+    strategy = Strategy("count>=2")
+    assert strategy.referenced == AREA_MASK
+    assert strategy.necessary == 0
+
+    # 要求全部6个红色时每个区域都是必需的
+    assert Strategy("count>=6").necessary == AREA_MASK
+
+
+def test_conjuncts():
+    assert conjuncts("area1 & (area2 | area3) & any 2 of {4,5,6}") == \
+        ["area1", "(area2 | area3)", "any 2 of {4,5,6}"]
+    assert conjuncts("area1 and count>=2") == ["area1", "count>=2"]
+
+
+def brute_force_decided(strategy, known, index):
+    """枚举未知区域的所有颜色组合得到的结论，不唯一时为 None"""
+    free_bits = [bit for bit in range(AREA_BITS * len(strategy.colors))
+                 if not known >> (bit % AREA_BITS) & 1]
+    outcomes = set()
+    for values in itertools.product((0, 1), repeat=len(free_bits)):
+        completed = index
+        for bit, value in zip(free_bits, values):
+            completed |= value << bit
+        outcomes.add(strategy.accepts(completed))
+    return outcomes.pop() if len(outcomes) == 1 else None
+
+
+@pytest.mark.parametrize("expression", [
+    "count>=3",
+    "area1 & area3 & count>=4",
+    "any 2 of {2,4,6} | area1:金",
+    "!area2 & count:金<=1",
+])
+def test_decided_matches_brute_force(expression):
+    strategy = Strategy(expression, PALETTE)
+    rng = random.Random(expression)
+    for known in range(1 << AREA_BITS):
+        known_bits = 0
+        for area in range(AREA_BITS):
+            if known >> area & 1:
+                known_bits |= strategy.area_bits(area)
+        for _ in range(4):
+            index = rng.randrange(len(strategy.table)) & known_bits
+            assert strategy.decided(known, index) == brute_force_decided(strategy, known, index), \
+                (known, index)
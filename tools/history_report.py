@@ -0,0 +1,55 @@
+"""洗练历史统计：各区域红色概率、红色数量分布、洗练速度变化和各阶段耗时分位数
+
+用法: python tools/history_report.py wash_history.bin [--bucket 600] [--hours 24]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import HistoryReader  # noqa: E402
+from metrics import STAGES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="洗练历史统计")
+    parser.add_argument("history", help="洗练历史文件（wash_history.bin）")
+    parser.add_argument("--bucket", type=float, default=600.0, help="洗练速度的统计间隔（秒）")
+    parser.add_argument("--hours", type=float, help="只统计最近若干小时")
+    args = parser.parse_args()
+
+    reader = HistoryReader(args.history)
+    start = time.time() - args.hours * 3600 if args.hours else None
+
+    query_start = time.perf_counter()
+    print(reader.summary_text(start))
+    if not len(reader.select(start)):
+        return
+
+    distribution = reader.red_count_distribution(start)
+    total = distribution.sum()
+    print("红色数量分布: " + "  ".join(f"{count}个 {n / total * 100:.2f}%"
+                                  for count, n in enumerate(distribution) if n))
+
+    print(f"\n洗练速度（每{args.bucket:.0f}秒）:")
+    starts, counts = reader.throughput(args.bucket, start)
+    for bucket_start, count in zip(starts, counts):
+        if count:
+            print(f"  {datetime.fromtimestamp(bucket_start):%m-%d %H:%M}  "
+                  f"{count:>7}次  {count * 60 / args.bucket:7.1f}次/分")
+
+    print("\n各阶段耗时 p50/p95/p99 (ms):")
+    for stage, label in STAGES:
+        if stage in reader.stages:
+            values = reader.latency_percentiles(stage, start=start)
+            print(f"  {label:<6}" + "/".join(f"{value * 1000:.1f}" for value in values))
+
+    print(f"\n统计耗时 {(time.perf_counter() - query_start) * 1000:.0f}ms")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""采样分类校验：在录制的检测画面上对比采样结果与全分辨率结果
+
+分类器按 config.json 中的调色板（含校准结果）和内容阈值构建，与洗练时的判定一致。
+用法: python tools/validate_sampling.py session.rec [--config config.json] [--strides 2 3 4] [--max-samples 500 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_store import ConfigStore  # noqa: E402
+from engine import WashEngine  # noqa: E402
+from palette import ColorEngine  # noqa: E402
+from recorder import SessionReader  # noqa: E402
+
+
+def load_frames(reader):
+    """录制文件中所有已录制的区域图像（numpy 视图）"""
+    frames = []
+    for index in range(len(reader)):
+        frames.extend(frame for frame in reader.frames(index) if frame is not None)
+    return frames
+
+
+def load_engine(path):
+    """按配置文件设置调色板和阈值的引擎（没有配置文件时使用默认设置）"""
+    engine = WashEngine()
+    config = ConfigStore(path).load()
+    if config is None:
+        print(f"未找到配置文件 {path}，使用默认调色板和阈值")
+    else:
+        engine.apply_config(config)
+    return engine
+
+
+def build_classifier(engine, stride=1, max_samples=None):
+    """与 WashEngine 相同方式构建的颜色识别引擎，只替换采样设置"""
+    return ColorEngine(engine.palette, background_level=engine.background_level,
+                       content_threshold=engine.content_threshold,
+                       stride=stride, max_samples=max_samples)
+
+
+def evaluate(classifier, frames, reference):
+    """返回 (颜色判断不一致数, 内容判断不一致数, 总耗时)"""
+    color_mismatches = 0
+    content_mismatches = 0
+    start = time.perf_counter()
+    results = [classifier.classify(frame) for frame in frames]
+    elapsed = time.perf_counter() - start
+    for (colors, has_content), (expected_colors, expected_content) in zip(results, reference):
+        color_mismatches += colors != expected_colors
+        content_mismatches += has_content != expected_content
+    return color_mismatches, content_mismatches, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="采样分类与全分辨率分类的一致性校验")
+    parser.add_argument("recording", help="洗练录制文件（session.rec）")
+    parser.add_argument("--config", default="config.json", help="配置文件路径（调色板、内容阈值和采样设置）")
+    parser.add_argument("--strides", nargs="+", type=int, default=[2, 3, 4], help="待校验的采样步长")
+    parser.add_argument("--max-samples", nargs="+", type=int, default=[500, 2000],
+                        help="待校验的每区域最大采样像素数")
+    args = parser.parse_args()
+
+    try:
+        engine = load_engine(args.config)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return
+
+    reader = SessionReader(args.recording)
+    frames = load_frames(reader)
+    if not frames:
+        print("录制文件中没有区域画面")
+        return
+
+    full = build_classifier(engine)
+    start = time.perf_counter()
+    reference = [full.classify(frame) for frame in frames]
+    full_time = time.perf_counter() - start
+    totals = "，".join(f"{name} {sum(1 for colors, _ in reference if name in colors)} 个"
+                      for name in full.names)
+
+    print(f"区域画面 {len(frames)} 个（{len(reader)} 轮洗练），全分辨率判定: {totals}，"
+          f"平均 {full_time / len(frames) * 1e6:.1f}us/区域")
+    print(f"内容阈值: 灰度<{engine.background_level} 像素数>{engine.content_threshold}")
+    print(f"{'采样方式':<16}{'颜色不一致':>12}{'内容不一致':>12}{'us/区域':>10}{'加速比':>8}")
+
+    settings = []
+    if engine.sampling_stride > 1 or engine.sampling_max_samples:
+        settings.append(("当前配置", build_classifier(engine, engine.sampling_stride,
+                                                   engine.sampling_max_samples)))
+    settings += [(f"stride={stride}", build_classifier(engine, stride=stride)) for stride in args.strides]
+    settings += [(f"max_samples={count}", build_classifier(engine, max_samples=count))
+                 for count in args.max_samples]
+    for name, classifier in settings:
+        color_mismatches, content_mismatches, elapsed = evaluate(classifier, frames, reference)
+        print(f"{name:<16}"
+              f"{color_mismatches:>6} ({color_mismatches / len(frames):6.2%})"
+              f"{content_mismatches:>4} ({content_mismatches / len(frames):6.2%})"
+              f"{elapsed / len(frames) * 1e6:>10.1f}"
+              f"{full_time / elapsed if elapsed else 0:>7.1f}x")
+
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()